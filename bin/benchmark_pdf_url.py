@@ -0,0 +1,54 @@
+"""Benchmark `PDFURLBuilder.get_pdf_url` for PDFs we proxy with NGINX.
+
+This is the most common case, and happens for every PDF we show. It compares
+signing every URL with remembering signed URLs for the current expiry window.
+
+Usage:
+
+    python bin/benchmark_pdf_url.py --urls 1000 --repeat 100
+"""
+
+from argparse import ArgumentParser
+from timeit import timeit
+
+from via.cache import TTLCache
+from via.services.google_drive import GoogleDriveAPI
+from via.services.pdf_url import PDFURLBuilder, _NGINXSigner
+
+PARSER = ArgumentParser()
+PARSER.add_argument(
+    "--urls", type=int, default=1000, help="Number of different PDF URLs"
+)
+PARSER.add_argument("--repeat", type=int, default=100)
+
+
+def main():
+    args = PARSER.parse_args()
+    urls = [f"https://example.com/document_{i}.pdf" for i in range(args.urls)]
+
+    for name, cache in (
+        ("uncached", None),
+        ("cached", TTLCache(maxsize=args.urls)),
+    ):
+        builder = PDFURLBuilder(
+            request=None,
+            google_drive_api=GoogleDriveAPI,
+            secure_link_service=None,
+            route_url=None,
+            nginx_signer=_NGINXSigner(
+                nginx_server="http://localhost:9083",
+                secret="not_a_secret",  # noqa: S106
+                cache=cache,
+            ),
+        )
+
+        seconds = timeit(
+            lambda builder=builder: [builder.get_pdf_url(url) for url in urls],
+            number=args.repeat,
+        )
+        urls_per_second = args.urls * args.repeat / seconds
+        print(f"{name:>12}: {urls_per_second:10.0f} URLs/s")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
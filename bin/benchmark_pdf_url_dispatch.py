@@ -0,0 +1,68 @@
+"""Benchmark how `PDFURLBuilder` decides which route a PDF URL should use.
+
+Runs a corpus of typical LMS file URLs through the single combined regex we
+use now, and through the separate regexes for each provider we used to try
+one after another.
+
+Usage:
+
+    python bin/benchmark_pdf_url_dispatch.py --repeat 100000
+"""
+
+import re
+from argparse import ArgumentParser
+from timeit import timeit
+
+from via.services.pdf_url import PDFURLBuilder
+
+PARSER = ArgumentParser()
+PARSER.add_argument("--repeat", type=int, default=10000)
+
+URLS = (
+    "https://my-sharepoint.sharepoint.com/sites/course/Shared%20Documents/reading.pdf?download=1",
+    "https://api.onedrive.com/v1.0/shares/u!aHR0cHM6Ly8xZHJ2Lm1z/root/content",
+    "https://d2l.example.edu/d2l/api/le/1.0/123/content/topics/456/file?stream=1",
+    "https://moodle.example.edu/webservice/pluginfile.php/12/mod_resource/content/1/reading.pdf?forcedownload=1",
+    "https://canvas.example.edu/files/12345/download?download_frd=1&verifier=abc",
+    "https://www.example.com/papers/2023/a-long-paper-title.pdf",
+    "https://arxiv.org/pdf/2101.00001v2",
+    "https://cdn.example.org/static/reading-list/week-1/chapter-2.pdf",
+)
+
+SEPARATE_REGEXES = tuple(
+    (route, tuple(re.compile(pattern) for pattern in patterns))
+    for route, patterns in PDFURLBuilder.PYTHON_PDF_ROUTES
+)
+
+
+def match_separately(url):
+    """Find the route the way we used to, with one regex at a time."""
+    for route, regexes in SEPARATE_REGEXES:
+        if any(regex.match(url) for regex in regexes):
+            return route
+
+    return None
+
+
+def main():
+    args = PARSER.parse_args()
+
+    combined = PDFURLBuilder._python_pdf_routes.match  # noqa: SLF001
+    assert [combined(url) for url in URLS] == [  # noqa: S101
+        match_separately(url) for url in URLS
+    ]
+
+    for name, implementation in (
+        ("combined", combined),
+        ("separate", match_separately),
+    ):
+        seconds = timeit(
+            lambda implementation=implementation: [implementation(url) for url in URLS],
+            number=args.repeat,
+        )
+        urls_per_second = len(URLS) * args.repeat / seconds
+        print(f"{name:>12}: {urls_per_second:10.0f} URLs/s")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
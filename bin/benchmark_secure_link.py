@@ -0,0 +1,79 @@
+"""Benchmark checking the signed URL tokens on requests.
+
+Simulates many requests for a few popular signed URLs, where each request
+checks its token several times (as our views do), and compares the current
+implementation with verifying the token every time.
+
+Usage:
+
+    python bin/benchmark_secure_link.py --requests 10000 --checks 3
+"""
+
+from argparse import ArgumentParser
+from timeit import timeit
+from types import SimpleNamespace
+
+from h_vialib.secure import ViaSecureURL
+
+from via.cache import TTLCache
+from via.services.secure_link import SecureLinkService
+
+PARSER = ArgumentParser()
+PARSER.add_argument("--requests", type=int, default=10000)
+PARSER.add_argument(
+    "--urls", type=int, default=50, help="Number of different signed URLs"
+)
+PARSER.add_argument(
+    "--checks", type=int, default=3, help="Number of token checks per request"
+)
+
+SECRET = "not_a_secret_but_long_enough"  # noqa: S105
+
+
+def verify_every_time(requests, checks):
+    """Check tokens the way we used to, verifying the JWT for every check."""
+    via_secure_url = ViaSecureURL(SECRET)
+
+    for request in requests:
+        for _ in range(checks):
+            via_secure_url.verify(request.url)
+
+
+def current(requests, checks):
+    verified_urls = TTLCache(maxsize=10000)
+
+    for request in requests:
+        # The service is created once per request
+        service = SecureLinkService(
+            secret=SECRET, signed_urls_required=True, verified_urls=verified_urls
+        )
+        for _ in range(checks):
+            assert service.request_has_valid_token(request)  # noqa: S101
+
+
+def main():
+    args = PARSER.parse_args()
+
+    via_secure_url = ViaSecureURL(SECRET)
+    urls = [
+        via_secure_url.create(
+            f"http://localhost:9083/route?url=https://example.com/{i}"
+        )
+        for i in range(args.urls)
+    ]
+    requests = [SimpleNamespace(url=urls[i % len(urls)]) for i in range(args.requests)]
+
+    for name, implementation in (
+        ("current", current),
+        ("verify", verify_every_time),
+    ):
+        seconds = timeit(
+            lambda implementation=implementation: implementation(requests, args.checks),
+            number=1,
+        )
+        requests_per_second = args.requests / seconds
+        print(f"{name:>12}: {requests_per_second:10.0f} requests/s")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark the chunk smoothing in `HTTPService._stream_bytes`.
+
+Simulates proxying a large file which arrives from upstream in small reads
+and compares the current implementation with naively adding bytes together.
+
+Usage:
+
+    python bin/benchmark_stream_bytes.py --size-mb 200 --read-size 9000
+"""
+
+from argparse import ArgumentParser
+from timeit import timeit
+
+from via.services.http import HTTPService
+
+PARSER = ArgumentParser()
+PARSER.add_argument("--size-mb", type=int, default=50, help="Size of the file")
+PARSER.add_argument(
+    "--read-size", type=int, default=4096, help="Size of each upstream read"
+)
+PARSER.add_argument(
+    "--chunk-size", type=int, default=64000, help="Target output chunk size"
+)
+PARSER.add_argument("--repeat", type=int, default=3)
+
+
+class FakeResponse:
+    def __init__(self, size, read_size):
+        self._reads, remainder = divmod(size, read_size)
+        self._read = b"x" * read_size
+        self._remainder = b"x" * remainder
+
+    def iter_content(self, chunk_size):  # noqa: ARG002
+        for _ in range(self._reads):
+            yield self._read
+
+        if self._remainder:
+            yield self._remainder
+
+
+def concatenate_bytes(response, min_chunk_size):
+    """Smooth chunks the way we used to, by adding immutable bytes together."""
+    buffer = b""
+
+    for chunk in response.iter_content(chunk_size=min_chunk_size):
+        buffer += chunk
+        if len(buffer) >= min_chunk_size:
+            yield buffer
+            buffer = b""
+
+    if buffer:
+        yield buffer
+
+
+def main():
+    args = PARSER.parse_args()
+    size = args.size_mb * 1024 * 1024
+
+    for name, implementation in (
+        ("current", HTTPService._stream_bytes),  # noqa: SLF001
+        ("concatenate", concatenate_bytes),
+    ):
+        seconds = timeit(
+            lambda implementation=implementation: sum(
+                len(chunk)
+                for chunk in implementation(
+                    FakeResponse(size, args.read_size), args.chunk_size
+                )
+            ),
+            number=args.repeat,
+        )
+        mb_per_second = args.size_mb * args.repeat / seconds
+        print(f"{name:>12}: {mb_per_second:10.1f} MB/s")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
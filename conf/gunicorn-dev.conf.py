@@ -1,6 +1,11 @@
+import os
 from glob import glob
 
 bind = "0.0.0.0:9082"
 reload = True
 reload_extra_files = glob("via/templates/**/*", recursive=True)
 timeout = 0
+
+# Match production, so we notice anything which isn't thread safe
+worker_class = "gthread"
+threads = int(os.environ.setdefault("WEB_THREADS", "10"))
@@ -1,2 +1,16 @@
+import os
+
 bind = "unix:/tmp/gunicorn-web.sock"
 worker_tmp_dir = "/dev/shm"
+
+# Most of our requests spend their time waiting on upstream servers (proxying
+# PDFs, checking URLs, fetching transcripts). Threads release the GIL while
+# they wait on a socket, so with threaded workers each process can have many
+# slow upstream streams in flight, rather than one per process. Unlike sync
+# workers, a long download doesn't count towards the worker `timeout` either.
+#
+# The number of threads can be tuned per deployment with `WEB_THREADS`. It's
+# left in the environment so the app can size its upstream connection pools to
+# match. The database pool is sized separately with `DB_POOL_SIZE`.
+worker_class = "gthread"
+threads = int(os.environ.setdefault("WEB_THREADS", "50"))
@@ -0,0 +1,5 @@
+class TestURLDetails:
+    def test_it_requires_authorization(self, test_app):
+        test_app.post_json(
+            "/api/url_details", {"links": ["http://example.com"]}, status=403
+        )
@@ -8,3 +8,9 @@ class TestStatus:
             response.headers["Cache-Control"]
             == "max-age=0, must-revalidate, no-cache, no-store"
         )
+
+    def test_it_includes_stats(self, test_app):
+        response = test_app.get("/_status?include-stats", status=200)
+
+        # Google Drive is disabled in the tests
+        assert response.json["stats"]["google_drive"] == {}
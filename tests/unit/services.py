@@ -1,12 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
 from unittest import mock
 
 import pytest
 
+from via.cache import Batcher, DiskCache, SingleFlight, TTLCache
+from via.decryption import DecryptionService
 from via.services import (
     CheckmateService,
+    CheckmateVerdictCache,
     GoogleDriveAPI,
     HTTPService,
     PDFURLBuilder,
+    PooledCheckmateClient,
+    PooledHTTPAdapter,
     SecureLinkService,
     TranscriptService,
     URLDetailsService,
@@ -27,6 +33,17 @@ def mock_service(pyramid_config):
     return mock_service
 
 
+@pytest.fixture
+def named_cache(pyramid_config):
+    def named_cache(name):
+        cache = TTLCache(maxsize=10)
+        pyramid_config.register_service(cache, iface=TTLCache, name=name)
+
+        return cache
+
+    return named_cache
+
+
 @pytest.fixture
 def url_details_service(mock_service):
     return mock_service(URLDetailsService)
@@ -81,3 +98,108 @@ def youtube_service(mock_service):
 @pytest.fixture
 def youtube_transcript_service(mock_service):
     return mock_service(YouTubeTranscriptService)
+
+
+@pytest.fixture
+def url_details_cache(named_cache):
+    return named_cache("url_details")
+
+
+@pytest.fixture
+def url_details_probe_cache(named_cache):
+    return named_cache("url_details_probes")
+
+
+@pytest.fixture
+def nginx_signed_urls_cache(named_cache):
+    return named_cache("nginx_signed_urls")
+
+
+@pytest.fixture
+def verified_secure_urls_cache(named_cache):
+    return named_cache("verified_secure_urls")
+
+
+@pytest.fixture
+def youtube_title_cache(named_cache):
+    return named_cache("youtube_titles")
+
+
+@pytest.fixture
+def youtube_title_batcher(pyramid_config):
+    batcher = Batcher(max_size=50, max_wait=0)
+    pyramid_config.register_service(batcher, iface=Batcher, name="youtube_titles")
+
+    return batcher
+
+
+@pytest.fixture
+def youtube_transcript_cache(named_cache):
+    return named_cache("youtube_transcripts")
+
+
+@pytest.fixture
+def youtube_no_english_cache(named_cache):
+    return named_cache("youtube_no_english")
+
+
+@pytest.fixture
+def supadata_executor(pyramid_config):
+    executor = ThreadPoolExecutor(max_workers=2)
+    pyramid_config.register_service(executor, iface=ThreadPoolExecutor, name="supadata")
+
+    yield executor
+
+    executor.shutdown()
+
+
+@pytest.fixture
+def pdf_cache(pyramid_config, tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=1024, ttl=100)
+    pyramid_config.register_service(cache, iface=DiskCache, name="pdf")
+
+    return cache
+
+
+@pytest.fixture
+def checkmate_verdict_cache(pyramid_config):
+    cache = CheckmateVerdictCache(executor=mock.Mock(spec_set=["submit"]))
+    pyramid_config.register_service(cache, iface=CheckmateVerdictCache)
+
+    return cache
+
+
+@pytest.fixture
+def single_flight(pyramid_config):
+    single_flight = SingleFlight()
+    pyramid_config.register_service(single_flight, iface=SingleFlight)
+
+    return single_flight
+
+
+@pytest.fixture
+def decryption_service(pyramid_config, pyramid_settings):
+    service = DecryptionService(pyramid_settings["via_secret"].encode("utf-8"))
+    pyramid_config.register_service(service, iface=DecryptionService)
+
+    return service
+
+
+@pytest.fixture
+def pooled_checkmate_client(pyramid_config):
+    client = PooledCheckmateClient(
+        host="http://checkmate.example.com/",
+        api_key="api_key",
+        session=mock.Mock(spec_set=["get"]),
+    )
+    pyramid_config.register_service(client, iface=PooledCheckmateClient)
+
+    return client
+
+
+@pytest.fixture
+def pooled_http_adapter(pyramid_config):
+    adapter = PooledHTTPAdapter()
+    pyramid_config.register_service(adapter, iface=PooledHTTPAdapter)
+
+    return adapter
@@ -0,0 +1,763 @@
+import fcntl
+import json
+import os
+from concurrent.futures import Future
+from pathlib import Path
+from threading import Event, Thread
+from time import monotonic, sleep
+from unittest.mock import Mock
+
+import pytest
+from h_matchers import Any
+
+from via.cache import (
+    Batcher,
+    DiskCache,
+    IncompleteFileError,
+    SingleFlight,
+    TTLCache,
+)
+
+
+class TestTTLCache:
+    def test_it_returns_stored_values(self, cache):
+        cache.set("key", "value", ttl=10)
+
+        assert cache.get("key") == "value"
+
+    def test_it_returns_the_default_for_missing_values(self, cache):
+        assert cache.get("missing", "default") == "default"
+
+    def test_it_expires_values(self, cache, clock):
+        cache.set("key", "value", ttl=10)
+
+        clock.return_value = 110
+
+        assert cache.get("key") is None
+        assert cache.stats["size"] == 0
+
+    @pytest.mark.parametrize("ttl", [0, -1])
+    def test_it_doesnt_store_values_without_a_ttl(self, cache, ttl):
+        cache.set("key", "value", ttl=ttl)
+
+        assert cache.get("key") is None
+
+    def test_it_evicts_the_least_recently_used_value(self, cache):
+        cache.set("a", 1, ttl=10)
+        cache.set("b", 2, ttl=10)
+        cache.get("a")
+
+        cache.set("c", 3, ttl=10)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_clear(self, cache):
+        cache.set("key", "value", ttl=10)
+
+        cache.clear()
+
+        assert cache.get("key") is None
+
+    def test_stats(self, cache):
+        cache.set("key", "value", ttl=10)
+        cache.get("key")
+        cache.get("missing")
+
+        assert cache.stats == {"hits": 1, "misses": 1, "size": 1, "maxsize": 2}
+
+    def test_it_writes_to_the_backend(self, shared_cache, backend):
+        shared_cache.set("key", ["value"], ttl=10.5)
+
+        backend.set.assert_called_once_with(
+            Any.string.matching("^test:[0-9a-f]{64}$"), '["value"]', ex=10
+        )
+
+    def test_it_reads_from_the_backend(self, shared_cache, backend):
+        backend.get.return_value = json.dumps(["value"])
+        backend.ttl.return_value = 10
+
+        assert shared_cache.get("key") == ["value"]
+        assert shared_cache.stats["hits"] == 1
+
+    def test_it_keeps_values_from_the_backend_in_process(
+        self, shared_cache, backend, clock
+    ):
+        backend.get.return_value = json.dumps(["value"])
+        backend.ttl.return_value = 10
+        shared_cache.get("key")
+        backend.get.reset_mock()
+
+        assert shared_cache.get("key") == ["value"]
+        backend.get.assert_not_called()
+        # For only as long as the backend would have kept them
+        clock.return_value += 10
+        backend.get.return_value = None
+        assert shared_cache.get("key") is None
+
+    def test_it_doesnt_keep_values_without_a_ttl_in_process(
+        self, shared_cache, backend
+    ):
+        backend.get.return_value = json.dumps(["value"])
+        # Redis's answer for a key with no expiry
+        backend.ttl.return_value = -1
+        shared_cache.get("key")
+
+        assert shared_cache.stats["size"] == 0
+
+    def test_it_misses_when_the_backend_misses(self, shared_cache, backend):
+        backend.get.return_value = None
+
+        assert shared_cache.get("key") is None
+        assert shared_cache.stats["misses"] == 1
+
+    def test_it_survives_backend_failures(self, shared_cache, backend):
+        backend.get.side_effect = ConnectionError
+        backend.set.side_effect = ConnectionError
+
+        shared_cache.set("key", "value", ttl=10)
+        shared_cache.clear()
+
+        assert shared_cache.get("key") is None
+
+    @pytest.fixture
+    def clock(self):
+        return Mock(return_value=100)
+
+    @pytest.fixture
+    def backend(self):
+        return Mock(spec_set=["get", "set", "ttl"])
+
+    @pytest.fixture
+    def cache(self, clock):
+        return TTLCache(maxsize=2, clock=clock)
+
+    @pytest.fixture
+    def shared_cache(self, backend, clock):
+        return TTLCache(maxsize=2, backend=backend, namespace="test", clock=clock)
+
+
+class TestDiskCache:
+    def test_it_stores_files(self, cache):
+        consume(cache.tee("key", [b"ab", b"cd"]))
+
+        path = cache.get("key")
+
+        assert path.read_bytes() == b"abcd"
+        assert cache.stats["writes"] == 1
+
+    def test_tee_yields_the_chunks(self, cache):
+        assert list(cache.tee("key", [b"ab", b"cd"])) == [b"ab", b"cd"]
+
+    def test_get_returns_None_for_missing_files(self, cache):
+        assert cache.get("missing") is None
+        assert cache.stats["misses"] == 1
+
+    def test_get_marks_files_as_used(self, cache, clock):
+        consume(cache.tee("key", [b"ab"]))
+        clock.return_value = 1000050
+
+        path = cache.get("key")
+
+        assert path.stat().st_atime == 1000050
+        assert cache.stats["hits"] == 1
+
+    def test_it_expires_files(self, cache, clock):
+        consume(cache.tee("key", [b"ab"]))
+        path = cache.get("key")
+        os.utime(path, (1000000, 1000000))
+        clock.return_value = 1000101
+
+        assert cache.get("key") is None
+        assert not path.exists()
+
+    def test_it_doesnt_store_incomplete_files(self, cache, tmp_path):
+        chunks = cache.tee("key", [b"ab", b"cd"])
+        next(chunks)
+
+        chunks.close()
+
+        assert cache.get("key") is None
+        assert not list(tmp_path.iterdir())
+
+    def test_it_doesnt_store_files_when_reading_fails(self, cache, tmp_path):
+        def explode():
+            yield b"ab"
+            raise ValueError
+
+        with pytest.raises(ValueError):  # noqa: PT011
+            consume(cache.tee("key", explode()))
+
+        assert not list(tmp_path.iterdir())
+
+    def test_it_doesnt_store_empty_files(self, cache, tmp_path):
+        assert list(cache.tee("key", [b""])) == [b""]
+
+        assert cache.get("key") is None
+        assert not list(tmp_path.iterdir())
+
+    def test_it_doesnt_store_files_which_are_too_big(self, cache, tmp_path):
+        chunks = list(cache.tee("key", [b"a" * 6, b"b" * 6]))
+
+        assert chunks == [b"a" * 6, b"b" * 6]
+        assert cache.get("key") is None
+        assert not list(tmp_path.iterdir())
+
+    def test_it_evicts_the_least_recently_used_files(self, cache, clock):
+        consume(cache.tee("a", [b"aaaa"]))
+        clock.return_value += 1
+        consume(cache.tee("b", [b"bbbb"]))
+        clock.return_value += 1
+        cache.get("a")
+
+        consume(cache.tee("c", [b"ccc"]))
+
+        assert cache.get("a")
+        assert cache.get("b") is None
+        assert cache.get("c")
+        assert cache.stats["evictions"] == 1
+
+    def test_it_removes_old_temporary_files(self, cache, tmp_path, clock):
+        stale = tmp_path / f"{DiskCache.TEMP_PREFIX}stale"
+        stale.write_bytes(b"xx")
+        os.utime(stale, (0, 0))
+        stale_lock = tmp_path / f"{DiskCache.LOCK_PREFIX}stale"
+        stale_lock.write_bytes(b"")
+        os.utime(stale_lock, (0, 0))
+        stale_partial = tmp_path / f"{DiskCache.PARTIAL_PREFIX}stale"
+        stale_partial.write_bytes(b"")
+        os.utime(stale_partial, (0, 0))
+        in_progress = tmp_path / f"{DiskCache.TEMP_PREFIX}in_progress"
+        in_progress.write_bytes(b"xx")
+        os.utime(in_progress, (clock.return_value, clock.return_value))
+
+        consume(cache.tee("key", [b"ab"]))
+
+        assert not stale.exists()
+        assert not stale_lock.exists()
+        assert not stale_partial.exists()
+        assert in_progress.exists()
+
+    def test_it_doesnt_remove_locks_which_are_held(self, cache, tmp_path):
+        lock = cache.lock("key")
+        lock_file = tmp_path / f"{DiskCache.LOCK_PREFIX}{cache._path('key').name}"  # noqa: SLF001
+        os.utime(lock_file, (0, 0))
+
+        consume(cache.tee("other_key", [b"ab"]))
+
+        assert lock_file.exists()
+        assert cache.lock("key") is None
+        lock.close()
+
+    def test_it_only_looks_through_the_directory_when_it_needs_to(
+        self, cache, clock, patch
+    ):
+        scandir = patch("via.cache.os.scandir", side_effect=os.scandir)
+        consume(cache.tee("a", [b"aaa"]))
+        consume(cache.tee("b", [b"bbb"]))
+        assert scandir.call_count == 1
+
+        clock.return_value += DiskCache.SCAN_INTERVAL
+        consume(cache.tee("c", [b"c"]))
+
+        assert scandir.call_count == 2
+
+    def test_it_is_disabled_with_no_budget(self, tmp_path, clock):
+        cache = DiskCache(tmp_path / "cache", max_bytes=0, ttl=100, clock=clock)
+
+        assert list(cache.tee("key", [b"ab"])) == [b"ab"]
+        assert not (tmp_path / "cache").exists()
+
+    def test_it_carries_on_if_it_cant_create_files(self, tmp_path, clock):
+        (tmp_path / "file").write_bytes(b"")
+        cache = DiskCache(tmp_path / "file", max_bytes=10, ttl=100, clock=clock)
+
+        assert list(cache.tee("key", [b"ab"])) == [b"ab"]
+
+    def test_it_carries_on_if_it_cant_write(self, cache, NamedTemporaryFile):
+        NamedTemporaryFile.return_value.write.side_effect = OSError
+
+        assert list(cache.tee("key", [b"ab", b"cd"])) == [b"ab", b"cd"]
+        assert NamedTemporaryFile.return_value.write.call_count == 1
+
+    def test_it_carries_on_if_it_cant_store_the_file(self, cache, NamedTemporaryFile):
+        NamedTemporaryFile.return_value.name = "/missing/file"
+
+        assert list(cache.tee("key", [b"ab"])) == [b"ab"]
+        assert cache.get("key") is None
+
+    def test_it_ignores_files_removed_during_eviction(self, cache, patch):
+        entry = Mock(path="/missing/file")
+        entry.stat.side_effect = FileNotFoundError
+        patch("via.cache.os.scandir", return_value=[entry])
+
+        consume(cache.tee("key", [b"ab"]))
+
+        assert cache.stats["evictions"] == 0
+
+    def test_it_ignores_files_it_cant_evict(self, cache, patch):
+        patch("via.cache.os.unlink", side_effect=FileNotFoundError)
+        consume(cache.tee("a", [b"aaaa"]))
+
+        consume(cache.tee("b", [b"bbbbbbbb"]))
+
+        assert cache.stats["evictions"] == 0
+
+    def test_lock(self, cache):
+        lock = cache.lock("key")
+
+        assert lock
+        assert cache.lock("key") is None
+        cache.lock("other_key").close()
+
+        lock.close()
+
+        cache.lock("key").close()
+
+    @pytest.mark.parametrize("replaced", [True, False])
+    def test_lock_doesnt_use_lock_files_which_were_removed(
+        self, cache, patch, replaced
+    ):
+        real_flock = fcntl.flock
+
+        def remove_before_locking(handle, operation):
+            if flock.call_count == 1:
+                # As if it was evicted between us opening and locking it
+                Path(handle.name).unlink()
+                if replaced:
+                    # ... and somebody else has opened a new one since
+                    Path(handle.name).touch()
+            real_flock(handle, operation)
+
+        flock = patch("via.cache.fcntl.flock", side_effect=remove_before_locking)
+
+        lock = cache.lock("key")
+
+        assert flock.call_count == 2
+        assert Path(lock.name).stat().st_ino == os.fstat(lock.fileno()).st_ino
+        lock.close()
+
+    def test_lock_returns_None_if_it_cant_lock(self, tmp_path):
+        (tmp_path / "file").write_bytes(b"")
+        cache = DiskCache(tmp_path / "file", max_bytes=10, ttl=100)
+
+        assert cache.lock("key") is None
+
+    def test_lock_abandons_partial_files(self, cache, partial):
+        partial.write_bytes(b"left behind")
+        dead_process_lock = cache._try_lock("key")  # noqa: SLF001
+        follower = cache._follow("key", partial.open("rb"))  # noqa: SLF001
+        assert next(follower) == b"left behind"
+        dead_process_lock.close()
+
+        cache.lock("key").close()
+
+        assert not partial.exists()
+        with pytest.raises(IncompleteFileError):
+            consume(follower)
+
+    @pytest.mark.parametrize("max_bytes,enabled", [(10, True), (0, False)])  # noqa: PT006
+    def test_enabled(self, tmp_path, max_bytes, enabled):
+        assert DiskCache(tmp_path, max_bytes=max_bytes, ttl=100).enabled == enabled
+
+    def test_fill(self, cache):
+        chunks = Blocking([b"ab", b"cd"])
+        chunks.carry_on.set()
+
+        assert b"".join(cache.fill("key", chunks.chunks(), cache.lock("key"))) == (
+            b"abcd"
+        )
+
+        assert cache.get("key").read_bytes() == b"abcd"
+        assert chunks.closed
+        cache.lock("key").close()
+
+    def test_fill_reads_chunks_however_slowly_we_are_read(self, cache):
+        chunks = Blocking([b"ab", b"cd"])
+        chunks.carry_on.set()
+
+        filled = cache.fill("key", chunks.chunks(), cache.lock("key"))
+        wait_for_lock(cache, "key")
+
+        # It's all stored before we've read any of it
+        assert cache.get("key").read_bytes() == b"abcd"
+        assert b"".join(filled) == b"abcd"
+
+    @pytest.mark.parametrize("chunks", [[b""], [b"a" * 20]])
+    def test_fill_doesnt_store_empty_or_big_files(self, cache, chunks, tmp_path):
+        assert b"".join(cache.fill("key", iter(chunks), cache.lock("key"))) == (
+            b"".join(chunks)
+        )
+
+        assert cache.get("key") is None
+        assert [path.name for path in tmp_path.iterdir()] == [
+            Any.string.matching(f"^{DiskCache.LOCK_PREFIX}")
+        ]
+        cache.lock("key").close()
+
+    def test_fill_when_reading_fails(self, cache, caplog):
+        read_first_chunk = Event()
+
+        def explode():
+            yield b"ab"
+            read_first_chunk.wait(5)
+            raise ValueError
+
+        filled = cache.fill("key", explode(), cache.lock("key"))
+
+        assert next(filled) == b"ab"
+        read_first_chunk.set()
+        with pytest.raises(IncompleteFileError):
+            consume(filled)
+        assert cache.get("key") is None
+        assert "Could not fill a file in the disk cache" in caplog.text
+        cache.lock("key").close()
+
+    def test_fill_falls_back_to_tee(self, tmp_path):
+        (tmp_path / "file").write_bytes(b"")
+        cache = DiskCache(tmp_path / "file", max_bytes=10, ttl=100)
+        lock = Mock()
+
+        assert list(cache.fill("key", [b"ab"], lock)) == [b"ab"]
+
+        lock.close.assert_called_once_with()
+
+    def test_follow(self, cache):
+        chunks = Blocking([b"ab", b"cd"])
+        filled = cache.fill("key", chunks.chunks(), cache.lock("key"))
+        chunks.started.wait(5)
+
+        follower = cache.follow("key", timeout=0)
+        chunks.carry_on.set()
+
+        assert b"".join(follower) == b"abcd"
+        assert b"".join(filled) == b"abcd"
+
+    def test_follow_reads_what_was_written_before_the_file_was_finished(
+        self, cache, patch
+    ):
+        chunks = Blocking([b"ab", b"cd"])
+        filled = cache.fill("key", chunks.chunks(), cache.lock("key"))
+        chunks.started.wait(5)
+        follower = cache.follow("key", timeout=0)
+        assert next(follower) == b"ab"
+
+        def finish_filling(_self, key):
+            # The rest is written between us reading and checking the lock
+            chunks.carry_on.set()
+            wait_for_lock(cache, key)
+            return False
+
+        patch("via.cache.DiskCache._is_locked", side_effect=finish_filling)
+
+        assert b"".join(follower) == b"cd"
+        assert b"".join(filled) == b"abcd"
+
+    def test_follow_waits_for_the_file_to_be_started(self, cache, sleep):
+        lock = cache.lock("key")
+        chunks = Blocking([b"ab", b"cd"])
+        filled = []
+
+        def start_filling(_seconds):
+            if not filled:
+                filled.append(cache.fill("key", chunks.chunks(), lock))
+
+        sleep.side_effect = start_filling
+
+        follower = cache.follow("key", timeout=10)
+        chunks.carry_on.set()
+
+        assert b"".join(follower) == b"abcd"
+        assert b"".join(filled[0]) == b"abcd"
+
+    def test_follow_times_out(self, cache, sleep):
+        lock = cache.lock("key")
+
+        assert cache.follow("key", timeout=0.1) is None
+
+        sleep.assert_called_with(DiskCache.POLL_INTERVAL)
+        lock.close()
+
+    def test_follow_returns_None_if_nobody_is_filling(self, cache):
+        assert cache.follow("key", timeout=10) is None
+
+    def test_follow_returns_None_for_abandoned_files(self, cache, partial):
+        partial.write_bytes(b"left behind")
+
+        assert cache.follow("key", timeout=10) is None
+
+    def test_follow_returns_None_if_it_cant_lock(self, cache, partial, patch):
+        partial.write_bytes(b"left behind")
+        patch("via.cache.fcntl.flock", side_effect=OSError)
+
+        assert cache.follow("key", timeout=10) is None
+
+    def test_follow_returns_None_if_it_cant_read(self, tmp_path):
+        (tmp_path / "file").write_bytes(b"")
+        cache = DiskCache(tmp_path / "file", max_bytes=10, ttl=100)
+
+        assert cache.follow("key", timeout=10) is None
+
+    @pytest.mark.parametrize("chunks", [[b"ab"], [b"a" * 20]])
+    def test_tee_releases_the_lock(self, cache, chunks):
+        consume(cache.tee("key", chunks, cache.lock("key")))
+
+        cache.lock("key").close()
+
+    def test_stats(self, cache):
+        assert cache.stats == {
+            "hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "max_bytes": 10,
+        }
+
+    @pytest.fixture
+    def clock(self):
+        return Mock(return_value=1000000)
+
+    @pytest.fixture
+    def cache(self, tmp_path, clock):
+        return DiskCache(tmp_path, max_bytes=10, ttl=100, clock=clock)
+
+    @pytest.fixture
+    def partial(self, cache, tmp_path):
+        return tmp_path / f"{DiskCache.PARTIAL_PREFIX}{cache._path('key').name}"  # noqa: SLF001
+
+    @pytest.fixture
+    def NamedTemporaryFile(self, patch):
+        return patch("via.cache.NamedTemporaryFile")
+
+    @pytest.fixture
+    def sleep(self, patch):
+        return patch("via.cache.sleep")
+
+
+class TestSingleFlight:
+    def test_it_returns_the_result(self, single_flight):
+        func = Mock()
+
+        result = single_flight.do("key", func, "arg", kwarg="kwarg")
+
+        func.assert_called_once_with("arg", kwarg="kwarg")
+        assert result == func.return_value
+
+    def test_it_shares_results_between_concurrent_calls(self, single_flight, futures):
+        started, finish = Event(), Event()
+
+        def slow_func():
+            started.set()
+            finish.wait()
+            return "result"
+
+        leader = Thread(target=single_flight.do, args=("key", slow_func))
+        leader.start()
+        started.wait()
+
+        results = []
+        follower = Thread(
+            target=lambda: results.append(single_flight.do("key", Mock()))
+        )
+        follower.start()
+        futures.created[0].waiting.wait(5)
+        finish.set()
+        leader.join()
+        follower.join()
+
+        assert results == ["result"]
+        assert single_flight.stats == {"calls": 1, "shared": 1, "in_flight": 0}
+
+    def test_it_shares_exceptions_between_concurrent_calls(
+        self, single_flight, futures
+    ):
+        started, finish = Event(), Event()
+
+        def slow_func():
+            started.set()
+            finish.wait()
+            raise ValueError
+
+        errors = []
+
+        def call():
+            try:
+                single_flight.do("key", slow_func)
+            except ValueError as err:
+                errors.append(err)
+
+        threads = [Thread(target=call) for _ in range(2)]
+        threads[0].start()
+        started.wait()
+        threads[1].start()
+        futures.created[0].waiting.wait(5)
+        finish.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(errors) == 2
+        assert single_flight.stats["in_flight"] == 0
+
+    def test_it_doesnt_share_between_keys_or_sequential_calls(self, single_flight):
+        single_flight.do("key", Mock())
+        single_flight.do("key", Mock())
+        single_flight.do("other_key", Mock())
+
+        assert single_flight.stats == {"calls": 3, "shared": 0, "in_flight": 0}
+
+    @pytest.fixture
+    def single_flight(self):
+        return SingleFlight()
+
+
+class TestBatcher:
+    def test_it_returns_the_result_for_the_key(self, batcher):
+        func = Mock(return_value={"key": "result"})
+
+        result = batcher.do("key", func)
+
+        func.assert_called_once_with(["key"])
+        assert result == "result"
+
+    def test_it_returns_None_for_missing_keys(self, batcher):
+        assert batcher.do("key", Mock(return_value={})) is None
+
+    def test_it_batches_concurrent_calls(self):
+        batcher = Batcher(max_size=3, max_wait=10)
+        func = Mock(side_effect=lambda keys: {key: key.upper() for key in keys})
+        results = {}
+
+        def call(key):
+            results[key] = batcher.do(key, func)
+
+        # The batch is sent as soon as it's full, without waiting
+        threads = [Thread(target=call, args=(key,)) for key in ("a", "b", "c")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        func.assert_called_once_with(Any.list.containing(["a", "b", "c"]).only())
+        assert results == {"a": "A", "b": "B", "c": "C"}
+        assert batcher.stats == {"calls": 1, "keys": 3}
+
+    def test_it_only_asks_for_each_key_once(self, futures):
+        batcher = Batcher(max_size=2, max_wait=10)
+        func = Mock(side_effect=lambda keys: {key: key.upper() for key in keys})
+        results = []
+
+        def call(key):
+            results.append(batcher.do(key, func))
+
+        leader = Thread(target=call, args=("a",))
+        leader.start()
+        futures.created_any.wait(5)
+        follower = Thread(target=call, args=("a",))
+        follower.start()
+        futures.created[0].waiting.wait(5)
+        call("b")
+        leader.join()
+        follower.join()
+
+        func.assert_called_once_with(["a", "b"])
+        assert sorted(results) == ["A", "A", "B"]
+
+    def test_it_shares_exceptions_between_concurrent_calls(self):
+        batcher = Batcher(max_size=2, max_wait=10)
+        errors = []
+
+        def call(key):
+            try:
+                batcher.do(key, Mock(side_effect=ValueError))
+            except ValueError as err:
+                errors.append(err)
+
+        threads = [Thread(target=call, args=(key,)) for key in ("a", "b")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(errors) == 2
+
+    def test_it_starts_a_new_batch_for_later_calls(self, batcher):
+        func = Mock(return_value={})
+
+        batcher.do("a", func)
+        batcher.do("b", func)
+
+        assert func.call_count == 2
+        assert batcher.stats == {"calls": 2, "keys": 2}
+
+    @pytest.fixture
+    def batcher(self):
+        return Batcher(max_size=10, max_wait=0)
+
+
+def consume(iterable):
+    for _ in iterable:
+        pass
+
+
+@pytest.fixture
+def futures(patch):
+    futures = Futures()
+    patch("via.cache.Future", side_effect=futures.create)
+    return futures
+
+
+class Futures:
+    """Records the futures the code under test creates."""
+
+    def __init__(self):
+        self.created = []
+        self.created_any = Event()
+
+    def create(self):
+        future = WaitableFuture()
+        self.created.append(future)
+        self.created_any.set()
+        return future
+
+
+class WaitableFuture(Future):
+    """A future which lets us know when something waits for its result."""
+
+    def __init__(self):
+        super().__init__()
+        self.waiting = Event()
+
+    def result(self, timeout=None):
+        self.waiting.set()
+        return super().result(timeout)
+
+
+class Blocking:
+    """Chunks which wait to be told to carry on part way through."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.started = Event()
+        self.carry_on = Event()
+        self.closed = False
+
+    def chunks(self):
+        try:
+            first, *rest = self._chunks
+            yield first
+            self.started.set()
+            self.carry_on.wait(5)
+            yield from rest
+        finally:
+            self.closed = True
+
+
+def wait_for_lock(cache, key):
+    """Wait for whoever has the lock for `key` to release it."""
+    deadline = monotonic() + 5
+    while not (lock := cache.lock(key)):
+        assert monotonic() < deadline
+        sleep(0.01)
+
+    lock.close()
@@ -0,0 +1,128 @@
+from unittest.mock import Mock
+
+import pytest
+
+from via.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class TestCircuitBreaker:
+    def test_it_passes_calls_through(self, breaker):
+        func = Mock()
+
+        result = breaker.call(func, "arg", kwarg="kwarg")
+
+        func.assert_called_once_with("arg", kwarg="kwarg")
+        assert result == func.return_value
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_it_passes_errors_through(self, breaker):
+        with pytest.raises(ValueError):  # noqa: PT011
+            breaker.call(Mock(side_effect=ValueError))
+
+    def test_it_opens_when_enough_calls_fail(self, breaker):
+        breaker.call(Mock())
+        breaker.call(Mock())
+        fail_calls(breaker, 1)
+        assert breaker.state == CircuitBreaker.CLOSED
+
+        fail_calls(breaker, 1)
+
+        assert breaker.state == CircuitBreaker.OPEN
+        func = Mock()
+        with pytest.raises(CircuitOpenError):
+            breaker.call(func)
+        func.assert_not_called()
+
+    def test_it_needs_a_minimum_number_of_calls_to_open(self, breaker):
+        fail_calls(breaker, 3)
+
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_it_only_looks_at_recent_calls(self, breaker):
+        for _ in range(4):
+            breaker.call(Mock())
+
+        fail_calls(breaker, 2)
+
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_it_ignores_errors_which_arent_failures(self):
+        breaker = CircuitBreaker(
+            min_calls=1, is_failure=lambda exc: not isinstance(exc, KeyError)
+        )
+
+        with pytest.raises(KeyError):
+            breaker.call(Mock(side_effect=KeyError))
+
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_it_lets_a_probe_through_after_the_reset_timeout(self, open_breaker, clock):
+        clock.return_value += 30
+
+        assert open_breaker.state == CircuitBreaker.HALF_OPEN
+        open_breaker.call(Mock())
+
+        assert open_breaker.state == CircuitBreaker.CLOSED
+        assert open_breaker.stats["recent_calls"] == 0
+
+    def test_it_reopens_if_the_probe_fails(self, open_breaker, clock):
+        clock.return_value += 30
+
+        fail_calls(open_breaker, 1)
+
+        assert open_breaker.state == CircuitBreaker.OPEN
+        assert open_breaker.stats["times_opened"] == 2
+
+    def test_it_only_lets_one_probe_through(self, open_breaker, clock):
+        clock.return_value += 30
+
+        def probe():
+            with pytest.raises(CircuitOpenError):
+                open_breaker.call(Mock())
+
+        open_breaker.call(probe)
+
+        assert open_breaker.state == CircuitBreaker.CLOSED
+
+    def test_it_ignores_calls_which_finish_after_it_opens(self, breaker):
+        def slow_call():
+            fail_calls(breaker, 4)
+            raise ValueError
+
+        with pytest.raises(ValueError):  # noqa: PT011
+            breaker.call(slow_call)
+
+        assert breaker.stats["recent_failures"] == 4
+
+    def test_stats(self, open_breaker):
+        with pytest.raises(CircuitOpenError):
+            open_breaker.call(Mock())
+
+        assert open_breaker.stats == {
+            "state": CircuitBreaker.OPEN,
+            "recent_calls": 4,
+            "recent_failures": 4,
+            "times_opened": 1,
+            "rejected": 1,
+        }
+
+    @pytest.fixture
+    def clock(self):
+        return Mock(return_value=100)
+
+    @pytest.fixture
+    def breaker(self, clock):
+        return CircuitBreaker(
+            failure_rate=0.5, window=4, min_calls=4, reset_timeout=30, clock=clock
+        )
+
+    @pytest.fixture
+    def open_breaker(self, breaker):
+        fail_calls(breaker, 4)
+        return breaker
+
+
+def fail_calls(breaker, count):
+    for _ in range(count):
+        with pytest.raises(ValueError):  # noqa: PT011
+            breaker.call(Mock(side_effect=ValueError))
@@ -0,0 +1,79 @@
+from unittest.mock import Mock
+
+import pytest
+from h_vialib.secure import Encryption
+from joserfc.errors import JoseError
+
+from via.decryption import DecryptionService
+
+SECRET = b"not_a_real_secret"
+
+
+class TestDecryptionService:
+    def test_it_decrypts_dicts(self, service, encrypt):
+        assert service.decrypt_dict(encrypt({"key": "value"})) == {"key": "value"}
+
+    def test_it_remembers_decrypted_dicts(self, service, encrypt, Encryption):
+        encrypted = encrypt({"key": "value"})
+
+        service.decrypt_dict(encrypted)
+        decrypted = service.decrypt_dict(encrypted)
+
+        assert decrypted == {"key": "value"}
+        Encryption.return_value.decrypt_dict.assert_called_once_with(encrypted)
+        assert service.stats == {"hits": 1, "misses": 1, "size": 1, "maxsize": 2}
+
+    def test_callers_cant_change_what_it_remembers(self, service, encrypt):
+        encrypted = encrypt({"key": "value"})
+
+        service.decrypt_dict(encrypted)["key"] = "changed"
+        service.decrypt_dict(encrypted)["key"] = "changed"
+
+        assert service.decrypt_dict(encrypted) == {"key": "value"}
+
+    def test_it_evicts_and_empties_the_least_recently_used_dict(
+        self, service, encrypt, Encryption
+    ):
+        encrypted = [encrypt({"key": i}) for i in range(3)]
+        service.decrypt_dict(encrypted[0])
+        service.decrypt_dict(encrypted[1])
+        service.decrypt_dict(encrypted[0])
+        remembered = service._decrypted[encrypted[1]]  # noqa: SLF001
+
+        service.decrypt_dict(encrypted[2])
+
+        assert not remembered
+        assert service.stats["size"] == 2
+        Encryption.return_value.decrypt_dict.reset_mock()
+        service.decrypt_dict(encrypted[0])
+        Encryption.return_value.decrypt_dict.assert_not_called()
+        service.decrypt_dict(encrypted[1])
+        Encryption.return_value.decrypt_dict.assert_called_once_with(encrypted[1])
+
+    def test_it_doesnt_remember_long_values(self, encrypt):
+        service = DecryptionService(SECRET, max_length=10)
+
+        service.decrypt_dict(encrypt({"key": "value"}))
+
+        assert service.stats["size"] == 0
+
+    def test_it_raises_if_it_cant_decrypt(self, service):
+        with pytest.raises(JoseError):
+            service.decrypt_dict("not.encrypted.at.all.")
+
+        assert service.stats["size"] == 0
+
+    @pytest.fixture
+    def service(self, Encryption):  # noqa: ARG002
+        return DecryptionService(SECRET, max_size=2)
+
+    @pytest.fixture
+    def encrypt(self):
+        return Encryption(SECRET).encrypt_dict
+
+    @pytest.fixture(autouse=True)
+    def Encryption(self, patch):
+        Encryption_ = patch("via.decryption.Encryption")
+        # Wrap the real thing so we can see when it's called
+        Encryption_.return_value = Mock(wraps=Encryption(SECRET))
+        return Encryption_
@@ -0,0 +1,41 @@
+import gzip
+import json
+
+from via.models import Transcript
+
+
+class TestTranscript:
+    def test_it_counts_segments(self):
+        transcript = Transcript(
+            video_id="video_id", transcript_id="transcript_id", transcript=[{}, {}]
+        )
+
+        assert transcript.segment_count == 2
+
+        transcript.transcript = []
+
+        assert transcript.segment_count == 0
+
+    def test_it_encodes_the_body(self):
+        transcript = Transcript(
+            video_id="video_id", transcript_id="transcript_id", transcript=SEGMENTS
+        )
+
+        assert json.loads(gzip.decompress(transcript.body)) == {
+            "data": {
+                "type": "transcripts",
+                "id": "video_id",
+                "attributes": {"segments": SEGMENTS},
+            }
+        }
+
+    def test_it_encodes_the_same_transcript_the_same_way(self):
+        first, second = (
+            Transcript(video_id="video_id", transcript_id=id_, transcript=SEGMENTS)
+            for id_ in ("first", "second")
+        )
+
+        assert first.body == second.body
+
+
+SEGMENTS = [{"text": "Hello", "start": 0.0, "duration": 1.5}]
@@ -1,7 +1,7 @@
 from collections import OrderedDict
-from unittest.mock import sentinel
 
 import pytest
+from h_vialib.secure import Encryption
 
 from via.requests_tools.headers import (
     BANNED_HEADERS,
@@ -62,22 +62,19 @@ class TestAddHeaders:
             "X-Existing": "existing",
         }
 
-    def test_with_request_secret_headers(self, pyramid_request, Encryption):
-        pyramid_request.params["via.secret.headers"] = sentinel.headers
-        Encryption.return_value.decrypt_dict.return_value = {"SECRET-HEADER": "VALUE"}
+    def test_with_request_secret_headers(self, pyramid_request, decryption_service):
+        encryption = Encryption(
+            pyramid_request.registry.settings["via_secret"].encode("utf-8")
+        )
+        pyramid_request.params["via.secret.headers"] = encryption.encrypt_dict(
+            {"SECRET-HEADER": "VALUE"}
+        )
 
         headers = add_request_headers({}, request=pyramid_request)
 
-        Encryption.assert_called_once_with(
-            pyramid_request.registry.settings["via_secret"].encode("utf-8")
-        )
-        Encryption.return_value.decrypt_dict.assert_called_once_with(sentinel.headers)
+        assert decryption_service.stats["misses"] == 1
         assert headers == {
             "X-Abuse-Policy": "https://web.hypothes.is/abuse-policy/",
             "X-Complaints-To": "https://web.hypothes.is/report-abuse/",
             "SECRET-HEADER": "VALUE",
         }
-
-    @pytest.fixture
-    def Encryption(self, patch):
-        return patch("via.requests_tools.headers.Encryption")
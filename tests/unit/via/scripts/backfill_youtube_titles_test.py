@@ -0,0 +1,30 @@
+from unittest.mock import sentinel
+
+from via.scripts.backfill_youtube_titles import backfill_titles
+
+
+class TestBackfillTitles:
+    def test_it(self, youtube_service):
+        youtube_service.get_video_id.side_effect = lambda line: (
+            "url_video_id" if line.startswith("https://") else None
+        )
+        youtube_service.get_video_titles.return_value = {
+            "video_id": sentinel.title,
+            "url_video_id": sentinel.url_title,
+        }
+
+        titles, missing_ids = backfill_titles(
+            youtube_service,
+            [
+                "video_id\n",
+                "\n",
+                "https://www.youtube.com/watch?v=url_video_id\n",
+                "  missing_video_id  \n",
+            ],
+        )
+
+        youtube_service.get_video_titles.assert_called_once_with(
+            ["video_id", "url_video_id", "missing_video_id"]
+        )
+        assert titles == youtube_service.get_video_titles.return_value
+        assert missing_ids == ["missing_video_id"]
@@ -1,5 +1,7 @@
+from datetime import UTC, datetime
 from unittest.mock import sentinel
 
+import jwt
 import pytest
 from h_matchers import Any
 from pyramid.security import Allowed, Denied
@@ -39,6 +41,63 @@ class TestViaSecurityPolicy:
             {"msg": "Valid JWT provided"}
         )
 
+    @pytest.mark.usefixtures("with_valid_authorization_header")
+    def test_permits_only_decodes_each_jwt_once(self, pyramid_request, decode):
+        policy = ViaSecurityPolicy()
+
+        policy.permits(pyramid_request, sentinel.context, "api")
+        result = policy.permits(pyramid_request, sentinel.context, "api")
+
+        assert result == Any.instance_of(Allowed)
+        decode.assert_called_once()
+
+    @pytest.mark.usefixtures("with_valid_authorization_header")
+    def test_permits_doesnt_remember_jwts_past_their_expiry(
+        self, pyramid_request, decode, patch
+    ):
+        policy = ViaSecurityPolicy()
+        # The JWT is still valid when we decode it, but only just
+        patch("via.security.time", return_value=2**32)
+        decode.side_effect = lambda *_args, **_kwargs: {"exp": 2**32}
+
+        policy.permits(pyramid_request, sentinel.context, "api")
+        policy.permits(pyramid_request, sentinel.context, "api")
+
+        assert decode.call_count == 2
+
+    def test_encode_jwt(self, pyramid_request, quantized_expiry):
+        encoded_jwt = ViaSecurityPolicy.encode_jwt(pyramid_request)
+
+        assert jwt.decode(
+            encoded_jwt,
+            pyramid_request.registry.settings["api_jwt_secret"],
+            algorithms=["HS256"],
+            options={"verify_exp": False},
+        ) == {"exp": int(quantized_expiry.return_value.timestamp())}
+
+    def test_encode_jwt_reuses_jwts_within_a_window(self, pyramid_request, patch):
+        encode = patch("via.security.jwt.encode", side_effect=jwt.encode)
+
+        encoded_jwts = {ViaSecurityPolicy.encode_jwt(pyramid_request) for _ in range(3)}
+
+        assert len(encoded_jwts) == 1
+        encode.assert_called_once()
+
+    @pytest.fixture
+    def decode(self, patch):
+        return patch("via.security.jwt.decode", side_effect=jwt.decode)
+
+    @pytest.fixture(autouse=True)
+    def clear_encoded_jwts(self):
+        ViaSecurityPolicy._encoded_jwts.clear()  # noqa: SLF001
+
+    @pytest.fixture
+    def quantized_expiry(self, patch):
+        return patch(
+            "via.security.quantized_expiry",
+            return_value=datetime(2020, 2, 8, 17, 30, 21, tzinfo=UTC),
+        )
+
     @pytest.fixture
     def with_valid_authorization_header(self, pyramid_request):
         pyramid_request.headers["Authorization"] = (
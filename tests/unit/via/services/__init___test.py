@@ -1,9 +1,19 @@
+from pathlib import Path
 from unittest.mock import call, sentinel
 
 import pytest
+from h_matchers import Any
+from sqlalchemy.exc import OperationalError
 
+from via.cache import TTLCache
 from via.exceptions import ConfigurationError
-from via.services import create_google_api, load_injected_json
+from via.services import (
+    create_google_api,
+    create_http_adapter,
+    create_pdf_cache,
+    create_youtube_title_cache,
+    load_injected_json,
+)
 
 
 class TestLoadInjectedJSON:
@@ -38,21 +48,29 @@ class TestCreateGoogleAPI:
             sentinel.resource_keys,
         )
 
-        api = create_google_api(sentinel.settings)
+        settings = {"web_threads": "50"}
+
+        api = create_google_api(settings)
 
         load_injected_json.assert_has_calls(
             [
-                call(sentinel.settings, "google_drive_credentials.json"),
-                call(sentinel.settings, "google_drive_resource_keys.json"),
+                call(settings, "google_drive_credentials.json"),
+                call(settings, "google_drive_resource_keys.json"),
             ]
         )
 
         GoogleDriveAPI.assert_called_once_with(
             credentials_list=sentinel.credentials_list,
             resource_keys=sentinel.resource_keys,
+            pool_maxsize=50,
         )
         assert api == GoogleDriveAPI.return_value
 
+    def test_it_with_defaults(self, GoogleDriveAPI):
+        create_google_api({})
+
+        assert GoogleDriveAPI.call_args.kwargs["pool_maxsize"] is None
+
     @pytest.fixture(autouse=True)
     def load_injected_json(self, patch):
         return patch("via.services.load_injected_json")
@@ -60,3 +78,98 @@ class TestCreateGoogleAPI:
     @pytest.fixture(autouse=True)
     def GoogleDriveAPI(self, patch):
         return patch("via.services.GoogleDriveAPI")
+
+
+class TestCreateHTTPAdapter:
+    def test_it(self, PooledHTTPAdapter):
+        adapter = create_http_adapter({"web_threads": "50"})
+
+        PooledHTTPAdapter.assert_called_once_with(pool_maxsize=50)
+        assert adapter == PooledHTTPAdapter.return_value
+
+    def test_it_with_defaults(self, PooledHTTPAdapter):
+        create_http_adapter({})
+
+        PooledHTTPAdapter.assert_called_once_with()
+
+    @pytest.fixture(autouse=True)
+    def PooledHTTPAdapter(self, patch):
+        return patch("via.services.PooledHTTPAdapter")
+
+
+class TestCreatePDFCache:
+    def test_it(self, DiskCache):
+        cache = create_pdf_cache(
+            {"pdf_cache_directory": "/pdfs", "pdf_cache_max_mb": "2"}
+        )
+
+        DiskCache.assert_called_once_with("/pdfs", max_bytes=2097152, ttl=43200)
+        assert cache == DiskCache.return_value
+
+    def test_it_with_defaults(self, DiskCache):
+        create_pdf_cache({})
+
+        DiskCache.assert_called_once_with(
+            Path("/tmp/via-pdf-cache"),  # noqa: S108
+            max_bytes=1073741824,
+            ttl=43200,
+        )
+
+    def test_it_can_be_disabled(self, DiskCache):
+        create_pdf_cache({"pdf_cache_max_mb": "0"})
+
+        assert DiskCache.call_args.kwargs["max_bytes"] == 0
+
+    @pytest.fixture(autouse=True)
+    def gettempdir(self, patch):
+        return patch("via.services.gettempdir", return_value="/tmp")  # noqa: S108
+
+    @pytest.fixture(autouse=True)
+    def DiskCache(self, patch):
+        return patch("via.services.DiskCache")
+
+
+class TestCreateYouTubeTitleCache:
+    def test_it(self, warm_title_cache, create_engine):
+        cache = create_youtube_title_cache({})
+
+        assert cache == Any.instance_of(TTLCache)
+        create_engine.assert_not_called()
+        warm_title_cache.assert_not_called()
+
+    def test_it_can_warm_the_cache(self, warm_title_cache, create_engine, Session):
+        cache = create_youtube_title_cache(
+            {"database_url": sentinel.database_url, "youtube_title_cache_warm": "100"}
+        )
+
+        create_engine.assert_called_once_with(sentinel.database_url)
+        Session.assert_called_once_with(create_engine.return_value)
+        warm_title_cache.assert_called_once_with(
+            Session.return_value.__enter__.return_value, cache, limit=100
+        )
+        create_engine.return_value.dispose.assert_called_once_with()
+
+    def test_it_carries_on_if_it_cant_warm_the_cache(
+        self, warm_title_cache, create_engine, caplog
+    ):
+        warm_title_cache.side_effect = OperationalError("statement", {}, Exception())
+
+        cache = create_youtube_title_cache(
+            {"database_url": sentinel.database_url, "youtube_title_cache_warm": "100"}
+        )
+
+        assert cache == Any.instance_of(TTLCache)
+        assert caplog.messages == ["Could not warm the YouTube title cache"]
+        create_engine.return_value.dispose.assert_called_once_with()
+
+    @pytest.fixture(autouse=True)
+    def warm_title_cache(self, patch):
+        return patch("via.services.warm_title_cache")
+
+    @pytest.fixture(autouse=True)
+    def create_engine(self, patch):
+        return patch("via.services.create_engine")
+
+    @pytest.fixture(autouse=True)
+    def Session(self, patch):
+        return patch("via.services.Session")
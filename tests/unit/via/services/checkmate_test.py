@@ -1,13 +1,225 @@
-from unittest.mock import create_autospec, sentinel
+from unittest.mock import Mock, create_autospec, sentinel
 
 import pytest
 from checkmatelib import BadURL as CheckmateBadURL
 from checkmatelib import CheckmateException
 from checkmatelib.client import BlockResponse
+from checkmatelib.exceptions import CheckmateServiceError
 from pyramid.httpexceptions import HTTPTemporaryRedirect
+from requests import exceptions
 
+from via.circuit_breaker import CircuitBreaker
 from via.exceptions import BadURL
-from via.services.checkmate import CheckmateService, factory
+from via.services.checkmate import (
+    CheckmateService,
+    CheckmateVerdictCache,
+    PooledCheckmateClient,
+    factory,
+)
+
+
+class TestPooledCheckmateClient:
+    def test_check_url(self, client, session):
+        session.get.return_value.status_code = 204
+
+        result = client.check_url(
+            "http://example.com/",
+            allow_all=True,
+            blocked_for="lms",
+            ignore_reasons="reason",
+        )
+
+        session.get.assert_called_once_with(
+            "http://checkmate.example.com/api/check",
+            params={
+                "url": "http://example.com/",
+                "allow_all": True,
+                "blocked_for": "lms",
+                "ignore_reasons": "reason",
+            },
+            timeout=PooledCheckmateClient.TIMEOUT,
+            auth=("api_key", ""),
+        )
+        session.get.return_value.raise_for_status.assert_called_once_with()
+        assert result is None
+
+    def test_check_url_with_defaults(self, session):
+        client = PooledCheckmateClient(
+            host="http://checkmate.example.com/", api_key=None, session=session
+        )
+        session.get.return_value.status_code = 204
+
+        client.check_url("http://example.com/")
+
+        assert session.get.call_args.kwargs["params"] == {"url": "http://example.com/"}
+        assert session.get.call_args.kwargs["auth"] is None
+
+    def test_check_url_when_blocked(self, client, session):
+        session.get.return_value.status_code = 200
+        session.get.return_value.json.return_value = {
+            "data": [{"id": "malicious"}],
+            "links": {"html": "http://checkmate.example.com/view_error"},
+        }
+
+        result = client.check_url("http://example.com/")
+
+        assert result.presentation_url == "http://checkmate.example.com/view_error"
+
+    def test_check_url_with_bad_json(self, client, session):
+        session.get.return_value.status_code = 200
+        session.get.return_value.json.side_effect = ValueError
+
+        with pytest.raises(CheckmateServiceError):
+            client.check_url("http://example.com/")
+
+    def test_check_url_translates_errors(self, client, session):
+        session.get.side_effect = exceptions.ConnectTimeout("Timeout")
+
+        with pytest.raises(CheckmateServiceError):
+            client.check_url("http://example.com/")
+
+    def test_check_url_fails_fast_when_checkmate_is_down(self, client, session):
+        session.get.side_effect = exceptions.ConnectTimeout("Timeout")
+        for _ in range(5):
+            with pytest.raises(CheckmateServiceError):
+                client.check_url("http://example.com/")
+        session.get.reset_mock()
+
+        with pytest.raises(CheckmateServiceError):
+            client.check_url("http://example.com/")
+
+        session.get.assert_not_called()
+        assert client.circuit_breaker.state == CircuitBreaker.OPEN
+
+    def test_bad_urls_dont_count_as_failures(self, client):
+        for _ in range(5):
+            with pytest.raises(CheckmateBadURL):
+                client.check_url("http://localhost.invalid/")
+
+        assert client.circuit_breaker.state == CircuitBreaker.CLOSED
+
+    @pytest.fixture
+    def session(self):
+        return Mock(spec_set=["get"])
+
+    @pytest.fixture
+    def client(self, session):
+        return PooledCheckmateClient(
+            host="http://checkmate.example.com/", api_key="api_key", session=session
+        )
+
+
+class TestCheckmateVerdictCache:
+    def test_it_checks_on_a_miss(self, cache, check):
+        verdict = cache.get("key", check, "url")
+
+        check.assert_called_once_with("url")
+        assert verdict == check.return_value
+        assert cache.stats["misses"] == 1
+
+    @pytest.mark.parametrize("verdict", [None, sentinel.block_response])
+    def test_it_caches_verdicts(self, cache, check, verdict):
+        check.return_value = verdict
+        cache.get("key", check, "url")
+
+        assert cache.get("key", check, "url") == verdict
+        check.assert_called_once()
+        assert cache.stats["hits"] == 1
+
+    def test_it_serves_stale_allowed_verdicts_while_it_refreshes(
+        self, cache, check, clock, executor
+    ):
+        check.return_value = None
+        cache.get("key", check, "url")
+        clock.return_value += 301
+        check.return_value = sentinel.block_response
+
+        assert cache.get("key", check, "url") is None
+
+        executor.submit.assert_called_once()
+        assert cache.stats["stale_hits"] == 1
+        assert cache.stats["refreshing"] == 1
+        # Only one refresh at a time
+        cache.get("key", check, "url")
+        executor.submit.assert_called_once()
+
+        # Once the refresh is done, we have the new verdict
+        func, *args = executor.submit.call_args.args
+        func(*args)
+        assert cache.get("key", check, "url") == sentinel.block_response
+        assert cache.stats["refreshing"] == 0
+
+    def test_it_keeps_stale_verdicts_if_refreshing_fails(
+        self, cache, check, clock, executor
+    ):
+        check.return_value = None
+        cache.get("key", check, "url")
+        clock.return_value += 301
+        check.side_effect = CheckmateException
+
+        cache.get("key", check, "url")
+        func, *args = executor.submit.call_args.args
+        func(*args)
+
+        assert cache.stats["refresh_failures"] == 1
+        assert cache.stats["refreshing"] == 0
+        assert cache.get("key", check, "url") is None
+
+    @pytest.mark.parametrize(
+        "verdict,age,expected_checks",  # noqa: PT006
+        [
+            (None, 3899, 1),
+            (None, 3900, 2),
+            (sentinel.block_response, 59, 1),
+            (sentinel.block_response, 60, 2),
+        ],
+    )
+    def test_verdicts_expire(self, cache, check, clock, verdict, age, expected_checks):
+        check.return_value = verdict
+        cache.get("key", check, "url")
+        clock.return_value += age
+
+        cache.get("key", check, "url")
+
+        assert check.call_count == expected_checks
+
+    def test_it_doesnt_cache_errors(self, cache, check):
+        check.side_effect = CheckmateException
+
+        for _ in range(2):
+            with pytest.raises(CheckmateException):
+                cache.get("key", check, "url")
+
+        assert check.call_count == 2
+
+    def test_stats(self, cache):
+        assert cache.stats == {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "refreshing": 0,
+            "refresh_failures": 0,
+            "size": 0,
+        }
+
+    def test_it_creates_an_executor(self):
+        assert CheckmateVerdictCache()._executor  # noqa: SLF001
+
+    @pytest.fixture
+    def check(self):
+        return Mock(return_value=None)
+
+    @pytest.fixture
+    def clock(self):
+        return Mock(return_value=100)
+
+    @pytest.fixture
+    def executor(self):
+        return Mock(spec_set=["submit"])
+
+    @pytest.fixture
+    def cache(self, executor, clock):
+        return CheckmateVerdictCache(executor=executor, clock=clock)
 
 
 class TestCheckmateService:
@@ -71,13 +283,27 @@ class TestCheckmateService:
 
         svc.raise_if_blocked(sentinel.url)
 
+    def test_raise_if_blocked_caches_verdicts(self, checkmate_client, svc):
+        checkmate_client.check_url.return_value = None
+
+        svc.raise_if_blocked(sentinel.url)
+        svc.raise_if_blocked(sentinel.url)
+
+        checkmate_client.check_url.assert_called_once()
+
+    def test_check_url_doesnt_use_the_cache(self, checkmate_client, svc):
+        svc.check_url(sentinel.url)
+        svc.check_url(sentinel.url)
+
+        assert checkmate_client.check_url.call_count == 2
+
     @pytest.fixture
     def block_response(self):
         return create_autospec(BlockResponse, instance=True, spec_set=True)
 
     @pytest.fixture
-    def checkmate_client(self, CheckmateClient):
-        return CheckmateClient.return_value
+    def checkmate_client(self):
+        return create_autospec(PooledCheckmateClient, instance=True, spec_set=True)
 
     @pytest.fixture
     def svc(self, checkmate_client):
@@ -86,24 +312,30 @@ class TestCheckmateService:
             allow_all=sentinel.allow_all,
             blocked_for=sentinel.blocked_for,
             ignore_reasons=sentinel.ignore_reasons,
+            verdict_cache=CheckmateVerdictCache(executor=Mock()),
         )
 
 
 class TestFactory:
-    def test_it(self, pyramid_request, CheckmateClient, CheckmateService):
+    def test_it(
+        self,
+        pyramid_request,
+        CheckmateService,
+        checkmate_verdict_cache,
+        pooled_checkmate_client,
+    ):
         svc = factory(sentinel.context, pyramid_request)
 
-        CheckmateClient.assert_called_once_with(
-            host=sentinel.url, api_key=sentinel.api_key
-        )
         CheckmateService.assert_called_once_with(
-            checkmate_client=CheckmateClient.return_value,
+            checkmate_client=pooled_checkmate_client,
             allow_all=sentinel.allow_all,
             blocked_for=None,
             ignore_reasons=sentinel.ignore_reasons,
+            verdict_cache=checkmate_verdict_cache,
         )
         assert svc == CheckmateService.return_value
 
+    @pytest.mark.usefixtures("checkmate_verdict_cache", "pooled_checkmate_client")
     def test_it_passes_the_via_blocked_for_query_param_to_CheckmateService(
         self, pyramid_request, CheckmateService
     ):
@@ -115,8 +347,6 @@ class TestFactory:
 
     @pytest.fixture
     def pyramid_request(self, pyramid_request):
-        pyramid_request.registry.settings["checkmate_url"] = sentinel.url
-        pyramid_request.registry.settings["checkmate_api_key"] = sentinel.api_key
         pyramid_request.registry.settings["checkmate_allow_all"] = sentinel.allow_all
         pyramid_request.registry.settings["checkmate_ignore_reasons"] = (
             sentinel.ignore_reasons
@@ -126,8 +356,3 @@ class TestFactory:
     @pytest.fixture(autouse=True)
     def CheckmateService(self, patch):
         return patch("via.services.checkmate.CheckmateService")
-
-
-@pytest.fixture(autouse=True)
-def CheckmateClient(patch):
-    return patch("via.services.checkmate.CheckmateClient")
@@ -1,13 +1,17 @@
 import json
-from unittest.mock import sentinel
+import logging
+from datetime import UTC, datetime
+from unittest.mock import Mock, PropertyMock, call, sentinel
 
 import importlib_resources
 import pytest
+from freezegun import freeze_time
 from h_matchers import Any
 from marshmallow import ValidationError
 from pyramid.httpexceptions import HTTPNotFound
 from pytest import param  # noqa: PT013
 from requests import TooManyRedirects
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError, InvalidJSONError
 
 from tests.common.requests_exceptions import make_requests_exception
@@ -17,7 +21,14 @@ from via.exceptions import (
     UnhandledUpstreamException,
     UpstreamServiceError,
 )
-from via.services.google_drive import GoogleDriveAPI, GoogleDriveErrorSchema
+from via.services.google_drive import (
+    CredentialPool,
+    GoogleDriveAPI,
+    GoogleDriveErrorSchema,
+    GoogleDriveFileMetadata,
+    PooledCredential,
+    TokenRefresher,
+)
 
 
 def load_fixture(filename):
@@ -71,14 +82,41 @@ class TestGoogleErrorBodySchema:
 
 class TestGoogleDriveAPI:
     @pytest.mark.usefixtures("api")
-    def test_it_builds_a_session_as_we_expect(self, Credentials, AuthorizedSession):
-        Credentials.from_service_account_info.assert_called_once_with(
-            {"valid": "credentials"}, scopes=GoogleDriveAPI.SCOPES
-        )
-        AuthorizedSession.assert_called_once_with(
+    def test_it_builds_sessions_as_we_expect(self, Credentials, AuthorizedSession):
+        assert Credentials.from_service_account_info.call_args_list == [
+            call({"valid": "credentials"}, scopes=GoogleDriveAPI.SCOPES),
+            call(
+                {"valid": "credentials_2", "client_email": "two@example.com"},
+                scopes=GoogleDriveAPI.SCOPES,
+            ),
+        ]
+        AuthorizedSession.assert_called_with(
             Credentials.from_service_account_info.return_value,
             refresh_timeout=GoogleDriveAPI.TIMEOUT,
         )
+        assert AuthorizedSession.call_count == 2
+        AuthorizedSession.return_value.mount.assert_not_called()
+
+    def test_it_sizes_the_connection_pools(self, AuthorizedSession):
+        GoogleDriveAPI([{"valid": "credentials"}], resource_keys={}, pool_maxsize=50)
+
+        AuthorizedSession.return_value.mount.assert_called_once_with(
+            "https://", Any.instance_of(HTTPAdapter)
+        )
+        adapter = AuthorizedSession.return_value.mount.call_args.args[1]
+        assert adapter.poolmanager.connection_pool_kw["maxsize"] == 50
+
+    @pytest.mark.usefixtures("api")
+    def test_it_starts_refreshing_tokens(self, Credentials, TokenRefresher):
+        TokenRefresher.assert_called_with(
+            Credentials.from_service_account_info.return_value
+        )
+        assert TokenRefresher.return_value.start.call_count == 2
+
+    def test_stream_file_makes_sure_the_token_is_valid(self, api, TokenRefresher):
+        api.stream_file("FILE_ID")
+
+        TokenRefresher.return_value.ensure_valid.assert_called_once_with()
 
     def test_it_with_bad_credentials(self, Credentials):
         # Google seems to raise plain ValueError's for bad config
@@ -88,11 +126,13 @@ class TestGoogleDriveAPI:
             GoogleDriveAPI([{"invalid": "credentials"}], resource_keys={})
 
     def test_it_with_functest_credentials(self, AuthorizedSession):
-        GoogleDriveAPI([{"disable": True}], resource_keys={})
+        api = GoogleDriveAPI([{"disable": True}], resource_keys={})
 
         # In functest mode we don't finish building the object at all. So
         # attempting to use it should fail in a spectacular and obvious way
         AuthorizedSession.assert_not_called()
+        # Apart from the stats, which the status page always includes
+        assert api.stats == {}
 
     def test_iter_file(self, api, AuthorizedSession):
         # This is all a bit black box, we don't necessarily know what all these
@@ -133,6 +173,161 @@ class TestGoogleDriveAPI:
             max_allowed_time=Any(),
         )
 
+    def test_stream_file(self, api, AuthorizedSession):
+        upstream = AuthorizedSession.return_value.request.return_value
+        upstream.status_code = 206
+        upstream.iter_content.return_value = [b"pdf content"]
+
+        response = api.stream_file(
+            "FILE_ID",
+            headers={"Range": "bytes=0-10", "Accept-Encoding": "identity"},
+        )
+
+        AuthorizedSession.return_value.request.assert_called_once_with(
+            "GET",
+            Any(),
+            headers=Any.dict().containing(
+                {"Range": "bytes=0-10", "Accept-Encoding": "identity"}
+            ),
+            stream=Any(),
+            timeout=Any(),
+            max_allowed_time=Any(),
+        )
+        assert response.status_code == 206
+        assert response.headers == upstream.headers
+        assert list(response.content) == [b"pdf content"]
+
+    def test_stream_file_spreads_requests_across_credentials(
+        self, sessions, TokenRefresher
+    ):
+        api = GoogleDriveAPI(
+            credentials_list=[{"valid": "credentials"}, {"valid": "credentials_2"}],
+            resource_keys={},
+        )
+
+        api.stream_file("FILE_ID")
+        api.stream_file("FILE_ID")
+
+        for session in sessions:
+            session.request.assert_called_once()
+        assert api.stats == {
+            "credentials_0": {
+                "requests": 1,
+                "rate_limited": 0,
+                "cooling_down": False,
+                "token": TokenRefresher.return_value.stats,
+            },
+            "credentials_1": {
+                "requests": 1,
+                "rate_limited": 0,
+                "cooling_down": False,
+                "token": TokenRefresher.return_value.stats,
+            },
+        }
+
+    def test_stream_file_rests_rate_limited_credentials(self, sessions, api):
+        sessions[
+            0
+        ].request.return_value.raise_for_status.side_effect = make_requests_exception(
+            HTTPError,
+            status_code=403,
+            json_data=load_fixture("google_403_rate_limited.json"),
+        )
+
+        api.stream_file("FILE_ID")
+        api.stream_file("FILE_ID")
+
+        sessions[0].request.assert_called_once()
+        assert sessions[1].request.call_count == 2
+        assert api.stats["credentials_0"] == Any.dict().containing(
+            {"requests": 1, "rate_limited": 1, "cooling_down": True}
+        )
+
+    def test_stream_file_when_every_credential_is_rate_limited(self, sessions, api):
+        for session in sessions:
+            session.request.return_value.raise_for_status.side_effect = (
+                make_requests_exception(
+                    HTTPError,
+                    status_code=429,
+                    json_data={"error": {"errors": [{"reason": "rateLimitExceeded"}]}},
+                )
+            )
+
+        with pytest.raises(GoogleDriveServiceError) as exception:
+            api.stream_file("FILE_ID")
+
+        assert exception.value.status_int == 429
+        for session in sessions:
+            session.request.assert_called_once()
+
+    def test_stream_file_doesnt_retry_other_errors(self, sessions, api):
+        sessions[
+            0
+        ].request.return_value.raise_for_status.side_effect = make_requests_exception(
+            HTTPError,
+            status_code=403,
+            json_data=load_fixture("google_403_not_shared.json"),
+        )
+
+        with pytest.raises(GoogleDriveServiceError):
+            api.stream_file("FILE_ID")
+
+        sessions[1].request.assert_not_called()
+
+    def test_get_file_metadata(self, api, AuthorizedSession):
+        AuthorizedSession.return_value.request.return_value.json.return_value = {
+            "size": "1024",
+            "mimeType": "application/pdf",
+            "md5Checksum": "md5",
+            "modifiedTime": "2024-01-01T12:00:00.000Z",
+        }
+
+        metadata = api.get_file_metadata("FILE_ID")
+
+        AuthorizedSession.return_value.request.assert_called_once_with(
+            "GET",
+            "https://www.googleapis.com/drive/v3/files/FILE_ID",
+            params={
+                "fields": "size,mimeType,md5Checksum,modifiedTime",
+                "supportsAllDrives": "true",
+            },
+            headers=Any.dict().containing(
+                {"X-Goog-Drive-Resource-Keys": "FILE_ID/RESOURCE_ID"}
+            ),
+            timeout=Any(),
+        )
+        assert metadata == GoogleDriveFileMetadata(
+            size=1024,
+            mime_type="application/pdf",
+            md5_checksum="md5",
+            modified_time=datetime(2024, 1, 1, 12, tzinfo=UTC),
+        )
+
+    def test_get_file_metadata_with_missing_fields(self, api, AuthorizedSession):
+        AuthorizedSession.return_value.request.return_value.json.return_value = {
+            "mimeType": "application/vnd.google-apps.document"
+        }
+
+        metadata = api.get_file_metadata("OTHER_FILE_ID", "RESOURCE_KEY")
+
+        headers = AuthorizedSession.return_value.request.call_args.kwargs["headers"]
+        assert headers["X-Goog-Drive-Resource-Keys"] == "OTHER_FILE_ID/RESOURCE_KEY"
+        assert metadata == GoogleDriveFileMetadata(
+            size=None,
+            mime_type="application/vnd.google-apps.document",
+            md5_checksum=None,
+            modified_time=None,
+        )
+
+    def test_get_file_metadata_caches_the_metadata(self, api, AuthorizedSession):
+        AuthorizedSession.return_value.request.return_value.json.return_value = {}
+
+        api.get_file_metadata("FILE_ID")
+        metadata = api.get_file_metadata("FILE_ID")
+
+        AuthorizedSession.return_value.request.assert_called_once()
+        assert metadata.size is None
+
     def test_iter_file_handles_errors(self, api, AuthorizedSession):
         # We aren't going to go crazy here as `iter_handle_errors` is better
         # tested elsewhere
@@ -290,10 +485,19 @@ class TestGoogleDriveAPI:
     @pytest.fixture
     def api(self):
         return GoogleDriveAPI(
-            credentials_list=[{"valid": "credentials"}, {"valid": "credentials_2"}],
+            credentials_list=[
+                {"valid": "credentials"},
+                {"valid": "credentials_2", "client_email": "two@example.com"},
+            ],
             resource_keys={"FILE_ID": "RESOURCE_ID"},
         )
 
+    @pytest.fixture
+    def sessions(self, AuthorizedSession):
+        sessions = [Mock(), Mock()]
+        AuthorizedSession.side_effect = sessions
+        return sessions
+
     @pytest.fixture(autouse=True)
     def AuthorizedSession(self, patch):
         return patch("via.services.google_drive.AuthorizedSession")
@@ -301,3 +505,200 @@ class TestGoogleDriveAPI:
     @pytest.fixture(autouse=True)
     def Credentials(self, patch):
         return patch("via.services.google_drive.Credentials")
+
+    @pytest.fixture(autouse=True)
+    def TokenRefresher(self, patch):
+        return patch("via.services.google_drive.TokenRefresher")
+
+
+class TestCredentialPool:
+    def test_candidates_prefers_the_least_used_credential(self, pool, credentials):
+        credentials[0].requests = 5
+
+        assert next(pool.candidates()) == credentials[1]
+        assert credentials[1].requests == 1
+
+    def test_candidates_skips_credentials_which_are_cooling_down(
+        self, pool, credentials
+    ):
+        pool.rate_limited(credentials[0])
+
+        assert list(pool.candidates()) == [credentials[1]]
+
+    def test_candidates_when_every_credential_is_cooling_down(
+        self, pool, credentials, clock
+    ):
+        pool.rate_limited(credentials[1])
+        clock.return_value += 1
+        pool.rate_limited(credentials[0])
+
+        assert list(pool.candidates()) == [credentials[1]]
+
+    def test_credentials_stop_cooling_down(self, pool, credentials, clock):
+        pool.rate_limited(credentials[0])
+
+        clock.return_value += CredentialPool.MIN_BACKOFF
+
+        assert credentials[0] in pool.candidates()
+
+    def test_it_backs_off_for_longer_each_time(self, pool, credentials):
+        backoffs = []
+        for _ in range(7):
+            pool.rate_limited(credentials[0])
+            backoffs.append(credentials[0].backoff)
+
+        assert backoffs == [30, 60, 120, 240, 480, 600, 600]
+
+    def test_succeeded_resets_the_backoff(self, pool, credentials):
+        pool.rate_limited(credentials[0])
+        pool.rate_limited(credentials[0])
+
+        pool.succeeded(credentials[0])
+        pool.rate_limited(credentials[0])
+
+        assert credentials[0].backoff == CredentialPool.MIN_BACKOFF
+
+    def test_stats(self, pool, credentials):
+        list(pool.candidates())
+        pool.rate_limited(credentials[0])
+
+        assert pool.stats == {
+            "one": {
+                "requests": 1,
+                "rate_limited": 1,
+                "cooling_down": True,
+                "token": credentials[0].token_refresher.stats,
+            },
+            "two": {
+                "requests": 1,
+                "rate_limited": 0,
+                "cooling_down": False,
+                "token": credentials[1].token_refresher.stats,
+            },
+        }
+
+    @pytest.fixture
+    def credentials(self):
+        return [
+            PooledCredential(
+                name=name,
+                http_service=Mock(),
+                token_refresher=Mock(spec_set=["stats"]),
+            )
+            for name in ("one", "two")
+        ]
+
+    @pytest.fixture
+    def clock(self):
+        return Mock(return_value=1000)
+
+    @pytest.fixture
+    def pool(self, credentials, clock):
+        return CredentialPool(credentials, clock=clock)
+
+
+class TestTokenRefresher:
+    def test_start_refreshes_in_the_background(self, refresher, timer):
+        refresher.start()
+
+        timer.assert_called_once_with(0, Any.callable())
+        assert timer.return_value.daemon
+        timer.return_value.start.assert_called_once_with()
+
+    def test_it_refreshes_ahead_of_expiry(self, refresher, credentials, timer, Request):
+        refresher.start()
+
+        run_timer(timer)
+
+        credentials.refresh.assert_called_once_with(Request.return_value)
+        # The token expires in an hour, so we refresh it 10 minutes before
+        timer.assert_called_with(3000, Any.callable())
+        assert refresher.stats == {
+            "refreshes": 1,
+            "refresh_failures": 0,
+            "blocking_refreshes": 0,
+            "last_refresh_seconds": 0.5,
+            "expires_in": 3600,
+        }
+
+    def test_it_doesnt_refresh_too_often(self, refresher, credentials, timer):
+        credentials.expiry = datetime(2024, 1, 1, 12, 5)  # noqa: DTZ001
+        refresher.start()
+
+        run_timer(timer)
+
+        timer.assert_called_with(TokenRefresher.RETRY_INTERVAL, Any.callable())
+
+    def test_it_tries_again_if_refreshing_fails(
+        self, refresher, credentials, timer, caplog
+    ):
+        credentials.refresh.side_effect = ValueError
+        refresher.start()
+
+        run_timer(timer)
+
+        timer.assert_called_with(TokenRefresher.RETRY_INTERVAL, Any.callable())
+        assert refresher.stats["refresh_failures"] == 1
+        assert caplog.record_tuples == [
+            (
+                "via.services.google_drive",
+                logging.WARNING,
+                "Could not refresh a Google Drive token",
+            )
+        ]
+
+    def test_ensure_valid_does_nothing_if_the_token_is_valid(
+        self, refresher, credentials
+    ):
+        refresher.ensure_valid()
+
+        credentials.refresh.assert_not_called()
+
+    def test_ensure_valid_refreshes_invalid_tokens(self, refresher, credentials):
+        credentials.valid = False
+
+        refresher.ensure_valid()
+
+        credentials.refresh.assert_called_once()
+        assert refresher.stats["blocking_refreshes"] == 1
+
+    def test_ensure_valid_only_refreshes_once(self, refresher, credentials):
+        # Like another thread refreshing the token while we wait for the lock
+        type(credentials).valid = PropertyMock(side_effect=[False, True])
+
+        refresher.ensure_valid()
+
+        credentials.refresh.assert_not_called()
+
+    def test_stats_without_a_token(self, refresher, credentials):
+        credentials.expiry = None
+
+        assert refresher.stats["expires_in"] is None
+
+    @pytest.fixture
+    def credentials(self):
+        return Mock(valid=True, expiry=datetime(2024, 1, 1, 13))  # noqa: DTZ001
+
+    @pytest.fixture
+    def timer(self):
+        return Mock()
+
+    @pytest.fixture
+    def refresher(self, credentials, timer):
+        return TokenRefresher(
+            credentials, timer=timer, clock=Mock(side_effect=[100, 100.5])
+        )
+
+    @pytest.fixture(autouse=True)
+    def Request(self, patch):
+        return patch("via.services.google_drive.Request")
+
+    @pytest.fixture(autouse=True)
+    def frozen_time(self):
+        with freeze_time("2024-01-01 12:00:00"):
+            yield
+
+
+def run_timer(timer):
+    _delay, function = timer.call_args.args
+    function()
@@ -12,7 +12,7 @@ from via.exceptions import (
     UpstreamServiceError,
     UpstreamTimeout,
 )
-from via.services.http import HTTPService, factory
+from via.services.http import HTTPService, PooledHTTPAdapter, factory
 
 EXCEPTION_MAP = (
     (exceptions.MissingSchema, BadURL),
@@ -206,6 +206,9 @@ class TestHTTPService:
             ([b"chunksize"], [b"chunksize"]),
             ([b"chunk", b"size"], [b"chunksize"]),
             ([b"too", b"smol"], [b"toosmol"]),
+            ([b"chunk", b"size", b"more"], [b"chunksize", b"more"]),
+            ([b"small", b"longer_than_chunk_size"], [b"smalllonger_than_chunk_size"]),
+            ([], []),
         ),
     )
     def test_stream_bytes(self, svc, response, input_bytes, output):
@@ -216,6 +219,36 @@ class TestHTTPService:
         assert list(results) == output
         response.iter_content.assert_called_once_with(chunk_size=9)
 
+    def test_stream_passes_the_chunk_size(self, session, url):
+        svc = HTTPService(session)
+        session.request.return_value.iter_content.return_value = [b"a", b"b", b"c"]
+
+        result = list(svc.stream(url, min_chunk_size=2))
+
+        assert result == [b"ab", b"c"]
+        session.request.return_value.iter_content.assert_called_once_with(chunk_size=2)
+
+    def test_stream_response(self, session, url):
+        svc = HTTPService(session)
+        upstream = session.request.return_value
+        upstream.status_code = 206
+        upstream.headers = {"Content-Range": "bytes 0-1/2"}
+        upstream.iter_content.return_value = [b"a", b"b"]
+
+        result = svc.stream_response(url, headers={"Range": "bytes=0-1"})
+
+        # The request is sent before we start reading the content
+        session.request.assert_called_once_with(
+            method="GET",
+            url=url,
+            stream=True,
+            headers={"Range": "bytes=0-1"},
+            timeout=Any(),
+        )
+        assert result.status_code == 206
+        assert result.headers == {"Content-Range": "bytes 0-1/2"}
+        assert list(result.content) == [b"ab"]
+
     @pytest.fixture
     def url(self):
         """Return the URL that we'll be sending test requests to."""
@@ -250,6 +283,78 @@ class TestHTTPService:
         return create_autospec(Response, instance=True, spec_set=True)
 
 
+class TestPooledHTTPAdapter:
+    def test_sessions_share_connections(self, adapter, url):
+        for _ in range(3):
+            adapter.create_session().get(url)
+
+        assert adapter.stats == {
+            "pools": 1,
+            "connections_opened": 1,
+            "connections_reused": 2,
+        }
+
+    def test_sessions_dont_share_cookies(self, adapter, url):
+        httpretty.register_uri("GET", url, set_cookie="name=value")
+        session = adapter.create_session()
+
+        session.get(url)
+
+        assert session.cookies["name"] == "value"
+        assert not adapter.create_session().cookies
+
+    def test_it_uses_the_configured_pool_size_for_a_host(self, url):
+        adapter = PooledHTTPAdapter(
+            pool_maxsize=2, host_pool_maxsize={"example.com": 5}
+        )
+
+        pool = adapter.get_connection_with_tls_context(
+            requests.Request("GET", url).prepare(), verify=True
+        )
+        other_pool = adapter.get_connection_with_tls_context(
+            requests.Request("GET", "https://example.org").prepare(), verify=True
+        )
+
+        assert pool.pool.maxsize == 5
+        assert other_pool.pool.maxsize == 2
+
+    def test_it_closes_idle_pools(self, adapter, url):
+        clock = adapter.poolmanager._clock = Mock(return_value=0)  # noqa: SLF001
+        httpretty.register_uri("GET", "https://example.org/", body="")
+        adapter.create_session().get(url)
+        adapter.create_session().get(url)
+
+        clock.return_value = 61
+        adapter.create_session().get("https://example.org/")
+
+        assert adapter.stats == {
+            "pools": 1,
+            "connections_opened": 2,
+            "connections_reused": 1,
+        }
+
+    def test_closing_a_session_doesnt_close_the_pools(self, adapter, url):
+        session = adapter.create_session()
+        session.get(url)
+
+        session.close()
+
+        assert adapter.stats["pools"] == 1
+
+    @pytest.fixture
+    def adapter(self):
+        return PooledHTTPAdapter()
+
+    @pytest.fixture
+    def url(self):
+        url = "https://example.com/"
+        httpretty.register_uri("GET", url, body="test_response", priority=-1)
+        return url
+
+
 class TestFactory:
-    def test_it(self, pyramid_request):
-        assert isinstance(factory(sentinel.context, pyramid_request), HTTPService)
+    def test_it(self, pyramid_request, pooled_http_adapter):
+        svc = factory(sentinel.context, pyramid_request)
+
+        assert isinstance(svc, HTTPService)
+        assert svc._session.get_adapter("https://example.com") == pooled_http_adapter  # noqa: SLF001
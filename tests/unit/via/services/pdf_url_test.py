@@ -1,9 +1,10 @@
 from datetime import UTC, datetime, timedelta
-from unittest.mock import sentinel
+from unittest.mock import Mock, sentinel
 
 import pytest
 
-from via.services.pdf_url import PDFURLBuilder, _NGINXSigner, factory
+from via.cache import TTLCache
+from via.services.pdf_url import PDFURLBuilder, _NGINXSigner, _RouteMatcher, factory
 
 
 class TestNGINXSigner:
@@ -23,13 +24,73 @@ class TestNGINXSigner:
         assert signature == "qTq65RXvm6P2Y4bfzWdPzg"
         assert expiry == "1581183021"
 
+    def test_it_reuses_signed_urls_from_the_cache(self, svc, cache):
+        cache.set(
+            ("https://example.com/foo.pdf", "/proxy/static/", 1581183021),
+            "CACHED_URL",
+            ttl=10,
+        )
+
+        assert svc.sign_url("https://example.com/foo.pdf", "/proxy/static/") == (
+            "CACHED_URL"
+        )
+
+    def test_it_caches_signed_urls_until_the_window_rolls_over(self, svc, clock):
+        signed_url = svc.sign_url("https://example.com/foo.pdf", "/proxy/static/")
+
+        # We're an hour into the window, and it rolls over when the expiry is
+        # less than half the max age (12.5 hours) away
+        clock.return_value = 11.5 * 3600 - 1
+        assert svc.sign_url("https://example.com/foo.pdf", "/proxy/static/") == (
+            signed_url
+        )
+        clock.return_value = 11.5 * 3600
+        assert (
+            svc.cache.get(("https://example.com/foo.pdf", "/proxy/static/", 1581183021))
+            is None
+        )
+
+    def test_sign_urls(self, svc):
+        urls = ["https://example.com/foo.pdf", "https://example.com/bar.pdf"]
+
+        signed_urls = svc.sign_urls(urls, "/proxy/static/")
+
+        assert signed_urls == [svc.sign_url(url, "/proxy/static/") for url in urls]
+        assert signed_urls[0] != signed_urls[1]
+
+    def test_it_works_without_a_cache(self, pyramid_settings):
+        svc = _NGINXSigner(
+            pyramid_settings["nginx_server"],
+            pyramid_settings["nginx_secure_link_secret"],
+        )
+
+        signed_url = svc.sign_url(
+            "https://example.com/foo/bar.pdf?q=s", "/proxy/static/"
+        )
+
+        assert signed_url.split("/")[5] == "qTq65RXvm6P2Y4bfzWdPzg"
+
     @pytest.fixture
-    def svc(self, pyramid_settings):
+    def svc(self, pyramid_settings, cache):
         return _NGINXSigner(
             pyramid_settings["nginx_server"],
             pyramid_settings["nginx_secure_link_secret"],
+            cache,
         )
 
+    @pytest.fixture
+    def clock(self):
+        return Mock(return_value=0)
+
+    @pytest.fixture
+    def cache(self, clock):
+        return TTLCache(maxsize=10, clock=clock)
+
+    @pytest.fixture(autouse=True)
+    def time(self, patch):
+        # Just over an hour after the start of the current window
+        return patch("via.services.pdf_url.time", return_value=1581093021 + 3600)
+
     @pytest.fixture(autouse=True)
     def quantized_expiry(self, patch):
         return patch(
@@ -46,6 +107,31 @@ class TestNGINXSigner:
         )
 
 
+class TestRouteMatcher:
+    @pytest.mark.parametrize(
+        "url,route",  # noqa: PT006
+        (  # noqa: PT007
+            ("https://a.example.com/file", "route_a"),
+            ("https://b.example.com/file", "route_a"),
+            ("https://c.example.com/file", "route_c"),
+            ("https://a.example.com/file.pdf", "route_a"),
+            ("https://other.example.com/file.pdf", "route_pdf"),
+            ("https://other.example.com/file", None),
+            ("prefix https://a.example.com/file", None),
+        ),
+    )
+    def test_match(self, url, route):
+        matcher = _RouteMatcher(
+            (
+                ("route_a", (r"https://a\.", r"https://b\.")),
+                ("route_c", (r"https://c\.",)),
+                ("route_pdf", (r".*\.pdf$",)),
+            )
+        )
+
+        assert matcher.match(url) == route
+
+
 class TestPDFURLBuilder:
     @pytest.mark.parametrize(
         "file_details,url",  # noqa: PT006
@@ -169,12 +255,14 @@ class TestFactory:
         PatchedNGINXSigner,
         google_drive_api,
         secure_link_service,
+        nginx_signed_urls_cache,
     ):
         svc = factory(sentinel.context, pyramid_request)
 
         PatchedNGINXSigner.assert_called_once_with(
             nginx_server=pyramid_settings["nginx_server"],
             secret=pyramid_settings["nginx_secure_link_secret"],
+            cache=nginx_signed_urls_cache,
         )
         PDFURLBuilder.assert_called_once_with(
             request=pyramid_request,
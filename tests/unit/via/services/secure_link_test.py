@@ -1,10 +1,11 @@
 from datetime import timedelta
-from unittest.mock import create_autospec, sentinel
+from unittest.mock import Mock, create_autospec, sentinel
 
 import pytest
 from h_vialib.exceptions import TokenException
 from pyramid.httpexceptions import HTTPUnauthorized
 
+from via.cache import TTLCache
 from via.services.secure_link import SecureLinkService, factory, has_secure_url_token
 
 
@@ -69,6 +70,63 @@ class TestSecureLinkService:
 
         service._via_secure_url.verify.assert_called_once_with(pyramid_request.url)  # noqa: SLF001
 
+    def test_url_has_valid_token(self, service):
+        assert service.url_has_valid_token(sentinel.url)
+
+        service._via_secure_url.verify.assert_called_once_with(sentinel.url)  # noqa: SLF001
+
+    def test_url_has_valid_token_can_fail(self, service):
+        service._via_secure_url.verify.side_effect = TokenException  # noqa: SLF001
+
+        assert not service.url_has_valid_token(sentinel.url)
+
+    def test_it_only_verifies_each_url_once_per_request(self, service, pyramid_request):
+        service.request_is_valid(pyramid_request)
+        service.request_has_valid_token(pyramid_request)
+        service._verified_urls.clear()  # noqa: SLF001
+
+        assert service.request_has_valid_token(pyramid_request)
+        service._via_secure_url.verify.assert_called_once_with(pyramid_request.url)  # noqa: SLF001
+
+    def test_it_remembers_invalid_urls_for_the_request(self, service, pyramid_request):
+        service._via_secure_url.verify.side_effect = TokenException  # noqa: SLF001
+
+        assert not service.request_has_valid_token(pyramid_request)
+        assert not service.request_has_valid_token(pyramid_request)
+        service._via_secure_url.verify.assert_called_once()  # noqa: SLF001
+
+    def test_it_shares_verified_urls_between_requests(
+        self, service, verified_urls, pyramid_request
+    ):
+        service.request_has_valid_token(pyramid_request)
+        other_service = SecureLinkService(
+            secret="not_a_real_secret",  # noqa: S106
+            signed_urls_required=True,
+            verified_urls=verified_urls,
+        )
+
+        assert other_service.request_has_valid_token(pyramid_request)
+        other_service._via_secure_url.verify.assert_called_once()  # noqa: SLF001
+
+    def test_it_remembers_verified_urls_until_the_token_expires(
+        self, service, verified_urls, pyramid_request, clock
+    ):
+        service.request_has_valid_token(pyramid_request)
+
+        clock.return_value = 99
+        assert verified_urls.get(pyramid_request.url)
+        clock.return_value = 100
+        assert verified_urls.get(pyramid_request.url) is None
+
+    def test_it_doesnt_share_invalid_urls_between_requests(
+        self, service, verified_urls, pyramid_request
+    ):
+        service._via_secure_url.verify.side_effect = TokenException  # noqa: SLF001
+
+        service.request_has_valid_token(pyramid_request)
+
+        assert verified_urls.get(pyramid_request.url) is None
+
     def test_sign_url(self, service):
         result = service.sign_url(sentinel.url)
 
@@ -84,8 +142,24 @@ class TestSecureLinkService:
         assert result == sentinel.url
 
     @pytest.fixture
-    def service(self):
-        return SecureLinkService(secret="not_a_real_secret", signed_urls_required=True)  # noqa: S106
+    def service(self, verified_urls):
+        return SecureLinkService(
+            secret="not_a_real_secret",  # noqa: S106
+            signed_urls_required=True,
+            verified_urls=verified_urls,
+        )
+
+    @pytest.fixture
+    def clock(self):
+        return Mock(return_value=0)
+
+    @pytest.fixture
+    def verified_urls(self, clock):
+        return TTLCache(maxsize=10, clock=clock)
+
+    @pytest.fixture(autouse=True)
+    def time(self, patch):
+        return patch("via.services.secure_link.time", return_value=1000)
 
     @pytest.fixture
     def with_signed_urls_not_required(self, service):
@@ -93,11 +167,13 @@ class TestSecureLinkService:
 
     @pytest.fixture(autouse=True)
     def ViaSecureURL(self, patch):
-        return patch("via.services.secure_link.ViaSecureURL")
+        ViaSecureURL = patch("via.services.secure_link.ViaSecureURL")
+        ViaSecureURL.return_value.verify.return_value = {"exp": 1100}
+        return ViaSecureURL
 
 
 class TestFactory:
-    def test_it(self, pyramid_request, SecureLinkService):
+    def test_it(self, pyramid_request, SecureLinkService, verified_secure_urls_cache):
         service = factory(sentinel.context, pyramid_request)
 
         SecureLinkService.assert_called_once_with(
@@ -105,6 +181,7 @@ class TestFactory:
             signed_urls_required=pyramid_request.registry.settings[
                 "signed_urls_required"
             ],
+            verified_urls=verified_secure_urls_cache,
         )
         assert service == SecureLinkService.return_value
 
@@ -1,10 +1,12 @@
 from io import BytesIO
-from unittest.mock import sentinel
+from unittest.mock import Mock, sentinel
 
 import pytest
+from freezegun import freeze_time
 from h_matchers import Any
 from requests import Response
 
+from via.cache import TTLCache
 from via.exceptions import BadURL
 from via.services.url_details import URLDetailsService, factory
 
@@ -13,13 +15,12 @@ class TestGetURLDetails:
     @pytest.mark.parametrize(
         "content_type,mime_type,status_code",  # noqa: PT006
         (  # noqa: PT007
-            ("text/html", "text/html", 501),
             ("application/pdf", "application/pdf", 200),
             ("application/pdf; qs=0.001", "application/pdf", 201),
-            (None, None, 301),
+            ("text/html", "text/html", 301),
         ),
     )
-    def test_it_calls_get_for_normal_urls(
+    def test_it_sends_a_head_request_first(
         self,
         response,
         content_type,
@@ -28,19 +29,16 @@ class TestGetURLDetails:
         http_service,
         svc,
     ):
-        if content_type:
-            response.headers = {"Content-Type": content_type}
-        else:
-            response.headers = {}
-
+        response.headers = {"Content-Type": content_type}
         response.status_code = status_code
 
         url = "http://example.com"
 
-        result = svc.get_url_details(url, headers=sentinel.headers)
+        result = svc.get_url_details(url, headers={"X-Header": "value"})
 
         assert result == (mime_type, status_code)
-        http_service.get.assert_called_once_with(
+        http_service.request.assert_called_once_with(
+            "HEAD",
             url,
             allow_redirects=True,
             stream=True,
@@ -49,13 +47,153 @@ class TestGetURLDetails:
             raise_for_status=False,
         )
 
+    def test_it_falls_back_to_a_range_request(
+        self, http_service, make_response, add_request_headers, svc
+    ):
+        http_service.request.side_effect = [
+            make_response(405),
+            make_response(206, {"Content-Type": "application/pdf"}),
+        ]
+
+        result = svc.get_url_details("http://example.com")
+
+        assert result == ("application/pdf", 200)
+        assert [call.args for call in http_service.request.call_args_list] == [
+            ("HEAD", "http://example.com"),
+            ("GET", "http://example.com"),
+        ]
+        assert add_request_headers.return_value["Range"] == "bytes=0-1023"
+
+    def test_it_falls_back_to_a_full_get(
+        self, http_service, make_response, probe_cache, svc
+    ):
+        http_service.request.side_effect = [
+            make_response(405),
+            make_response(501),
+            make_response(200, {"Content-Type": "text/html"}),
+        ]
+
+        result = svc.get_url_details("http://example.com")
+
+        assert result == ("text/html", 200)
+        assert http_service.request.call_count == 3
+        assert probe_cache.get("example.com") == "GET"
+
+    @pytest.mark.parametrize("status_code", [401, 403, 404])
+    def test_it_tries_a_range_request_if_head_fails(
+        self, http_service, make_response, probe_cache, status_code, svc
+    ):
+        http_service.request.side_effect = [
+            make_response(status_code),
+            make_response(206, {"Content-Type": "application/pdf"}),
+        ]
+
+        result = svc.get_url_details("http://example.com")
+
+        assert result == ("application/pdf", 200)
+        assert [call.args for call in http_service.request.call_args_list] == [
+            ("HEAD", "http://example.com"),
+            ("GET", "http://example.com"),
+        ]
+        assert probe_cache.get("example.com") == "RANGE"
+
+    def test_it_returns_errors(self, http_service, make_response, probe_cache, svc):
+        http_service.request.side_effect = [
+            make_response(404),
+            make_response(404, {"Content-Type": "text/html"}),
+        ]
+
+        result = svc.get_url_details("http://example.com/missing")
+
+        assert result == ("text/html", 404)
+        assert http_service.request.call_count == 2
+        # Errors don't tell us which probes the host supports
+        assert probe_cache.get("example.com") is None
+
+    def test_it_doesnt_fall_back_for_server_errors(
+        self, http_service, make_response, probe_cache, svc
+    ):
+        http_service.request.side_effect = [make_response(500)]
+
+        result = svc.get_url_details("http://example.com")
+
+        assert result == (None, 500)
+        assert probe_cache.get("example.com") is None
+
+    def test_it_falls_back_for_empty_files(
+        self, http_service, make_response, probe_cache, svc
+    ):
+        probe_cache.set("example.com", "RANGE", ttl=100)
+        http_service.request.side_effect = [
+            make_response(416),
+            make_response(200, {"Content-Type": "application/pdf"}),
+        ]
+
+        result = svc.get_url_details("http://example.com")
+
+        assert result == ("application/pdf", 200)
+        assert probe_cache.get("example.com") == "RANGE"
+
+    def test_it_remembers_which_probe_works_for_a_host(
+        self, http_service, make_response, probe_cache, svc
+    ):
+        http_service.request.side_effect = [
+            make_response(405),
+            make_response(200, {"Content-Type": "application/pdf"}),
+            make_response(200, {"Content-Type": "text/html"}),
+        ]
+
+        svc.get_url_details("http://example.com/first")
+        result = svc.get_url_details("http://example.com/second")
+
+        assert result == ("text/html", 200)
+        assert [call.args for call in http_service.request.call_args_list] == [
+            ("HEAD", "http://example.com/first"),
+            ("GET", "http://example.com/first"),
+            ("GET", "http://example.com/second"),
+        ]
+        assert probe_cache.get("example.com") == "RANGE"
+
+    @pytest.mark.parametrize(
+        "content_type,body,mime_type",  # noqa: PT006
+        (  # noqa: PT007
+            (None, b"%PDF-1.7 ...", "application/pdf"),
+            ("application/octet-stream", b"junk %PDF-1.4", "application/pdf"),
+            (None, b"\n  <!DOCTYPE html><html>", "text/html"),
+            ("application/octet-stream", b"<HTML><body>", "text/html"),
+            ("application/octet-stream", b"PK...", "application/octet-stream"),
+            (None, b"", None),
+        ),
+    )
+    def test_it_sniffs_uninformative_content_types(
+        self,
+        http_service,
+        make_response,
+        probe_cache,
+        content_type,
+        body,
+        mime_type,
+        svc,
+    ):
+        headers = {"Content-Type": content_type} if content_type else {}
+        http_service.request.side_effect = [
+            make_response(200, headers),
+            make_response(206, headers, body),
+        ]
+
+        result = svc.get_url_details("http://example.com")
+
+        assert result == (mime_type, 200)
+        # It's this URL that needed the extra request, not the host
+        assert probe_cache.get("example.com") == "HEAD"
+
     @pytest.mark.usefixtures("response")
     def test_it_modifies_headers(
         self, clean_headers, add_request_headers, http_service, svc
     ):
         svc.get_url_details(url="http://example.com", headers={"X-Pre-Existing": 1})
 
-        _args, kwargs = http_service.get.call_args
+        _args, kwargs = http_service.request.call_args
 
         clean_headers.assert_called_once_with({"X-Pre-Existing": 1})
         add_request_headers.assert_called_once_with(clean_headers.return_value)
@@ -70,7 +208,7 @@ class TestGetURLDetails:
 
         assert result == ("application/pdf", 200)
         GoogleDriveAPI.parse_file_url.assert_called_once_with(sentinel.google_drive_url)
-        http_service.get.assert_not_called()
+        http_service.request.assert_not_called()
 
     def test_it_returns_youtube_for_youtube_url(
         self, checkmate_service, http_service, youtube_service, GoogleDriveAPI, svc
@@ -82,7 +220,7 @@ class TestGetURLDetails:
 
         youtube_service.get_video_id.assert_called_once_with(sentinel.youtube_url)
         checkmate_service.raise_if_blocked.assert_not_called()
-        http_service.get.assert_not_called()
+        http_service.request.assert_not_called()
         assert result == ("video/x-youtube", 200)
 
     @pytest.mark.usefixtures("response")
@@ -90,7 +228,7 @@ class TestGetURLDetails:
         GoogleDriveAPI.parse_file_url.return_value = {}
         youtube_service.enabled = False
 
-        result = svc.get_url_details(sentinel.youtube_url)
+        result = svc.get_url_details("https://www.youtube.com/watch?v=VIDEO_ID")
 
         youtube_service.get_video_id.assert_not_called()
         assert result == ("application/x-testing", 200)
@@ -103,17 +241,120 @@ class TestGetURLDetails:
 
         checkmate_service.raise_if_blocked.assert_called_once_with(sentinel.url)
 
+    @pytest.mark.usefixtures("response")
+    def test_it_caches_details(self, http_service, checkmate_service, svc):
+        first = svc.get_url_details("http://example.com/#page=1")
+        second = svc.get_url_details("http://example.com/#page=2")
+
+        assert first == second == ("application/x-testing", 200)
+        http_service.request.assert_called_once()
+        # We still check every request with Checkmate
+        assert checkmate_service.raise_if_blocked.call_count == 2
+
+    def test_it_shares_concurrent_fetches(self, http_service, single_flight, svc):
+        single_flight.do = Mock(return_value=(("application/pdf", 200), 10))
+
+        result = svc.get_url_details("http://example.com/#page=1")
+
+        single_flight.do.assert_called_once_with(
+            ("url_details", ("http://example.com/", None)),
+            Any.callable(),
+            "http://example.com/#page=1",
+            {},
+        )
+        assert result == ("application/pdf", 200)
+        http_service.request.assert_not_called()
+
+    @pytest.mark.usefixtures("response")
+    def test_it_caches_per_relevant_header(self, http_service, svc):
+        svc.get_url_details("http://example.com", headers={"Authorization": "one"})
+        svc.get_url_details("http://example.com", headers={"Authorization": "two"})
+        svc.get_url_details("http://example.com", headers={"Accept": "text/html"})
+        svc.get_url_details("http://example.com", headers={"Accept-Language": "fr"})
+        svc.get_url_details("http://example.com")
+
+        assert http_service.request.call_count == 3
+
+    @pytest.mark.parametrize(
+        "status_code,headers,ttl",  # noqa: PT006
+        (  # noqa: PT007
+            (200, {}, URLDetailsService.DEFAULT_TTL),
+            (200, {"Cache-Control": "public, max-age=20"}, 20),
+            (200, {"Cache-Control": "max-age=20, s-maxage=30"}, 30),
+            (200, {"Cache-Control": 'max-age="20"'}, 20),
+            (200, {"Cache-Control": "max-age=999999"}, URLDetailsService.MAX_TTL),
+            (200, {"Cache-Control": "max-age=nonsense"}, 0),
+            (200, {"Cache-Control": "no-store"}, 0),
+            (200, {"Cache-Control": "no-cache"}, 0),
+            (200, {"Cache-Control": "private, max-age=20"}, 0),
+            (200, {"Expires": "0"}, 0),
+            (200, {"Expires": "Thu, 01 Dec 1994 16:00:00 GMT"}, 0),
+            (200, {"Expires": "Thu, 01 Dec 2022 12:01:40 GMT"}, 100),
+            (200, {"Expires": "Thu, 01 Dec 2022 12:01:40 -0000"}, 100),
+            (404, {"Cache-Control": "max-age=600"}, 60),
+            (403, {}, 60),
+            (500, {}, 0),
+            (503, {"Cache-Control": "max-age=600"}, 0),
+        ),
+    )
+    @freeze_time("2022-12-01 12:00:00")
+    def test_it_caches_for_the_right_amount_of_time(
+        self, response, cache, probe_cache, status_code, headers, ttl, svc
+    ):
+        probe_cache.set("example.com", "GET", ttl=100)
+        response.headers = headers
+        response.status_code = status_code
+
+        svc.get_url_details("http://example.com")
+
+        cache.set.assert_called_once_with(
+            ("http://example.com", None),
+            (None, status_code),
+            ttl=ttl,
+        )
+
     @pytest.fixture
-    def svc(self, checkmate_service, http_service, youtube_service):
-        return URLDetailsService(checkmate_service, http_service, youtube_service)
+    def svc(
+        self,
+        checkmate_service,
+        http_service,
+        youtube_service,
+        cache,
+        probe_cache,
+        single_flight,
+    ):
+        return URLDetailsService(
+            checkmate_service,
+            http_service,
+            youtube_service,
+            cache,
+            probe_cache,
+            single_flight,
+        )
+
+    @pytest.fixture
+    def cache(self):
+        return Mock(wraps=TTLCache(maxsize=10))
+
+    @pytest.fixture
+    def probe_cache(self):
+        return TTLCache(maxsize=10)
+
+    @pytest.fixture
+    def make_response(self):
+        def make_response(status_code, headers=None, body=b""):
+            response = Response()
+            response.raw = BytesIO(body)
+            response.headers = headers or {}
+            response.status_code = status_code
+            return response
+
+        return make_response
 
     @pytest.fixture
-    def response(self, http_service):
-        response = Response()
-        response.raw = BytesIO(b"")
-        response.headers = {"Content-Type": "application/x-testing"}
-        response.status_code = 200
-        http_service.get.return_value = response
+    def response(self, http_service, make_response):
+        response = make_response(200, {"Content-Type": "application/x-testing"})
+        http_service.request.return_value = response
 
         return response
 
@@ -130,7 +371,14 @@ class TestGetURLDetails:
         return patch("via.services.url_details.clean_headers", return_value={})
 
 
-@pytest.mark.usefixtures("checkmate_service", "http_service", "youtube_service")
+@pytest.mark.usefixtures(
+    "checkmate_service",
+    "http_service",
+    "youtube_service",
+    "url_details_cache",
+    "url_details_probe_cache",
+    "single_flight",
+)
 def test_factory(pyramid_request):
     svc = factory(sentinel.context, pyramid_request)
 
@@ -1,14 +1,21 @@
 from datetime import datetime
 from io import BytesIO
-from unittest.mock import sentinel
+from unittest.mock import Mock, sentinel
 
 import pytest
 from h_matchers import Any
 from requests import Response
-from sqlalchemy import select
+from sqlalchemy import select, update
 
+from via.cache import Batcher, TTLCache
 from via.models import Transcript, Video
-from via.services.youtube import YouTubeDataAPIError, YouTubeService, factory
+from via.models.transcript import encode_body
+from via.services.youtube import (
+    YouTubeDataAPIError,
+    YouTubeService,
+    factory,
+    warm_title_cache,
+)
 
 
 class TestYouTubeService:
@@ -29,6 +36,9 @@ class TestYouTubeService:
                 api_key=api_key,
                 http_service=sentinel.http_service,
                 youtube_transcript_service=sentinel.youtube_transcript_service,
+                single_flight=sentinel.single_flight,
+                title_cache=sentinel.title_cache,
+                title_batcher=sentinel.title_batcher,
             ).enabled
             == expected
         )
@@ -62,7 +72,9 @@ class TestYouTubeService:
 
     def test_get_video_title(self, svc, db_session, http_service):
         response = http_service.get.return_value = Response()
-        response.raw = BytesIO(b'{"items": [{"snippet": {"title": "video_title"}}]}')
+        response.raw = BytesIO(
+            b'{"items": [{"id": "test_video_id", "snippet": {"title": "video_title"}}]}'
+        )
 
         title = svc.get_video_title("test_video_id")
 
@@ -81,12 +93,109 @@ class TestYouTubeService:
             select(Video).where(Video.video_id == "test_video_id")
         ).all() == [Any.instance_of(Video).with_attrs({"title": "video_title"})]
 
+    def test_get_video_title_batches_concurrent_fetches(
+        self, svc, title_batcher, http_service
+    ):
+        title_batcher.do = Mock(return_value="batched_title")
+
+        title = svc.get_video_title("test_video_id")
+
+        title_batcher.do.assert_called_once_with("test_video_id", Any.callable())
+        assert title == "batched_title"
+        http_service.get.assert_not_called()
+
+    def test_get_video_title_handles_videos_saved_while_fetching(
+        self, svc, db_session, title_batcher
+    ):
+        def fetch_title(*_args):
+            # Someone else saves the video while we're fetching it
+            db_session.add(Video(video_id="test_video_id", title="old_title"))
+            db_session.flush()
+            return "new_title"
+
+        title_batcher.do = Mock(side_effect=fetch_title)
+
+        svc.get_video_title("test_video_id")
+
+        assert db_session.scalars(
+            select(Video.title)
+            .where(Video.video_id == "test_video_id")
+            .execution_options(populate_existing=True)
+        ).all() == ["new_title"]
+
+    def test_get_video_titles(self, svc, db_session, video, http_service):
+        response = http_service.get.return_value = Response()
+        response.raw = BytesIO(
+            b'{"items": [{"id": "new_video_id", "snippet": {"title": "new_title"}}]}'
+        )
+
+        titles = svc.get_video_titles(
+            [video.video_id, "new_video_id", "missing_video_id", "new_video_id"]
+        )
+
+        assert titles == {video.video_id: video.title, "new_video_id": "new_title"}
+        http_service.get.assert_called_once_with(
+            "https://www.googleapis.com/youtube/v3/videos",
+            params={
+                "id": "new_video_id,missing_video_id",
+                "key": sentinel.api_key,
+                "part": "snippet",
+                "maxResults": "2",
+            },
+        )
+        assert db_session.scalars(
+            select(Video.title).where(Video.video_id == "new_video_id")
+        ).all() == ["new_title"]
+
+    def test_get_video_titles_asks_for_50_videos_at_a_time(self, svc, http_service):
+        http_service.get.return_value.json.return_value = {"items": []}
+        video_ids = [f"video_id_{i}" for i in range(120)]
+
+        assert svc.get_video_titles(video_ids) == {}
+
+        assert [
+            call.kwargs["params"]["id"] for call in http_service.get.call_args_list
+        ] == [
+            ",".join(video_ids[:50]),
+            ",".join(video_ids[50:100]),
+            ",".join(video_ids[100:]),
+        ]
+
+    def test_get_video_titles_doesnt_call_the_API_for_known_videos(
+        self, svc, video, http_service
+    ):
+        assert svc.get_video_titles([video.video_id]) == {video.video_id: video.title}
+
+        http_service.get.assert_not_called()
+
     def test_get_video_title_uses_cached_videos(self, svc, http_service, video):
         title = svc.get_video_title(video.video_id)
 
         assert title == video.title
         http_service.get.assert_not_called()
 
+    def test_get_video_title_remembers_titles_from_the_DB(
+        self, svc, db_session, video, title_cache
+    ):
+        svc.get_video_title(video.video_id)
+        db_session.delete(video)
+        db_session.flush()
+
+        assert svc.get_video_title(video.video_id) == video.title
+        assert title_cache.stats["hits"] == 1
+
+    def test_get_video_title_remembers_titles_from_the_API(
+        self, svc, http_service, title_cache
+    ):
+        response = http_service.get.return_value = Response()
+        response.raw = BytesIO(
+            b'{"items": [{"id": "test_video_id", "snippet": {"title": "video_title"}}]}'
+        )
+
+        svc.get_video_title("test_video_id")
+
+        assert title_cache.get("test_video_id") == "video_title"
+
     def test_get_video_title_raises_YouTubeDataAPIError(self, svc, http_service):
         http_service.get.side_effect = RuntimeError()
 
@@ -95,13 +204,29 @@ class TestYouTubeService:
 
         assert exc_info.value.__cause__ == http_service.get.side_effect
 
+    def test_get_video_title_remembers_missing_videos_briefly(
+        self, svc, http_service, title_cache, clock
+    ):
+        response = http_service.get.return_value = Response()
+        response.raw = BytesIO(b'{"items": []}')
+
+        for _ in range(2):
+            with pytest.raises(YouTubeDataAPIError, match="no such video"):
+                svc.get_video_title("test_video_id")
+
+        http_service.get.assert_called_once()
+        clock.return_value = YouTubeService.NO_SUCH_VIDEO_TTL
+        assert title_cache.get("test_video_id") is None
+
     def test_get_transcript(
         self, db_session, svc, youtube_transcript_service, transcript_info
     ):
         youtube_transcript_service.pick_default_transcript.return_value = (
             transcript_info
         )
-        youtube_transcript_service.get_transcript.return_value = "test_transcript"
+        youtube_transcript_service.get_transcript.return_value = [
+            {"text": "test_transcript"}
+        ]
 
         returned_transcript = svc.get_transcript("test_video_id")
 
@@ -114,25 +239,40 @@ class TestYouTubeService:
         youtube_transcript_service.get_transcript.assert_called_once_with(
             transcript_info
         )
-        assert returned_transcript == "test_transcript"
+        assert returned_transcript.transcript == [{"text": "test_transcript"}]
         # It should have cached the transcript in the DB.
         assert db_session.scalars(select(Transcript)).all() == [
             Any.instance_of(Transcript).with_attrs(
                 {
                     "video_id": "test_video_id",
                     "transcript_id": transcript_info.id,
-                    "transcript": "test_transcript",
+                    "transcript": [{"text": "test_transcript"}],
                 }
             )
         ]
 
+    def test_get_transcript_shares_concurrent_fetches(
+        self, svc, single_flight, youtube_transcript_service, transcript_info
+    ):
+        single_flight.do = Mock(
+            return_value=(transcript_info, [{"text": "shared_transcript"}])
+        )
+
+        returned_transcript = svc.get_transcript("test_video_id")
+
+        single_flight.do.assert_called_once_with(
+            ("youtube_transcript", "test_video_id"), Any.callable(), "test_video_id"
+        )
+        assert returned_transcript.transcript == [{"text": "shared_transcript"}]
+        youtube_transcript_service.get_transcript.assert_not_called()
+
     def test_get_transcript_returns_cached_transcripts(
         self, svc, transcript, youtube_transcript_service
     ):
         returned_transcript = svc.get_transcript(transcript.video_id)
 
         youtube_transcript_service.get_transcript.assert_not_called()
-        assert returned_transcript == transcript.transcript
+        assert returned_transcript == transcript
 
     def test_get_transcript_retries_when_cached_transcript_is_empty(
         self,
@@ -147,7 +287,9 @@ class TestYouTubeService:
         youtube_transcript_service.pick_default_transcript.return_value = (
             transcript_info
         )
-        youtube_transcript_service.get_transcript.return_value = "fresh_transcript"
+        youtube_transcript_service.get_transcript.return_value = [
+            {"text": "fresh_transcript"}
+        ]
 
         returned_transcript = svc.get_transcript("test_video_id")
 
@@ -155,12 +297,13 @@ class TestYouTubeService:
         youtube_transcript_service.get_transcript_infos.assert_called_once_with(
             "test_video_id"
         )
-        assert returned_transcript == "fresh_transcript"
+        assert returned_transcript == existing
+        assert returned_transcript.transcript == [{"text": "fresh_transcript"}]
         # The empty cached transcript should have been updated in place.
         transcripts = db_session.scalars(select(Transcript)).all()
         assert len(transcripts) == 1
         assert transcripts[0].id == existing.id
-        assert transcripts[0].transcript == "fresh_transcript"
+        assert transcripts[0].transcript == [{"text": "fresh_transcript"}]
         assert transcripts[0].transcript_id == transcript_info.id
 
     def test_get_transcript_does_not_cache_empty_transcript(
@@ -174,7 +317,7 @@ class TestYouTubeService:
 
         returned_transcript = svc.get_transcript("test_video_id")
 
-        assert returned_transcript == []
+        assert returned_transcript.transcript == []
         # Nothing should have been cached in the DB.
         assert db_session.scalars(select(Transcript)).all() == []
 
@@ -190,7 +333,36 @@ class TestYouTubeService:
 
         returned_transcript = svc.get_transcript("video_id")
 
-        assert returned_transcript == oldest_transcript.transcript
+        assert returned_transcript == oldest_transcript
+
+    def test_get_transcript_returns_empty_cached_transcripts_if_still_empty(
+        self, svc, transcript_factory, youtube_transcript_service, transcript_info
+    ):
+        existing = transcript_factory.create(video_id="test_video_id", transcript=[])
+        youtube_transcript_service.pick_default_transcript.return_value = (
+            transcript_info
+        )
+        youtube_transcript_service.get_transcript.return_value = []
+
+        returned_transcript = svc.get_transcript("test_video_id")
+
+        assert returned_transcript == existing
+        assert returned_transcript.transcript_id == existing.transcript_id
+
+    def test_get_transcript_encodes_transcripts_stored_by_older_code(
+        self, svc, db_session, transcript, youtube_transcript_service
+    ):
+        db_session.execute(update(Transcript).values(body=None, segment_count=None))
+        db_session.expire_all()
+
+        returned_transcript = svc.get_transcript(transcript.video_id)
+
+        youtube_transcript_service.get_transcript.assert_not_called()
+        assert returned_transcript == transcript
+        assert returned_transcript.segment_count == len(transcript.transcript)
+        assert returned_transcript.body == encode_body(
+            transcript.video_id, transcript.transcript
+        )
 
     @pytest.mark.parametrize(
         "video_id,expected_url",  # noqa: PT006
@@ -207,15 +379,53 @@ class TestYouTubeService:
         assert expected_url == svc.canonical_video_url(video_id)
 
     @pytest.fixture
-    def svc(self, db_session, http_service, youtube_transcript_service):
+    def svc(
+        self,
+        db_session,
+        http_service,
+        youtube_transcript_service,
+        single_flight,
+        title_cache,
+        title_batcher,
+    ):
         return YouTubeService(
             db_session=db_session,
             enabled=True,
             api_key=sentinel.api_key,
             http_service=http_service,
             youtube_transcript_service=youtube_transcript_service,
+            single_flight=single_flight,
+            title_cache=title_cache,
+            title_batcher=title_batcher,
         )
 
+    @pytest.fixture
+    def title_batcher(self):
+        return Batcher(max_size=YouTubeService.MAX_IDS_PER_CALL, max_wait=0)
+
+    @pytest.fixture
+    def clock(self):
+        return Mock(return_value=0)
+
+    @pytest.fixture
+    def title_cache(self, clock):
+        return TTLCache(maxsize=10, clock=clock)
+
+
+class TestWarmTitleCache:
+    def test_it(self, db_session, video_factory):
+        videos = video_factory.create_batch(3)
+        for i, video in enumerate(videos):
+            video.updated = datetime(2024, 1, i + 1)  # noqa: DTZ001
+        db_session.flush()
+        title_cache = TTLCache(maxsize=10)
+
+        warm_title_cache(db_session, title_cache, limit=2)
+
+        assert title_cache.get(videos[0].video_id) is None
+        assert title_cache.get(videos[1].video_id) == videos[1].title
+        assert title_cache.get(videos[2].video_id) == videos[2].title
+
 
 class TestFactory:
     def test_it(
@@ -226,6 +436,9 @@ class TestFactory:
         http_service,
         db_session,
         youtube_transcript_service,
+        single_flight,
+        youtube_title_cache,
+        youtube_title_batcher,
     ):
         returned = factory(sentinel.context, pyramid_request)
 
@@ -235,6 +448,9 @@ class TestFactory:
             api_key="test_youtube_api_key",
             http_service=http_service,
             youtube_transcript_service=youtube_transcript_service,
+            single_flight=single_flight,
+            title_cache=youtube_title_cache,
+            title_batcher=youtube_title_batcher,
         )
         assert returned == youtube_service
 
@@ -1,6 +1,8 @@
 import json
+from concurrent.futures import Executor, Future
 from io import BytesIO
 from json import JSONDecodeError
+from threading import Barrier, Event
 from unittest.mock import MagicMock, sentinel
 
 import pytest
@@ -8,6 +10,8 @@ from h_matchers import Any
 from requests import Response
 
 from tests.factories import TranscriptInfoFactory
+from via.cache import TTLCache
+from via.services.http import HTTPService
 from via.services.youtube_transcript import (
     TranscriptInfo,
     YouTubeTranscriptService,
@@ -489,6 +493,137 @@ class TestYouTubeTranscriptService:
             {"text": "Hello", "start": 0.1, "duration": 0.5},
         ]
 
+    def test_get_transcript_doesnt_wait_for_the_original_lang_if_theres_english(
+        self, svc, http_service, executor
+    ):
+        http_service.get.return_value = make_response(
+            [{"text": "Hello", "offset": 0, "duration": 500}]
+        )
+
+        svc.get_transcript(SPANISH_TRANSCRIPT_INFO)
+
+        (original_transcript,) = executor.futures
+        assert original_transcript.cancelled()
+
+    def test_get_transcript_remembers_videos_with_no_english(
+        self, svc, http_service, no_english_cache
+    ):
+        http_service.get.side_effect = [
+            make_response([]),
+            make_response([{"text": "Hola", "offset": 0, "duration": 500}]),
+            make_response([{"text": "Hola", "offset": 0, "duration": 500}]),
+        ]
+        svc.get_transcript(SPANISH_TRANSCRIPT_INFO)
+        http_service.get.reset_mock()
+
+        transcript = svc.get_transcript(SPANISH_TRANSCRIPT_INFO)
+
+        assert no_english_cache.get("test_video_id")
+        http_service.get.assert_called_once_with(
+            "https://api.supadata.ai/v1/transcript",
+            params={"url": "https://youtu.be/test_video_id", "lang": "es"},
+            headers={"x-api-key": "test_api_key"},
+        )
+        assert transcript == [{"text": "Hola", "start": 0.0, "duration": 0.5}]
+
+    def test_get_transcript_doesnt_remember_failed_english_calls(
+        self, svc, http_service, no_english_cache
+    ):
+        http_service.get.side_effect = [
+            Exception("English not available"),
+            make_response([{"text": "Hola", "offset": 0, "duration": 500}]),
+        ]
+
+        svc.get_transcript(SPANISH_TRANSCRIPT_INFO)
+
+        assert no_english_cache.get("test_video_id") is None
+
+    def test_get_transcript_fetches_both_languages_at_once(
+        self, http_service, supadata_executor, no_english_cache
+    ):
+        svc = YouTubeTranscriptService(
+            http_service,
+            api_key="test_api_key",
+            executor=supadata_executor,
+            background_http_service=http_service,
+            no_english_cache=no_english_cache,
+        )
+        both_started = Barrier(2, timeout=5)
+
+        def get(_url, params, headers):  # noqa: ARG001
+            both_started.wait()
+            if params["lang"] == "en":
+                return make_response([])
+            return make_response([{"text": "Hola", "offset": 0, "duration": 500}])
+
+        http_service.get.side_effect = get
+
+        transcript = svc.get_transcript(SPANISH_TRANSCRIPT_INFO)
+
+        assert transcript == [{"text": "Hola", "start": 0.0, "duration": 0.5}]
+
+    def test_get_transcript_fetches_the_original_language_with_its_own_session(
+        self, http_service, executor, no_english_cache
+    ):
+        background_http_service = MagicMock(spec_set=["get"])
+        svc = YouTubeTranscriptService(
+            http_service,
+            api_key="test_api_key",
+            executor=executor,
+            background_http_service=background_http_service,
+            no_english_cache=no_english_cache,
+        )
+        http_service.get.return_value = make_response([])
+        background_http_service.get.return_value = make_response(
+            [{"text": "Hola", "offset": 0, "duration": 500}]
+        )
+
+        transcript = svc.get_transcript(SPANISH_TRANSCRIPT_INFO)
+
+        assert transcript == [{"text": "Hola", "start": 0.0, "duration": 0.5}]
+        assert http_service.get.call_args.kwargs["params"]["lang"] == "en"
+        assert background_http_service.get.call_args.kwargs["params"]["lang"] == "es"
+
+    def test_get_transcript_when_both_languages_fail(self, svc, http_service, caplog):
+        http_service.get.side_effect = [
+            Exception("English not available"),
+            Exception("Spanish not available"),
+        ]
+
+        with pytest.raises(Exception, match="Spanish not available"):
+            svc.get_transcript(SPANISH_TRANSCRIPT_INFO)
+
+        assert "video_id=test_video_id lang=es" in caplog.text
+
+    def test_get_transcript_doesnt_log_failures_it_doesnt_use(
+        self, http_service, supadata_executor, no_english_cache, caplog
+    ):
+        background_http_service = MagicMock(spec_set=["get"])
+        svc = YouTubeTranscriptService(
+            http_service,
+            api_key="test_api_key",
+            executor=supadata_executor,
+            background_http_service=background_http_service,
+            no_english_cache=no_english_cache,
+        )
+        original_failed = Event()
+
+        def fail(*_args, **_kwargs):
+            original_failed.set()
+            raise Exception("Spanish not available")  # noqa: EM101, TRY002, TRY003
+
+        def get_english(*_args, **_kwargs):
+            original_failed.wait(5)
+            return make_response([{"text": "Hello", "offset": 0, "duration": 500}])
+
+        background_http_service.get.side_effect = fail
+        http_service.get.side_effect = get_english
+
+        transcript = svc.get_transcript(SPANISH_TRANSCRIPT_INFO)
+
+        assert transcript == [{"text": "Hello", "start": 0.0, "duration": 0.5}]
+        assert "Spanish not available" not in caplog.text
+
     def test_get_transcript_error_response(self, svc, transcript_info, http_service):
         # We get an error response from the Supadata API.
         http_service.get.side_effect = Exception("Something went wrong")
@@ -517,27 +652,55 @@ class TestYouTubeTranscriptService:
         )
 
     @pytest.fixture
-    def svc(self, http_service):
-        return YouTubeTranscriptService(http_service, api_key="test_api_key")
+    def executor(self):
+        return LazyExecutor()
+
+    @pytest.fixture
+    def no_english_cache(self):
+        return TTLCache(maxsize=10)
+
+    @pytest.fixture
+    def svc(self, http_service, executor, no_english_cache):
+        return YouTubeTranscriptService(
+            http_service,
+            api_key="test_api_key",
+            executor=executor,
+            background_http_service=http_service,
+            no_english_cache=no_english_cache,
+        )
 
 
 class TestFactory:
-    def test_factory(self, YouTubeTranscriptService, pyramid_request, HTTPService):
-        svc = factory(sentinel.context, pyramid_request)
+    def test_factory(
+        self,
+        YouTubeTranscriptService,
+        pyramid_request,
+        mock_service,
+        supadata_executor,
+        youtube_no_english_cache,
+        pooled_http_adapter,
+    ):
+        http_service = mock_service(HTTPService)
 
-        HTTPService.assert_called_once()
+        svc = factory(sentinel.context, pyramid_request)
 
         YouTubeTranscriptService.assert_called_once_with(
-            http_service=HTTPService.return_value,
+            http_service=http_service,
             api_key="test_supadata_api_key",
+            executor=supadata_executor,
+            background_http_service=Any.instance_of(HTTPService),
+            no_english_cache=youtube_no_english_cache,
+        )
+        background_http_service = YouTubeTranscriptService.call_args.kwargs[
+            "background_http_service"
+        ]
+        assert background_http_service is not http_service
+        assert background_http_service._session.get_adapter("https://") == (  # noqa: SLF001
+            pooled_http_adapter
         )
 
         assert svc == YouTubeTranscriptService.return_value
 
-    @pytest.fixture
-    def HTTPService(self, patch):
-        return patch("via.services.youtube_transcript.HTTPService")
-
     @pytest.fixture
     def YouTubeTranscriptService(self, patch):
         return patch("via.services.youtube_transcript.YouTubeTranscriptService")
@@ -546,3 +709,50 @@ class TestFactory:
 @pytest.fixture
 def http_service():
     return MagicMock(spec_set=["get"])
+
+
+class LazyExecutor(Executor):
+    """An executor which only runs each call once something needs its result.
+
+    This keeps the order of calls predictable in tests.
+    """
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = LazyFuture(fn, *args, **kwargs)
+        self.futures.append(future)
+        return future
+
+
+class LazyFuture(Future):
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self._call = (fn, args, kwargs)
+
+    def result(self, timeout=None):
+        self.set_running_or_notify_cancel()
+        fn, args, kwargs = self._call
+        try:
+            self.set_result(fn(*args, **kwargs))
+        except Exception as err:  # noqa: BLE001
+            self.set_exception(err)
+
+        return super().result(timeout)
+
+
+def make_response(content):
+    response = Response()
+    response.status_code = 200
+    response.json = lambda: {"content": content}
+    return response
+
+
+SPANISH_TRANSCRIPT_INFO = TranscriptInfo(
+    language_code="es",
+    name="Spanish",
+    url="supadata://test_video_id/es",
+    autogenerated=False,
+    video_id="test_video_id",
+)
@@ -0,0 +1,174 @@
+import json
+import logging
+
+import pytest
+from marshmallow.exceptions import ValidationError
+from pyramid.httpexceptions import HTTPTemporaryRedirect
+from requests import HTTPError
+
+from tests.common.requests_exceptions import make_requests_exception
+from via.exceptions import BadURL, UpstreamServiceError
+from via.views.api.url_details import MAX_URLS, get_url_details
+
+LINK_A = "http://via.example.com/route?url=http%3A%2F%2Fexample.com%2Fa.pdf&via.sec=a"
+LINK_B = "http://via.example.com/route?url=http%3A%2F%2Fexample.com%2Fb&via.sec=b"
+
+
+class TestGetURLDetails:
+    def test_it(self, pyramid_request, url_details_service, secure_link_service):
+        set_json_body(pyramid_request, {"links": [LINK_A, LINK_B]})
+        url_details_service.get_url_details.side_effect = [
+            ("application/pdf", 200),
+            ("text/html", 404),
+        ]
+
+        response = get_url_details(pyramid_request)
+
+        secure_link_service.url_has_valid_token.assert_any_call(LINK_A)
+        url_details_service.get_url_details.assert_any_call("http://example.com/a.pdf")
+        assert response == {
+            "data": [
+                {
+                    "type": "url_details",
+                    "id": LINK_A,
+                    "attributes": {
+                        "blocked": False,
+                        "mime_type": "application/pdf",
+                        "status_code": 200,
+                    },
+                },
+                {
+                    "type": "url_details",
+                    "id": LINK_B,
+                    "attributes": {
+                        "blocked": False,
+                        "mime_type": "text/html",
+                        "status_code": 404,
+                    },
+                },
+            ]
+        }
+
+    def test_it_doesnt_pass_on_the_callers_headers(
+        self, pyramid_request, url_details_service
+    ):
+        set_json_body(pyramid_request, {"links": [LINK_A]})
+        pyramid_request.headers["Accept-Language"] = "fr"
+        pyramid_request.headers["Authorization"] = "Bearer token"
+
+        get_url_details(pyramid_request)
+
+        url_details_service.get_url_details.assert_called_once_with(
+            "http://example.com/a.pdf"
+        )
+
+    def test_it_only_looks_up_signed_links(
+        self, pyramid_request, url_details_service, secure_link_service
+    ):
+        set_json_body(pyramid_request, {"links": [LINK_A]})
+        secure_link_service.url_has_valid_token.return_value = False
+
+        response = get_url_details(pyramid_request)
+
+        assert response["data"][0]["attributes"] == {
+            "blocked": False,
+            "error": {"code": "InvalidToken", "detail": "The link isn't signed"},
+        }
+        url_details_service.get_url_details.assert_not_called()
+
+    @pytest.mark.parametrize(
+        "link",
+        [
+            "http://via.example.com/route?via.sec=token",
+            "http://via.example.com/route?url=http://a.com&url=http://b.com",
+        ],
+    )
+    def test_it_with_links_without_one_url(
+        self, pyramid_request, url_details_service, link
+    ):
+        set_json_body(pyramid_request, {"links": [link]})
+
+        response = get_url_details(pyramid_request)
+
+        assert response["data"][0]["attributes"] == {
+            "blocked": False,
+            "error": {"code": "MissingURL", "detail": "The link doesn't have one URL"},
+        }
+        url_details_service.get_url_details.assert_not_called()
+
+    def test_it_with_a_blocked_url(self, pyramid_request, url_details_service):
+        set_json_body(pyramid_request, {"links": [LINK_A]})
+        url_details_service.get_url_details.side_effect = HTTPTemporaryRedirect(
+            location="http://checkmate.example.com/blocked"
+        )
+
+        response = get_url_details(pyramid_request)
+
+        assert response["data"][0]["attributes"] == {
+            "blocked": True,
+            "blocked_url": "http://checkmate.example.com/blocked",
+        }
+
+    def test_it_with_an_error(self, pyramid_request, url_details_service, caplog):
+        caplog.set_level(logging.INFO)
+        set_json_body(pyramid_request, {"links": [LINK_A]})
+        url_details_service.get_url_details.side_effect = BadURL("Private URL")
+
+        response = get_url_details(pyramid_request)
+
+        assert response["data"][0]["attributes"] == {
+            "blocked": False,
+            "error": {"code": "BadURL", "detail": "The URL isn't valid"},
+        }
+        assert caplog.record_tuples == [
+            (
+                "via.views.api.url_details",
+                logging.INFO,
+                "Could not get details for http://example.com/a.pdf",
+            )
+        ]
+
+    def test_it_doesnt_pass_on_upstream_responses(
+        self, pyramid_request, url_details_service
+    ):
+        set_json_body(pyramid_request, {"links": [LINK_A]})
+        upstream_error = make_requests_exception(
+            HTTPError, status_code=500, raw_data="Secret upstream details"
+        )
+        url_details_service.get_url_details.side_effect = UpstreamServiceError(
+            "Upstream failed", upstream_error
+        )
+
+        response = get_url_details(pyramid_request)
+
+        assert response["data"][0]["attributes"]["error"] == {
+            "code": "UpstreamServiceError",
+            "detail": "Could not get web page",
+        }
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            {},
+            {"links": []},
+            {"links": ["not a url"]},
+            {"links": [LINK_A] * (MAX_URLS + 1)},
+        ],
+    )
+    @pytest.mark.usefixtures("url_details_service")
+    def test_it_rejects_invalid_requests(self, pyramid_request, body):
+        set_json_body(pyramid_request, body)
+
+        with pytest.raises(ValidationError):
+            get_url_details(pyramid_request)
+
+    @pytest.fixture(autouse=True)
+    def secure_link_service(self, secure_link_service):
+        secure_link_service.url_has_valid_token.return_value = True
+        return secure_link_service
+
+
+def set_json_body(request, body):
+    request.headers["content-type"] = "application/json"
+    request.charset = "utf-8"
+    request.body = json.dumps(body).encode("utf-8")
@@ -1,24 +1,89 @@
-from unittest.mock import sentinel
+import gzip
+import json
 
 import pytest
+from webob.etag import ETagMatcher
 
+from via.models import Transcript
 from via.views.api import youtube
 
 
+@pytest.mark.usefixtures("youtube_service", "youtube_transcript_cache")
 class TestGetTranscript:
     def test_it(self, pyramid_request, youtube_service):
+        pyramid_request.headers["Accept-Encoding"] = "identity"
+
+        response = youtube.get_transcript(pyramid_request)
+
+        youtube_service.get_transcript.assert_called_once_with("test_video_id")
+        assert response.content_type == "application/json"
+        assert response.content_encoding is None
+        assert response.vary == ("Accept-Encoding",)
+        assert response.json == {
+            "data": {
+                "type": "transcripts",
+                "id": "test_video_id",
+                "attributes": {"segments": SEGMENTS},
+            }
+        }
+
+    def test_it_sends_compressed_transcripts(self, pyramid_request):
+        pyramid_request.headers["Accept-Encoding"] = "gzip, deflate"
+
         response = youtube.get_transcript(pyramid_request)
 
-        youtube_service.get_transcript.assert_called_once_with(sentinel.video_id)
-        assert response == {
+        assert response.content_encoding == "gzip"
+        assert json.loads(gzip.decompress(response.body)) == {
             "data": {
                 "type": "transcripts",
-                "id": sentinel.video_id,
-                "attributes": {"segments": youtube_service.get_transcript.return_value},
+                "id": "test_video_id",
+                "attributes": {"segments": SEGMENTS},
             }
         }
 
+    def test_it_remembers_encoded_transcripts(self, pyramid_request, youtube_service):
+        first_response = youtube.get_transcript(pyramid_request)
+
+        response = youtube.get_transcript(pyramid_request)
+
+        youtube_service.get_transcript.assert_called_once()
+        assert response.body == first_response.body
+        assert response.etag == first_response.etag
+
+    def test_it_doesnt_remember_empty_transcripts(
+        self, pyramid_request, youtube_service
+    ):
+        youtube_service.get_transcript.return_value = Transcript(
+            video_id="test_video_id", transcript_id="test_transcript_id", transcript=[]
+        )
+
+        youtube.get_transcript(pyramid_request)
+        youtube.get_transcript(pyramid_request)
+
+        assert youtube_service.get_transcript.call_count == 2
+
+    def test_it_supports_conditional_requests(self, pyramid_request):
+        etag = youtube.get_transcript(pyramid_request).etag
+        pyramid_request.if_none_match = ETagMatcher.parse(f'W/"{etag}"')
+
+        response = youtube.get_transcript(pyramid_request)
+
+        assert response.conditional_response
+        assert response.etag == etag
+
     @pytest.fixture
     def pyramid_request(self, pyramid_request):
-        pyramid_request.matchdict["video_id"] = sentinel.video_id
+        pyramid_request.matchdict["video_id"] = "test_video_id"
         return pyramid_request
+
+    @pytest.fixture
+    def youtube_service(self, youtube_service):
+        youtube_service.get_transcript.return_value = Transcript(
+            video_id="test_video_id",
+            transcript_id="test_transcript_id",
+            transcript=SEGMENTS,
+        )
+        return youtube_service
+
+
+SEGMENTS = [{"text": "Hello", "start": 0.0, "duration": 1.5}]
@@ -22,6 +22,7 @@ class TestStatusRoute:
         expected_status,
         expected_body,
         checkmate_service,
+        pooled_checkmate_client,
         capture_message,
     ):
         if include_checkmate:
@@ -32,10 +33,43 @@ class TestStatusRoute:
 
         result = status(pyramid_request)
 
+        if include_checkmate:
+            expected_body["checkmate"] = {
+                "circuit_breaker": pooled_checkmate_client.circuit_breaker.stats
+            }
         assert pyramid_request.response.status_int == expected_status
         assert result == expected_body
         capture_message.assert_not_called()
 
+    def test_status_includes_stats(
+        self,
+        pyramid_request,
+        url_details_cache,
+        pooled_http_adapter,
+        pdf_cache,
+        nginx_signed_urls_cache,
+        youtube_title_cache,
+        single_flight,
+        checkmate_verdict_cache,
+        google_drive_api,
+        decryption_service,
+    ):
+        pyramid_request.params["include-stats"] = ""
+
+        result = status(pyramid_request)
+
+        assert result["stats"] == {
+            "http_pool": pooled_http_adapter.stats,
+            "url_details_cache": url_details_cache.stats,
+            "pdf_cache": pdf_cache.stats,
+            "nginx_signed_urls": nginx_signed_urls_cache.stats,
+            "youtube_titles": youtube_title_cache.stats,
+            "single_flight": single_flight.stats,
+            "checkmate_cache": checkmate_verdict_cache.stats,
+            "google_drive": google_drive_api.stats,
+            "decryption_cache": decryption_service.stats,
+        }
+
     def test_status_sends_test_messages_to_sentry(
         self, pyramid_request, capture_message
     ):
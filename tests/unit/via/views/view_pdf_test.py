@@ -1,10 +1,24 @@
-from unittest.mock import create_autospec
+import logging
+from contextlib import suppress
+from datetime import UTC, datetime
+from threading import Event
+from unittest.mock import Mock, create_autospec
 
 import pytest
+from h_matchers import Any
 from h_vialib.secure import Encryption
-from pyramid.httpexceptions import HTTPNoContent
-
+from pyramid.httpexceptions import (
+    HTTPNoContent,
+    HTTPNotModified,
+    HTTPRequestRangeNotSatisfiable,
+)
+from pyramid.response import FileResponse
+from webob import Request
+
+from via.exceptions import GoogleDriveServiceError, UpstreamServiceError
 from via.resources import QueryURLResource
+from via.services.google_drive import GoogleDriveFileMetadata
+from via.services.http import StreamedResponse
 from via.views.view_pdf import proxy_google_drive_file, proxy_python_pdf, view_pdf
 
 
@@ -54,6 +68,7 @@ class TestViewPDF:
         return create_autospec(QueryURLResource, spec_set=True, instance=True)
 
 
+@pytest.mark.usefixtures("pdf_cache")
 class TestProxyGoogleDriveFile:
     def test_it_returns_restricted_page_when_not_lms(
         self, pyramid_request, secure_link_service
@@ -69,26 +84,236 @@ class TestProxyGoogleDriveFile:
     ):
         secure_link_service.request_has_valid_token.return_value = True
         pyramid_request.matchdict = {"file_id": "test_file_id"}
-        google_drive_api.iter_file.return_value = iter([b"pdf content"])
+        google_drive_api.stream_file.return_value = StreamedResponse(
+            status_code=200, headers={}, content=iter([b"pdf content"])
+        )
+
+        response = proxy_google_drive_file(pyramid_request)
+
+        google_drive_api.stream_file.assert_called_once_with(
+            file_id="test_file_id", resource_key=None, headers={}
+        )
+        google_drive_api.get_file_metadata.assert_called_once_with("test_file_id", None)
+        assert response.status_int == 200
+        assert response.headers["Accept-Ranges"] == "bytes"
+        assert response.headers["Content-Length"] == "11"
+        assert response.headers["ETag"] == '"md5"'
+        assert response.headers["Last-Modified"] == "Mon, 01 Jan 2024 12:00:00 GMT"
+        assert list(response.app_iter) == [b"pdf content"]
+
+    def test_it_proxies_without_metadata(
+        self, pyramid_request, secure_link_service, google_drive_api, caplog
+    ):
+        secure_link_service.request_has_valid_token.return_value = True
+        pyramid_request.matchdict = {"file_id": "test_file_id"}
+        google_drive_api.get_file_metadata.side_effect = UpstreamServiceError("Oops")
+        google_drive_api.stream_file.return_value = StreamedResponse(
+            status_code=200, headers={}, content=iter([b"pdf content"])
+        )
+
+        response = proxy_google_drive_file(pyramid_request)
+
+        assert response.status_int == 200
+        assert "ETag" not in response.headers
+        assert "Content-Length" not in response.headers
+        assert caplog.record_tuples == [
+            (
+                "via.views.view_pdf",
+                logging.WARNING,
+                "Could not get Google Drive metadata",
+            )
+        ]
+
+    def test_it_doesnt_get_metadata_if_its_disabled(
+        self, pyramid_request, secure_link_service, google_drive_api
+    ):
+        pyramid_request.registry.settings["google_drive_metadata"] = False
+        secure_link_service.request_has_valid_token.return_value = True
+        pyramid_request.matchdict = {"file_id": "test_file_id"}
+        google_drive_api.stream_file.return_value = StreamedResponse(
+            status_code=200, headers={}, content=iter([b"pdf content"])
+        )
 
-        proxy_google_drive_file(pyramid_request)
+        response = proxy_google_drive_file(pyramid_request)
 
-        google_drive_api.iter_file.assert_called_once_with(
-            file_id="test_file_id", resource_key=None
+        google_drive_api.get_file_metadata.assert_not_called()
+        assert response.status_int == 200
+        assert "ETag" not in response.headers
+        assert list(response.app_iter) == [b"pdf content"]
+
+    @pytest.mark.parametrize(
+        "metadata,status_int",  # noqa: PT006
+        [
+            ({"mime_type": "application/vnd.google-apps.document"}, 415),
+            ({"size": 600 * 1024 * 1024}, 413),
+        ],
+    )
+    def test_it_rejects_files_it_cant_show(
+        self,
+        pyramid_request,
+        secure_link_service,
+        google_drive_api,
+        metadata,
+        status_int,
+    ):
+        secure_link_service.request_has_valid_token.return_value = True
+        pyramid_request.matchdict = {"file_id": "test_file_id"}
+        google_drive_api.get_file_metadata.return_value = GoogleDriveFileMetadata(
+            **{**METADATA.__dict__, **metadata}
         )
 
+        with pytest.raises(GoogleDriveServiceError) as exc_info:
+            proxy_google_drive_file(pyramid_request)
+
+        assert exc_info.value.status_int == status_int
+        google_drive_api.stream_file.assert_not_called()
+
+    @pytest.mark.parametrize(
+        "headers",
+        [
+            {"If-None-Match": '"md5"'},
+            {"If-None-Match": '"other", "md5"'},
+            {"If-Modified-Since": "Mon, 01 Jan 2024 12:00:00 GMT"},
+            {"If-Modified-Since": "Tue, 02 Jan 2024 12:00:00 GMT"},
+        ],
+    )
+    def test_it_answers_conditional_requests_without_downloading(
+        self, pyramid_request, secure_link_service, google_drive_api, headers
+    ):
+        secure_link_service.request_has_valid_token.return_value = True
+        pyramid_request.matchdict = {"file_id": "test_file_id"}
+        pyramid_request.headers.update(headers)
+
+        response = proxy_google_drive_file(pyramid_request)
+
+        assert isinstance(response, HTTPNotModified)
+        assert response.headers["ETag"] == '"md5"'
+        google_drive_api.stream_file.assert_not_called()
+
+    @pytest.mark.parametrize(
+        "headers,metadata",  # noqa: PT006
+        [
+            ({"If-None-Match": '"other"'}, {}),
+            ({"If-None-Match": '"md5"'}, {"md5_checksum": None}),
+            # If-None-Match takes precedence
+            (
+                {
+                    "If-None-Match": '"other"',
+                    "If-Modified-Since": "Tue, 02 Jan 2024 12:00:00 GMT",
+                },
+                {},
+            ),
+            ({"If-Modified-Since": "Sun, 31 Dec 2023 12:00:00 GMT"}, {}),
+            ({"If-Modified-Since": "nonsense"}, {}),
+            (
+                {"If-Modified-Since": "Tue, 02 Jan 2024 12:00:00 GMT"},
+                {"modified_time": None},
+            ),
+        ],
+    )
+    def test_it_downloads_modified_files(
+        self, pyramid_request, secure_link_service, google_drive_api, headers, metadata
+    ):
+        secure_link_service.request_has_valid_token.return_value = True
+        pyramid_request.matchdict = {"file_id": "test_file_id"}
+        pyramid_request.headers.update(headers)
+        google_drive_api.get_file_metadata.return_value = GoogleDriveFileMetadata(
+            **{**METADATA.__dict__, **metadata}
+        )
+        google_drive_api.stream_file.return_value = StreamedResponse(
+            status_code=200, headers={}, content=iter([b"pdf content"])
+        )
+
+        response = proxy_google_drive_file(pyramid_request)
+
+        assert response.status_int == 200
+
+    def test_it_forwards_range_requests(
+        self, pyramid_request, secure_link_service, google_drive_api
+    ):
+        secure_link_service.request_has_valid_token.return_value = True
+        pyramid_request.matchdict = {"file_id": "test_file_id"}
+        pyramid_request.headers["Range"] = "bytes=0-1023"
+        google_drive_api.stream_file.return_value = StreamedResponse(
+            status_code=206,
+            headers={"Content-Range": "bytes 0-1023/5000", "Content-Length": "1024"},
+            content=iter([b"pdf content"]),
+        )
+
+        response = proxy_google_drive_file(pyramid_request)
+
+        google_drive_api.stream_file.assert_called_once_with(
+            file_id="test_file_id",
+            resource_key=None,
+            headers={"Range": "bytes=0-1023", "Accept-Encoding": "identity"},
+        )
+        assert response.status_int == 206
+        assert response.headers["Content-Range"] == "bytes 0-1023/5000"
+        assert response.headers["Content-Length"] == "1024"
+
     def test_it_returns_no_content_for_empty_stream(
         self, pyramid_request, secure_link_service, google_drive_api
     ):
         secure_link_service.request_has_valid_token.return_value = True
         pyramid_request.matchdict = {"file_id": "test_file_id"}
-        google_drive_api.iter_file.return_value = iter([])
+        google_drive_api.stream_file.return_value = StreamedResponse(
+            status_code=200, headers={}, content=iter([])
+        )
 
         result = proxy_google_drive_file(pyramid_request)
 
         assert isinstance(result, HTTPNoContent)
 
+    def test_it_caches_files(
+        self, pyramid_request, secure_link_service, google_drive_api
+    ):
+        secure_link_service.request_has_valid_token.return_value = True
+        pyramid_request.matchdict = {"file_id": "test_file_id"}
+        google_drive_api.stream_file.return_value = StreamedResponse(
+            status_code=200, headers={}, content=iter([b"pdf content"])
+        )
+        list(proxy_google_drive_file(pyramid_request).app_iter)
+
+        response = proxy_google_drive_file(pyramid_request)
+
+        google_drive_api.stream_file.assert_called_once()
+        assert response.body == b"pdf content"
+        assert response.headers["ETag"] == '"md5"'
 
+    def test_it_doesnt_serve_cached_copies_of_old_versions(
+        self, pyramid_request, secure_link_service, google_drive_api
+    ):
+        secure_link_service.request_has_valid_token.return_value = True
+        pyramid_request.matchdict = {"file_id": "test_file_id"}
+        google_drive_api.stream_file.side_effect = [
+            StreamedResponse(status_code=200, headers={}, content=iter([b"old"])),
+            StreamedResponse(status_code=200, headers={}, content=iter([b"new"])),
+        ]
+        list(proxy_google_drive_file(pyramid_request).app_iter)
+        google_drive_api.get_file_metadata.return_value = GoogleDriveFileMetadata(
+            **{**METADATA.__dict__, "md5_checksum": "new_md5"}
+        )
+
+        response = proxy_google_drive_file(pyramid_request)
+
+        assert b"".join(response.app_iter) == b"new"
+        assert response.headers["ETag"] == '"new_md5"'
+
+    @pytest.fixture
+    def google_drive_api(self, google_drive_api):
+        google_drive_api.get_file_metadata.return_value = METADATA
+        return google_drive_api
+
+
+METADATA = GoogleDriveFileMetadata(
+    size=11,
+    mime_type="application/pdf",
+    md5_checksum="md5",
+    modified_time=datetime(2024, 1, 1, 12, 0, 0, 500, tzinfo=UTC),
+)
+
+
+@pytest.mark.usefixtures("pdf_cache", "decryption_service")
 class TestProxyPythonPDF:
     def test_it_returns_restricted_page_when_not_lms(
         self, pyramid_request, secure_link_service
@@ -101,26 +326,19 @@ class TestProxyPythonPDF:
 
         assert response == {"target_url": "https://one-drive.com"}
 
-    def test_it_proxies_when_lms(
-        self, pyramid_request, secure_link_service, http_service
-    ):
-        secure_link_service.request_has_valid_token.return_value = True
-        context = create_autospec(QueryURLResource, spec_set=True, instance=True)
-        context.url_from_query.return_value = "https://one-drive.com"
-        http_service.stream.return_value = iter([b"pdf content"])
-
-        proxy_python_pdf(context, pyramid_request)
+    def test_it_proxies_when_lms(self, context, pyramid_request, http_service):
+        response = proxy_python_pdf(context, pyramid_request)
 
-        http_service.stream.assert_called_once()
+        http_service.stream_response.assert_called_once_with(
+            "https://one-drive.com", headers=Any.dict(), params={}
+        )
+        assert response.status_int == 200
+        assert response.headers["Content-Type"] == "application/pdf"
+        assert list(response.app_iter) == [b"pdf content"]
 
     def test_it_decrypts_secret_query_params(
-        self, pyramid_request, secure_link_service, http_service
+        self, context, pyramid_request, http_service
     ):
-        secure_link_service.request_has_valid_token.return_value = True
-        context = create_autospec(QueryURLResource, spec_set=True, instance=True)
-        context.url_from_query.return_value = "https://one-drive.com"
-        http_service.stream.return_value = iter([b"pdf content"])
-
         secret = pyramid_request.registry.settings["via_secret"]
         encryption = Encryption(secret.encode("utf-8"))
         pyramid_request.params["via.secret.query"] = encryption.encrypt_dict(
@@ -129,4 +347,453 @@ class TestProxyPythonPDF:
 
         proxy_python_pdf(context, pyramid_request)
 
-        http_service.stream.assert_called_once()
+        http_service.stream_response.assert_called_once_with(
+            "https://one-drive.com", headers=Any.dict(), params={"key": "value"}
+        )
+
+    @pytest.mark.parametrize(
+        "range_,if_range,expected",  # noqa: PT006
+        [
+            (
+                "bytes=0-1023",
+                None,
+                {"Range": "bytes=0-1023", "Accept-Encoding": "identity"},
+            ),
+            ("bytes=1024-", None, {"Range": "bytes=1024-"}),
+            ("bytes=-500", None, {"Range": "bytes=-500"}),
+            (
+                "bytes=0-1023",
+                '"etag"',
+                {"Range": "bytes=0-1023", "If-Range": '"etag"'},
+            ),
+            # We don't forward things we don't understand, or multiple ranges
+            ("bytes=0-1,5-6", None, {}),
+            ("lines=1-2", None, {}),
+            ("nonsense", None, {}),
+        ],
+    )
+    def test_it_forwards_single_byte_ranges(
+        self, context, pyramid_request, http_service, range_, if_range, expected
+    ):
+        pyramid_request.headers["Range"] = range_
+        if if_range:
+            pyramid_request.headers["If-Range"] = if_range
+
+        proxy_python_pdf(context, pyramid_request)
+
+        headers = http_service.stream_response.call_args.kwargs["headers"]
+        for name in ("Range", "If-Range"):
+            assert headers.get(name) == expected.get(name)
+        if expected:
+            assert headers["Accept-Encoding"] == "identity"
+
+    def test_it_returns_partial_content(self, context, pyramid_request, http_service):
+        http_service.stream_response.return_value = StreamedResponse(
+            status_code=206,
+            headers={"Content-Range": "bytes 0-10/100", "Content-Length": "11"},
+            content=iter([b"pdf content"]),
+        )
+
+        response = proxy_python_pdf(context, pyramid_request)
+
+        assert response.status_int == 206
+        assert response.headers["Content-Range"] == "bytes 0-10/100"
+        assert response.headers["Content-Length"] == "11"
+        assert response.headers["Accept-Ranges"] == "bytes"
+
+    @pytest.mark.parametrize(
+        "upstream_headers,content_length,accept_ranges",  # noqa: PT006
+        [
+            ({}, None, None),
+            ({"Content-Length": "11"}, "11", None),
+            ({"Content-Length": "11", "Content-Encoding": "identity"}, "11", None),
+            ({"Content-Length": "5", "Content-Encoding": "gzip"}, None, None),
+            ({"Accept-Ranges": "bytes"}, None, "bytes"),
+            ({"Accept-Ranges": "none"}, None, None),
+        ],
+    )
+    def test_it_passes_through_headers(
+        self,
+        context,
+        pyramid_request,
+        http_service,
+        upstream_headers,
+        content_length,
+        accept_ranges,
+    ):
+        http_service.stream_response.return_value = StreamedResponse(
+            status_code=200, headers=upstream_headers, content=iter([b"pdf content"])
+        )
+
+        response = proxy_python_pdf(context, pyramid_request)
+
+        assert response.headers.get("Content-Length") == content_length
+        assert response.headers.get("Accept-Ranges") == accept_ranges
+
+    @pytest.mark.parametrize(
+        "upstream_headers,etag",  # noqa: PT006
+        [
+            ({"ETag": '"abc"'}, '"abc"'),
+            ({"ETag": '"abc"', "Content-Encoding": "gzip"}, 'W/"abc"'),
+            ({"ETag": 'W/"abc"', "Content-Encoding": "gzip"}, 'W/"abc"'),
+            ({}, None),
+        ],
+    )
+    def test_it_passes_through_validators(
+        self, context, pyramid_request, http_service, upstream_headers, etag
+    ):
+        http_service.stream_response.return_value = StreamedResponse(
+            status_code=200,
+            headers={
+                "Last-Modified": "Mon, 01 Jan 2024 12:00:00 GMT",
+                **upstream_headers,
+            },
+            content=iter([b"pdf content"]),
+        )
+
+        response = proxy_python_pdf(context, pyramid_request)
+
+        assert response.headers.get("ETag") == etag
+        assert response.headers["Last-Modified"] == "Mon, 01 Jan 2024 12:00:00 GMT"
+
+    def test_it_forwards_conditional_requests(
+        self, context, pyramid_request, http_service
+    ):
+        pyramid_request.headers["If-None-Match"] = '"abc"'
+        pyramid_request.headers["If-Modified-Since"] = "Mon, 01 Jan 2024 12:00:00 GMT"
+
+        proxy_python_pdf(context, pyramid_request)
+
+        headers = http_service.stream_response.call_args.kwargs["headers"]
+        assert headers["If-None-Match"] == '"abc"'
+        assert headers["If-Modified-Since"] == "Mon, 01 Jan 2024 12:00:00 GMT"
+
+    def test_it_returns_not_modified(
+        self, context, pyramid_request, http_service, pdf_cache
+    ):
+        pdf_cache.follow = Mock()
+        pyramid_request.headers["If-None-Match"] = '"abc"'
+        http_service.stream_response.return_value = StreamedResponse(
+            status_code=304, headers={"ETag": '"abc"'}, content=iter([])
+        )
+
+        response = proxy_python_pdf(context, pyramid_request)
+
+        assert isinstance(response, HTTPNotModified)
+        assert response.headers["ETag"] == '"abc"'
+        assert response.headers["Cache-Control"] == Any.string.containing("max-age")
+        # We didn't keep the file locked, so the next request can fetch it
+        # without waiting
+        del pyramid_request.headers["If-None-Match"]
+        http_service.stream_response.return_value = StreamedResponse(
+            status_code=200, headers={}, content=iter([b"pdf content"])
+        )
+        list(proxy_python_pdf(context, pyramid_request).app_iter)
+        pdf_cache.follow.assert_not_called()
+
+    def test_it_returns_range_not_satisfiable(
+        self, context, pyramid_request, http_service
+    ):
+        pyramid_request.headers["Range"] = "bytes=1000-"
+        http_service.stream_response.side_effect = UpstreamServiceError(
+            "Bad range",
+            requests_err=Mock(
+                response=Mock(status_code=416, headers={"Content-Range": "bytes */99"})
+            ),
+        )
+
+        response = proxy_python_pdf(context, pyramid_request)
+
+        assert isinstance(response, HTTPRequestRangeNotSatisfiable)
+        assert response.headers["Content-Range"] == "bytes */99"
+
+    def test_it_caches_complete_files(self, context, pyramid_request, http_service):
+        list(proxy_python_pdf(context, pyramid_request).app_iter)
+
+        response = proxy_python_pdf(context, pyramid_request)
+
+        http_service.stream_response.assert_called_once()
+        assert isinstance(response, FileResponse)
+        assert response.body == b"pdf content"
+        assert response.content_length == len(b"pdf content")
+        assert response.headers["Content-Type"] == "application/pdf"
+        assert response.headers["Content-Disposition"] == "inline"
+        assert response.headers["Accept-Ranges"] == "bytes"
+
+    def test_it_answers_conditional_requests_from_the_cache(
+        self, context, pyramid_request, http_service
+    ):
+        list(proxy_python_pdf(context, pyramid_request).app_iter)
+        response = proxy_python_pdf(context, pyramid_request)
+
+        revalidation = Request.blank(
+            "/", headers={"If-None-Match": response.headers["ETag"]}
+        ).get_response(response)
+
+        revalidation.app_iter.close()
+        assert revalidation.status_int == 304
+        http_service.stream_response.assert_called_once()
+
+    def test_it_serves_ranges_from_the_cache(
+        self, context, pyramid_request, http_service
+    ):
+        list(proxy_python_pdf(context, pyramid_request).app_iter)
+
+        response = proxy_python_pdf(context, pyramid_request)
+
+        partial = Request.blank("/", headers={"Range": "bytes=4-10"}).get_response(
+            response
+        )
+
+        assert partial.status_int == 206
+        assert partial.body == b"content"
+        assert partial.headers["Content-Range"] == "bytes 4-10/11"
+        http_service.stream_response.assert_called_once()
+
+    def test_it_doesnt_cache_partial_content(
+        self, context, pyramid_request, http_service, pdf_cache
+    ):
+        http_service.stream_response.return_value = StreamedResponse(
+            status_code=206, headers={}, content=iter([b"pdf"])
+        )
+        proxy_python_pdf(context, pyramid_request)
+        http_service.stream_response.return_value = StreamedResponse(
+            status_code=200, headers={}, content=iter([b"pdf content"])
+        )
+        pdf_cache.follow = Mock()
+
+        proxy_python_pdf(context, pyramid_request)
+
+        assert http_service.stream_response.call_count == 2
+        # We released the lock straight away
+        pdf_cache.follow.assert_not_called()
+
+    def test_it_follows_other_requests_for_the_same_file(
+        self, context, pyramid_request, http_service
+    ):
+        carry_on = Event()
+
+        def content():
+            yield b"pdf "
+            carry_on.wait(5)
+            yield b"content"
+
+        http_service.stream_response.return_value = StreamedResponse(
+            status_code=200, headers={"ETag": '"tag"'}, content=content()
+        )
+        first_app_iter = proxy_python_pdf(context, pyramid_request).app_iter
+
+        response = proxy_python_pdf(context, pyramid_request)
+        carry_on.set()
+
+        http_service.stream_response.assert_called_once()
+        assert b"".join(response.app_iter) == b"pdf content"
+        assert response.content_type == "application/pdf"
+        assert b"".join(first_app_iter) == b"pdf content"
+
+    @pytest.mark.usefixtures("http_service")
+    def test_it_follows_empty_files(self, context, pyramid_request, pdf_cache):
+        pdf_cache.lock = Mock(return_value=None)
+        pdf_cache.follow = Mock(return_value=iter([]))
+
+        response = proxy_python_pdf(context, pyramid_request)
+
+        assert isinstance(response, HTTPNoContent)
+
+    def test_it_uses_files_stored_while_it_waited(
+        self, context, pyramid_request, http_service, pdf_cache
+    ):
+        list(proxy_python_pdf(context, pyramid_request).app_iter)
+        get = pdf_cache.get
+        looks = []
+
+        def get_after_the_first_look(key):
+            # Pretend somebody else stored the file while we waited
+            looks.append(key)
+            return None if len(looks) == 1 else get(key)
+
+        pdf_cache.get = Mock(side_effect=get_after_the_first_look)
+        pdf_cache.lock = Mock(return_value=None)
+        pdf_cache.follow = Mock(return_value=None)
+
+        response = proxy_python_pdf(context, pyramid_request)
+
+        assert isinstance(response, FileResponse)
+        assert pdf_cache.get.call_count == 2
+        http_service.stream_response.assert_called_once()
+        response.app_iter.close()
+
+    def test_it_checks_the_cache_again_once_it_has_the_lock(
+        self, context, pyramid_request, http_service, pdf_cache
+    ):
+        list(proxy_python_pdf(context, pyramid_request).app_iter)
+        get = pdf_cache.get
+        keys = []
+
+        def get_after_the_first_look(key):
+            # Pretend somebody else stored the file after we first looked
+            keys.append(key)
+            return None if len(keys) == 1 else get(key)
+
+        pdf_cache.get = Mock(side_effect=get_after_the_first_look)
+
+        response = proxy_python_pdf(context, pyramid_request)
+
+        assert isinstance(response, FileResponse)
+        response.app_iter.close()
+        assert pdf_cache.get.call_count == 2
+        http_service.stream_response.assert_called_once()
+        # We released the lock
+        pdf_cache.lock(keys[0]).close()
+
+    def test_it_fetches_the_file_if_nobody_else_is(
+        self, context, pyramid_request, http_service, pdf_cache
+    ):
+        pdf_cache.lock = Mock(return_value=None)
+        pdf_cache.follow = Mock(return_value=None)
+
+        response = proxy_python_pdf(context, pyramid_request)
+
+        assert list(response.app_iter) == [b"pdf content"]
+        http_service.stream_response.assert_called_once()
+
+    @pytest.mark.usefixtures("http_service")
+    def test_it_doesnt_lock_if_the_cache_is_off(
+        self, context, pyramid_request, pdf_cache
+    ):
+        pdf_cache.max_bytes = 0
+        pdf_cache.lock = Mock()
+
+        response = proxy_python_pdf(context, pyramid_request)
+
+        assert list(response.app_iter) == [b"pdf content"]
+        pdf_cache.lock.assert_not_called()
+
+    def test_range_requests_dont_wait(
+        self, context, pyramid_request, http_service, pdf_cache
+    ):
+        carry_on = Event()
+
+        def content():
+            yield b"pdf "
+            carry_on.wait(5)
+            yield b"content"
+
+        http_service.stream_response.return_value = StreamedResponse(
+            status_code=200, headers={}, content=content()
+        )
+        other_app_iter = proxy_python_pdf(context, pyramid_request).app_iter
+        pdf_cache.follow = Mock()
+        pyramid_request.headers["Range"] = "bytes=0-10"
+        http_service.stream_response.return_value = StreamedResponse(
+            status_code=206, headers={}, content=iter([b"pdf"])
+        )
+
+        proxy_python_pdf(context, pyramid_request)
+
+        pdf_cache.follow.assert_not_called()
+        assert http_service.stream_response.call_count == 2
+        carry_on.set()
+        list(other_app_iter)
+
+    @pytest.mark.parametrize(
+        "exception",
+        [
+            UpstreamServiceError(
+                "Bad range",
+                requests_err=Mock(response=Mock(status_code=416, headers={})),
+            ),
+            UpstreamServiceError("Oh no"),
+            ValueError,
+        ],
+    )
+    def test_it_releases_the_lock_on_errors(
+        self, context, pyramid_request, http_service, pdf_cache, exception
+    ):
+        http_service.stream_response.side_effect = exception
+        with suppress(Exception):
+            proxy_python_pdf(context, pyramid_request)
+        http_service.stream_response.side_effect = None
+        pdf_cache.follow = Mock()
+
+        proxy_python_pdf(context, pyramid_request)
+
+        pdf_cache.follow.assert_not_called()
+
+    def test_it_caches_by_secret_query_and_headers(
+        self, context, pyramid_request, http_service
+    ):
+        list(proxy_python_pdf(context, pyramid_request).app_iter)
+        encryption = Encryption(
+            pyramid_request.registry.settings["via_secret"].encode("utf-8")
+        )
+        pyramid_request.params["via.secret.headers"] = encryption.encrypt_dict(
+            {"Authorization": "Bearer token"}
+        )
+        http_service.stream_response.return_value = StreamedResponse(
+            status_code=200, headers={}, content=iter([b"pdf content"])
+        )
+
+        proxy_python_pdf(context, pyramid_request)
+
+        assert http_service.stream_response.call_count == 2
+        assert (
+            http_service.stream_response.call_args.kwargs["headers"]["Authorization"]
+            == "Bearer token"
+        )
+
+    def test_it_fetches_files_removed_from_the_cache(
+        self, context, pyramid_request, http_service, pdf_cache, patch
+    ):
+        list(proxy_python_pdf(context, pyramid_request).app_iter)
+        patch("via.views.view_pdf.FileResponse", side_effect=FileNotFoundError)
+        http_service.stream_response.return_value = StreamedResponse(
+            status_code=200, headers={}, content=iter([b"pdf content"])
+        )
+
+        response = proxy_python_pdf(context, pyramid_request)
+
+        assert list(response.app_iter) == [b"pdf content"]
+        # Once when we first looked, and again once we had the lock
+        assert pdf_cache.stats["hits"] == 2
+
+    @pytest.mark.parametrize("status_code", [404, None])
+    def test_it_raises_other_upstream_errors(
+        self, context, pyramid_request, http_service, status_code
+    ):
+        http_service.stream_response.side_effect = UpstreamServiceError(
+            "Oh no",
+            requests_err=Mock(
+                response=Mock(status_code=status_code) if status_code else None
+            ),
+        )
+
+        with pytest.raises(UpstreamServiceError):
+            proxy_python_pdf(context, pyramid_request)
+
+    @pytest.fixture
+    def context(self):
+        context = create_autospec(QueryURLResource, spec_set=True, instance=True)
+        context.url_from_query.return_value = "https://one-drive.com"
+        return context
+
+    @pytest.fixture(autouse=True)
+    def secure_link_service(self, secure_link_service):
+        secure_link_service.request_has_valid_token.return_value = True
+        return secure_link_service
+
+    @pytest.fixture
+    def http_service(self, http_service):
+        http_service.stream_response.return_value = StreamedResponse(
+            status_code=200, headers={}, content=iter([b"pdf content"])
+        )
+        return http_service
+
+
+@pytest.fixture(autouse=True)
+def close_response(pyramid_request):
+    yield
+
+    # The WSGI server does this once it has sent the response
+    if close := getattr(pyramid_request.response.app_iter, "close", None):
+        close()
@@ -29,10 +29,16 @@ PARAMETERS = {
     "signed_urls_required": {"formatter": asbool},
     "enable_front_page": {"formatter": asbool},
     "youtube_transcripts": {"formatter": asbool},
+    "google_drive_metadata": {"formatter": asbool},
     "api_jwt_secret": {"required": True},
     "youtube_api_key": {},
     "youtube_proxy": {},
     "supadata_api_key": {},
+    "pdf_cache_directory": {},
+    "pdf_cache_max_mb": {},
+    "youtube_title_cache_warm": {},
+    "web_threads": {},
+    "db_pool_size": {},
 }
 
 
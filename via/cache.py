@@ -0,0 +1,707 @@
+"""Caching helpers."""
+
+import fcntl
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import suppress
+from dataclasses import dataclass, field
+from logging import getLogger
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from threading import Event, Lock, Thread
+from time import monotonic, sleep, time
+
+LOG = getLogger(__name__)
+
+
+class TTLCache:
+    """A thread-safe, size bounded LRU cache where every entry has an expiry.
+
+    Entries are held in process, but a shared `backend` can be provided so
+    that different workers can benefit from each other's work. The backend
+    only needs to implement the subset of the Redis client API we use:
+
+     * `get(key)` returning the stored bytes/string or `None`
+     * `set(key, value, ex=seconds)`
+     * `ttl(key)` returning how many seconds the key has left
+
+    Values stored in the backend are serialised as JSON, so anything cached
+    with a backend must be JSON serialisable. Failures in the backend are
+    logged and otherwise ignored: the in-process cache always works.
+    """
+
+    def __init__(self, maxsize, backend=None, namespace="via", clock=monotonic):
+        """Initialise the cache.
+
+        :param maxsize: Maximum number of entries to keep in process
+        :param backend: Optional Redis-like shared cache
+        :param namespace: Prefix for keys stored in the backend
+        :param clock: Function returning the current time in seconds
+        """
+        self.maxsize = maxsize
+        self._backend = backend
+        self._namespace = namespace
+        self._clock = clock
+
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Get a value from the cache or `default` if it's missing or expired."""
+        with self._lock:
+            if (entry := self._entries.get(key)) is not None:
+                value, expires_at = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+
+                del self._entries[key]
+
+        if self._backend is not None:
+            backend_key = self._backend_key(key)
+            try:
+                if (raw_value := self._backend.get(backend_key)) is not None:
+                    ttl = self._backend.ttl(backend_key)
+            except Exception:  # noqa: BLE001
+                LOG.warning("Could not read from the shared cache", exc_info=True)
+            else:
+                if raw_value is not None:
+                    value = json.loads(raw_value)
+                    with self._lock:
+                        self.hits += 1
+                        # Keep it in process too, so we don't have to ask the
+                        # backend again
+                        if ttl > 0:
+                            self._store(key, value, ttl)
+                    return value
+
+        with self._lock:
+            self.misses += 1
+
+        return default
+
+    def set(self, key, value, ttl):
+        """Store a value in the cache for `ttl` seconds.
+
+        Values with a TTL of zero or less are not stored at all.
+        """
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._store(key, value, ttl)
+
+        if self._backend is not None:
+            try:
+                self._backend.set(
+                    self._backend_key(key), json.dumps(value), ex=max(1, int(ttl))
+                )
+            except Exception:  # noqa: BLE001
+                LOG.warning("Could not write to the shared cache", exc_info=True)
+
+    def clear(self):
+        """Remove all entries from the in-process cache."""
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self):
+        """Return a dict of counters describing how the cache is performing."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def _store(self, key, value, ttl):
+        # The caller must hold `_lock`
+        self._entries[key] = (value, self._clock() + ttl)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _backend_key(self, key):
+        # Keys may contain things we don't want to store in plain text in a
+        # shared service (like auth headers) so we hash them
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        return f"{self._namespace}:{digest}"
+
+
+class IncompleteFileError(Exception):
+    """A file we were following was abandoned before it was complete."""
+
+
+class DiskCache:
+    """A cache of files on disk bounded by their total size.
+
+    Entries are written to a temporary file and only moved into place once
+    complete, so readers never see partial files and the directory can be
+    shared between processes. The modification time of each file records
+    when it was written (for expiry) and the access time when it was last
+    read (for least recently used eviction).
+
+    Like `TTLCache` failures are logged and otherwise ignored: if we can't
+    use the disk we carry on without caching.
+
+    While one request `fill()`s a file, others can `follow()` it as it's
+    written, rather than fetching it again themselves.
+    """
+
+    TEMP_PREFIX = ".tmp-"
+    LOCK_PREFIX = ".lock-"
+    PARTIAL_PREFIX = ".partial-"
+
+    #: How many bytes to read at once when following a file being filled
+    FOLLOW_CHUNK_SIZE = 64 * 1024
+
+    #: How often to check if a lock has been released when waiting for it
+    POLL_INTERVAL = 0.05
+
+    #: How often (in seconds) to look through the whole directory even if
+    #: what we've written ourselves hasn't filled it, to catch files written
+    #: by other processes and ones left behind
+    SCAN_INTERVAL = 60
+
+    def __init__(self, directory, max_bytes, ttl, clock=time):
+        """Initialise the cache.
+
+        :param directory: Directory to store files in (created if missing)
+        :param max_bytes: Maximum total size of all files in the cache
+        :param ttl: How long (in seconds) to keep files for
+        :param clock: Function returning the current time in seconds since
+            the epoch (so we can compare it with file times)
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+
+        self._lock = Lock()
+        # The size of the directory when we last looked, plus what we've
+        # written since, so we don't have to look every time we write
+        self._size = 0
+        self._last_scan = None
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Get the path of the file stored under `key` or `None`.
+
+        The file might be removed by another process at any time, so callers
+        should be prepared for `FileNotFoundError` when opening it.
+        """
+        path = self._path(key)
+        now = self._clock()
+
+        try:
+            stat = path.stat()
+            if now - stat.st_mtime > self.ttl:
+                path.unlink()
+            else:
+                os.utime(path, (now, stat.st_mtime))
+                self._count("hits")
+                return path
+        except OSError:
+            pass
+
+        self._count("misses")
+        return None
+
+    @property
+    def enabled(self):
+        """Whether we store anything at all."""
+        return self.max_bytes > 0
+
+    def lock(self, key):
+        """Take the lock for writing `key`.
+
+        The lock works across threads and processes on this machine, so only
+        one of them fetches a given file while the others `follow()` it.
+
+        :return: An open file which holds the lock until it's closed, or
+            `None` if somebody else has the lock (or we can't lock at all)
+        """
+        try:
+            handle = self._try_lock(key)
+        except OSError:
+            LOG.warning("Could not lock a file in the disk cache", exc_info=True)
+            return None
+
+        if handle:
+            self._abandon_partial_file(key)
+
+        return handle
+
+    def fill(self, key, chunks, lock):
+        """Store `chunks` under `key` in the background, yielding them as we go.
+
+        Unlike `tee()` we read `chunks` as quickly as they come, however
+        slowly the caller reads what we yield, and others can `follow()` the
+        file while we're writing it.
+
+        :param key: The key to store the file under
+        :param chunks: Iterable of bytes to store
+        :param lock: A lock from `lock()` to release once we're done
+        :raise IncompleteFileError: While iterating, if reading `chunks` fails
+        """
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self._partial_path(key)
+            writer = path.open("xb")
+            reader = path.open("rb")
+        except OSError:
+            LOG.warning("Could not create a file in the disk cache", exc_info=True)
+            return self.tee(key, chunks, lock)
+
+        Thread(
+            target=self._fill,
+            args=(key, chunks, writer, lock),
+            name="disk_cache_fill",
+            daemon=True,
+        ).start()
+
+        return self._follow(key, reader)
+
+    def follow(self, key, timeout):
+        """Follow the file for `key` while somebody else `fill()`s it.
+
+        :param timeout: How long (in seconds) to wait for them to start
+        :return: An iterator of the file's bytes (which can raise
+            `IncompleteFileError`) or `None` if nobody is filling it
+        """
+        deadline = monotonic() + timeout
+
+        while True:
+            try:
+                reader = self._partial_path(key).open("rb")
+            except FileNotFoundError:
+                pass
+            except OSError:
+                return None
+            else:
+                if self._is_locked(key):
+                    return self._follow(key, reader)
+
+                # Left behind by a process which died part way through
+                reader.close()
+                return None
+
+            if not self._is_locked(key) or monotonic() >= deadline:
+                return None
+
+            sleep(self.POLL_INTERVAL)
+
+    def tee(self, key, chunks, lock=None):
+        """Yield `chunks` while also storing them under `key`.
+
+        The file is only stored if all of the chunks are read, there are some
+        bytes in them and they fit in the cache.
+
+        :param key: The key to store the file under
+        :param chunks: Iterable of bytes to pass through and store
+        :param lock: A lock from `lock()` to release once we're done
+        """
+        handle = self._create_temp_file()
+        size = 0
+        completed = False
+
+        try:
+            for chunk in chunks:
+                if handle is not None:
+                    size += len(chunk)
+                    if size > self.max_bytes or not self._write(handle, chunk):
+                        self._discard(handle)
+                        handle = None
+
+                yield chunk
+
+            completed = True
+        finally:
+            if handle is not None:
+                if completed and size > 0:
+                    self._commit(handle, key, size)
+                else:
+                    self._discard(handle)
+
+            if lock is not None:
+                lock.close()
+
+    @property
+    def stats(self):
+        """Return a dict of counters describing how the cache is performing."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _path(self, key):
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        return self.directory / digest
+
+    def _partial_path(self, key):
+        return self.directory / f"{self.PARTIAL_PREFIX}{self._path(key).name}"
+
+    def _is_locked(self, key):
+        try:
+            handle = self._try_lock(key)
+        except OSError:
+            return False
+
+        if handle:
+            handle.close()
+            return False
+
+        return True
+
+    def _abandon_partial_file(self, key):
+        """Remove any partial file left behind by a process which died.
+
+        We empty it first, so anyone following it knows it's incomplete.
+        """
+        path = self._partial_path(key)
+        with suppress(OSError):
+            os.truncate(path, 0)
+            path.unlink()
+
+    def _fill(self, key, chunks, writer, lock):
+        size = 0
+        completed = False
+
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+                # Make it visible to anyone following the file
+                writer.flush()
+                size += len(chunk)
+
+            completed = True
+        except Exception:  # noqa: BLE001
+            LOG.warning("Could not fill a file in the disk cache", exc_info=True)
+        finally:
+            if close := getattr(chunks, "close", None):
+                close()
+
+            if completed and 0 < size <= self.max_bytes:
+                self._commit(writer, key, size)
+            else:
+                with suppress(OSError):
+                    if not completed:
+                        # Tell anyone following the file that it's incomplete
+                        writer.truncate(0)
+                    writer.close()
+                    Path(writer.name).unlink()
+
+            lock.close()
+
+    def _follow(self, key, reader):
+        with reader:
+            while True:
+                if chunk := reader.read(self.FOLLOW_CHUNK_SIZE):
+                    yield chunk
+                elif self._is_locked(key):
+                    sleep(self.POLL_INTERVAL)
+                else:
+                    break
+
+            # The file is finished with, so there's nothing more to wait for
+            while chunk := reader.read(self.FOLLOW_CHUNK_SIZE):
+                yield chunk
+
+            if reader.tell() > os.fstat(reader.fileno()).st_size:
+                raise IncompleteFileError
+
+    def _try_lock(self, key):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{self.LOCK_PREFIX}{self._path(key).name}"
+
+        while True:
+            handle = path.open("ab")
+
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                # If `_evict()` removed the file before we locked it, holding
+                # the lock wouldn't stop anybody locking a new file
+                if path.stat().st_ino == os.fstat(handle.fileno()).st_ino:
+                    return handle
+            except BlockingIOError:
+                handle.close()
+                return None
+            except FileNotFoundError:
+                pass
+            except OSError:
+                handle.close()
+                raise
+
+            handle.close()
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def _create_temp_file(self):
+        if self.max_bytes <= 0:
+            return None
+
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            return NamedTemporaryFile(
+                dir=self.directory, prefix=self.TEMP_PREFIX, delete=False
+            )
+        except OSError:
+            LOG.warning("Could not create a file in the disk cache", exc_info=True)
+            return None
+
+    @staticmethod
+    def _write(handle, chunk):
+        try:
+            handle.write(chunk)
+        except OSError:
+            LOG.warning("Could not write to the disk cache", exc_info=True)
+            return False
+
+        return True
+
+    @staticmethod
+    def _discard(handle):
+        with suppress(OSError):
+            handle.close()
+        with suppress(OSError):
+            Path(handle.name).unlink()
+
+    def _commit(self, handle, key, size):
+        try:
+            handle.close()
+            now = self._clock()
+            os.utime(handle.name, (now, now))
+            Path(handle.name).replace(self._path(key))
+        except OSError:
+            LOG.warning("Could not store a file in the disk cache", exc_info=True)
+            self._discard(handle)
+            return
+
+        self._count("writes")
+        self._evict(size)
+
+    def _evict(self, added):
+        """Remove the least recently used files until we fit in `max_bytes`.
+
+        Looking through the whole directory is slow when it's big, so we only
+        do it when what we've added might have filled the cache, or when we
+        haven't looked for `SCAN_INTERVAL` seconds.
+
+        :param added: How many bytes we've just added to the cache
+        """
+        now = self._clock()
+
+        with self._lock:
+            self._size += added
+            if (
+                self._size <= self.max_bytes
+                and self._last_scan is not None
+                and now - self._last_scan < self.SCAN_INTERVAL
+            ):
+                return
+
+            self._last_scan = now
+
+        total_size = 0
+        entries = []
+
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+                if entry.name.startswith(
+                    (self.TEMP_PREFIX, self.LOCK_PREFIX, self.PARTIAL_PREFIX)
+                ):
+                    # Locks and files left behind by a process which died part
+                    # way through writing
+                    if now - stat.st_mtime > self.ttl:
+                        if entry.name.startswith(self.LOCK_PREFIX):
+                            self._remove_lock_file(entry.path)
+                        else:
+                            os.unlink(entry.path)  # noqa: PTH108
+                    continue
+            except OSError:
+                continue
+
+            total_size += stat.st_size
+            entries.append((stat.st_atime, entry.path, stat.st_size))
+
+        for _, path, size in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+
+            with suppress(OSError):
+                os.unlink(path)  # noqa: PTH108
+                self._count("evictions")
+
+            total_size -= size
+
+        with self._lock:
+            self._size = total_size
+
+    @staticmethod
+    def _remove_lock_file(path):
+        """Remove a lock file, unless somebody is holding the lock.
+
+        Taking a lock doesn't change the file's modification time, so an old
+        lock file can still be in use.
+        """
+        with suppress(OSError), Path(path).open("ab") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            os.unlink(path)  # noqa: PTH108
+
+
+class SingleFlight:
+    """Coalesce concurrent calls which would fetch the same thing.
+
+    While a call for a key is running, other threads making a call with the
+    same key wait for it and get the same result (or exception), instead of
+    all going to the upstream service at once.
+    """
+
+    def __init__(self):
+        self._in_flight: dict[object, Future] = {}
+        self._lock = Lock()
+
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, func, *args, **kwargs):
+        """Call `func(*args, **kwargs)` unless a call for `key` is running.
+
+        :param key: Hashable key identifying what `func` fetches
+        :return: The result of `func`, from this call or a concurrent one
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            is_leader = future is None
+
+            if is_leader:
+                future = self._in_flight[key] = Future()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as err:
+            future.set_exception(err)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    @property
+    def stats(self):
+        """Return a dict of counters describing how much is being shared."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "shared": self.shared,
+                "in_flight": len(self._in_flight),
+            }
+
+
+@dataclass
+class _Batch:
+    futures: dict[object, Future] = field(default_factory=dict)
+    full: Event = field(default_factory=Event)
+
+
+class Batcher:
+    """Combine concurrent calls for different keys into one call.
+
+    The first call waits up to `max_wait` seconds (or until the batch is
+    full) for other threads to add their keys, then makes a single call for
+    all of them. Each caller gets the result for its own key. This suits
+    upstream APIs which can look up many things for the price of one.
+    """
+
+    def __init__(self, max_size, max_wait):
+        """Initialise the batcher.
+
+        :param max_size: The most keys to put into one call
+        :param max_wait: How long (in seconds) to wait for a batch to fill
+        """
+        self._max_size = max_size
+        self._max_wait = max_wait
+
+        self._batch: _Batch | None = None
+        self._lock = Lock()
+
+        self.calls = 0
+        self.keys = 0
+
+    def do(self, key, func):
+        """Get the result for `key`, batched with any concurrent calls.
+
+        :param key: Hashable key to get the result for
+        :param func: Function taking a list of keys and returning a dict of
+            results. Keys which aren't in the dict get `None`.
+        :return: The result for `key`
+        """
+        with self._lock:
+            batch = self._batch
+            is_leader = batch is None
+            if is_leader:
+                batch = self._batch = _Batch()
+
+            if (future := batch.futures.get(key)) is None:
+                future = batch.futures[key] = Future()
+                self.keys += 1
+
+            if len(batch.futures) >= self._max_size:
+                # Later calls will start a new batch
+                self._batch = None
+                batch.full.set()
+
+        if not is_leader:
+            return future.result()
+
+        batch.full.wait(self._max_wait)
+        with self._lock:
+            if self._batch is batch:
+                self._batch = None
+            self.calls += 1
+
+        try:
+            results = func(list(batch.futures))
+        except BaseException as err:
+            for batch_future in batch.futures.values():
+                batch_future.set_exception(err)
+            raise
+
+        for batch_key, batch_future in batch.futures.items():
+            batch_future.set_result(results.get(batch_key))
+
+        return future.result()
+
+    @property
+    def stats(self):
+        """Return a dict of counters describing how well calls are batched."""
+        with self._lock:
+            return {"calls": self.calls, "keys": self.keys}
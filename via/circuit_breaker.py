@@ -0,0 +1,146 @@
+"""A circuit breaker for calls to upstream services."""
+
+from collections import deque
+from threading import Lock
+from time import monotonic
+
+
+class CircuitOpenError(Exception):
+    """The call wasn't made because the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Stop calling a service which keeps failing, and try it again later.
+
+    The breaker starts "closed" and calls go through as normal. Once enough
+    of the recent calls have failed it "opens", and calls fail straight away
+    with `CircuitOpenError` instead of waiting for the service to time out.
+    After `reset_timeout` seconds it goes "half-open" and lets a single call
+    through as a probe: if that works the breaker closes again, otherwise it
+    re-opens.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(  # noqa: PLR0913
+        self,
+        failure_rate=0.5,
+        window=20,
+        min_calls=5,
+        reset_timeout=30,
+        is_failure=lambda _exc: True,
+        clock=monotonic,
+    ):
+        """Initialise the breaker.
+
+        :param failure_rate: Proportion of recent calls which need to have
+            failed to open the breaker
+        :param window: How many recent calls to consider
+        :param min_calls: How many calls we need to have seen before we'll
+            open the breaker
+        :param reset_timeout: How long (in seconds) to stay open before
+            letting a probe through
+        :param is_failure: Function which is passed any exception raised by
+            a call and returns whether it means the service is failing
+        :param clock: Function returning the current time in seconds
+        """
+        self._failure_rate = failure_rate
+        self._min_calls = min_calls
+        self._reset_timeout = reset_timeout
+        self._is_failure = is_failure
+        self._clock = clock
+
+        self._results: deque = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = None
+        self._probing = False
+        self._lock = Lock()
+
+        self.times_opened = 0
+        self.rejected = 0
+
+    def call(self, func, *args, **kwargs):
+        """Call `func(*args, **kwargs)` if the breaker allows it.
+
+        :raise CircuitOpenError: If the breaker is open
+        :raise Exception: Anything `func` raises
+        """
+        is_probe = self._before_call()
+
+        try:
+            result = func(*args, **kwargs)
+        except Exception as err:
+            self._after_call(is_probe, success=not self._is_failure(err))
+            raise
+
+        self._after_call(is_probe, success=True)
+        return result
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    @property
+    def stats(self):
+        """Return a dict describing the state of the breaker."""
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "recent_calls": len(self._results),
+                "recent_failures": self._results.count(False),
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+    def _current_state(self):
+        if (
+            self._state == self.OPEN
+            and self._clock() - self._opened_at >= self._reset_timeout
+        ):
+            return self.HALF_OPEN
+
+        return self._state
+
+    def _before_call(self):
+        """Check we can make a call, and return whether it's a probe."""
+        with self._lock:
+            state = self._current_state()
+
+            if state == self.CLOSED:
+                return False
+
+            if state == self.HALF_OPEN and not self._probing:
+                self._state = self.HALF_OPEN
+                self._probing = True
+                return True
+
+            self.rejected += 1
+
+        raise CircuitOpenError
+
+    def _after_call(self, is_probe, success):
+        with self._lock:
+            if is_probe:
+                self._probing = False
+
+                if success:
+                    self._state = self.CLOSED
+                    self._results.clear()
+                else:
+                    self._open()
+
+            elif self._state == self.CLOSED:
+                self._results.append(success)
+
+                calls = len(self._results)
+                failures = self._results.count(False)
+                if calls >= self._min_calls and failures / calls >= self._failure_rate:
+                    self._open()
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = self._clock()
+        self.times_opened += 1
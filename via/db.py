@@ -16,13 +16,26 @@ class Base(MappedAsDataclass, DeclarativeBase):
     )
 
 
-def create_engine(database_url):  # pragma: no cover
-    """Return a SQLAlchemy engine."""
+def create_engine(database_url, pool_size=None):  # pragma: no cover
+    """Return a SQLAlchemy engine.
+
+    :param pool_size: How many connections to keep open, if not SQLAlchemy's
+        default
+    """
+    if pool_size:
+        return sqlalchemy.create_engine(database_url, pool_size=pool_size)
+
     return sqlalchemy.create_engine(database_url)
 
 
 def includeme(config):  # pragma: no cover
-    engine = create_engine(config.registry.settings["database_url"])
+    # This is separate from the number of threads, because every process on
+    # every instance has a pool, and together they have to fit in Postgres'
+    # `max_connections`
+    engine = create_engine(
+        config.registry.settings["database_url"],
+        pool_size=int(config.registry.settings.get("db_pool_size") or 0),
+    )
 
     def db_session(request):
         """Return the SQLAlchemy session for the given request."""
@@ -0,0 +1,77 @@
+"""Decrypt the secret values LMS integrations send us."""
+
+from collections import OrderedDict
+from threading import Lock
+
+from h_vialib.secure import Encryption
+
+
+class DecryptionService:
+    """Decrypt dicts encrypted with our secret, remembering recent ones.
+
+    Integrations like D2L send the same encrypted headers or query params
+    for every student following a link, so we keep a small LRU of what they
+    decrypt to. Only short values are remembered, and we empty the dicts we
+    evict so the secrets don't hang around for longer than we need them.
+    """
+
+    #: The most encrypted values we'll remember
+    MAX_SIZE = 1000
+    #: The longest encrypted value we'll remember, in characters
+    MAX_LENGTH = 4096
+
+    def __init__(self, secret: bytes, max_size=MAX_SIZE, max_length=MAX_LENGTH):
+        """Initialise the service.
+
+        :param secret: The secret the values were encrypted with
+        :param max_size: The most encrypted values to remember
+        :param max_length: The longest encrypted value to remember
+        """
+        # Creating this is relatively expensive, so we only do it once
+        self._encryption = Encryption(secret)
+        self._max_size = max_size
+        self._max_length = max_length
+
+        self._decrypted: OrderedDict[str, dict] = OrderedDict()
+        self._lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def decrypt_dict(self, encrypted: str) -> dict:
+        """Return `encrypted` decrypted and deserialized to a dict.
+
+        :raise joserfc.errors.JoseError: If `encrypted` can't be decrypted
+        """
+        with self._lock:
+            if (decrypted := self._decrypted.get(encrypted)) is not None:
+                self._decrypted.move_to_end(encrypted)
+                self.hits += 1
+                # A copy, so callers can't change what we've remembered
+                return dict(decrypted)
+
+            self.misses += 1
+
+        decrypted = self._encryption.decrypt_dict(encrypted)
+
+        if len(encrypted) <= self._max_length:
+            with self._lock:
+                self._decrypted[encrypted] = dict(decrypted)
+                self._decrypted.move_to_end(encrypted)
+
+                while len(self._decrypted) > self._max_size:
+                    _, evicted = self._decrypted.popitem(last=False)
+                    evicted.clear()
+
+        return decrypted
+
+    @property
+    def stats(self):
+        """Return a dict of statistics about the cache."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._decrypted),
+                "maxsize": self._max_size,
+            }
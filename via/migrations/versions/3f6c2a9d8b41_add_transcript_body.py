@@ -0,0 +1,78 @@
+"""Add transcript.body, each transcript encoded as the API sends it.
+
+This only adds the new column. `transcript.transcript` stays, and is still
+written, so code from before this revision keeps working while we deploy. A
+later migration can drop it once nothing reads it.
+
+Revision ID: 3f6c2a9d8b41
+Revises: d4e3e1bf95eb
+"""
+
+import gzip
+import json
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "3f6c2a9d8b41"
+down_revision = "d4e3e1bf95eb"
+
+#: How many transcripts to encode at once
+BATCH_SIZE = 100
+
+
+def upgrade() -> None:
+    op.add_column("transcript", sa.Column("body", sa.LargeBinary()))
+    _encode_transcripts()
+
+
+def downgrade() -> None:
+    op.drop_column("transcript", "body")
+
+
+def _encode_transcripts():
+    """Fill in `body` for every existing transcript."""
+    transcript = sa.table(
+        "transcript",
+        sa.column("id"),
+        sa.column("video_id"),
+        sa.column("transcript", postgresql.JSONB),
+        sa.column("body", sa.LargeBinary),
+    )
+    conn = op.get_bind()
+
+    last_id = 0
+    while rows := conn.execute(
+        sa.select(transcript.c.id, transcript.c.video_id, transcript.c.transcript)
+        .where(transcript.c.id > last_id)
+        .order_by(transcript.c.id)
+        .limit(BATCH_SIZE)
+    ).all():
+        for id_, video_id, segments in rows:
+            conn.execute(
+                sa.update(transcript)
+                .where(transcript.c.id == id_)
+                .values(body=_encode_body(video_id, segments))
+            )
+
+        last_id = rows[-1].id
+
+
+def _encode_body(video_id, segments):
+    """Return a transcript's body as it was encoded in this revision.
+
+    This is a copy, so later changes to the model don't change what this
+    migration does.
+    """
+    document = {
+        "data": {
+            "type": "transcripts",
+            "id": video_id,
+            "attributes": {"segments": segments},
+        }
+    }
+
+    return gzip.compress(
+        json.dumps(document, separators=(",", ":")).encode("utf-8"), mtime=0
+    )
@@ -0,0 +1,41 @@
+"""Add transcript.segment_count and an index for finding transcripts.
+
+`segment_count` is left nullable as code from before this revision doesn't
+set it. It can be made NOT NULL once that code is gone.
+
+Revision ID: 7b2e91c4d5a0
+Revises: 3f6c2a9d8b41
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "7b2e91c4d5a0"
+down_revision = "3f6c2a9d8b41"
+
+
+def upgrade() -> None:
+    op.add_column("transcript", sa.Column("segment_count", sa.Integer()))
+    transcript = sa.table(
+        "transcript",
+        sa.column("transcript", postgresql.JSONB),
+        sa.column("segment_count"),
+    )
+    op.execute(
+        sa.update(transcript).values(
+            segment_count=sa.func.jsonb_array_length(transcript.c.transcript)
+        )
+    )
+    op.create_index(
+        op.f("ix_transcript_video_id_transcript_created"),
+        "transcript",
+        ["video_id", "created"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        op.f("ix_transcript_video_id_transcript_created"), table_name="transcript"
+    )
+    op.drop_column("transcript", "segment_count")
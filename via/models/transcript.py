@@ -1,6 +1,9 @@
-from sqlalchemy import UniqueConstraint
+import gzip
+import json
+
+from sqlalchemy import Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import Mapped, mapped_column, validates
 
 from via.db import Base
 from via.models._mixins import AutoincrementingIntegerIDMixin, CreatedUpdatedMixin
@@ -8,8 +11,46 @@ from via.models._mixins import AutoincrementingIntegerIDMixin, CreatedUpdatedMix
 
 class Transcript(AutoincrementingIntegerIDMixin, CreatedUpdatedMixin, Base):
     __tablename__ = "transcript"
-    __table_args__ = (UniqueConstraint("video_id", "transcript_id"),)
+    __table_args__ = (
+        UniqueConstraint("video_id", "transcript_id"),
+        Index(None, "video_id", "created"),
+    )
 
     video_id: Mapped[str]
     transcript_id: Mapped[str]
-    transcript: Mapped[list] = mapped_column(JSONB, repr=False)
+    transcript: Mapped[list] = mapped_column(JSONB, repr=False, deferred=True)
+
+    body: Mapped[bytes | None] = mapped_column(init=False, repr=False, deferred=True)
+    """`transcript` as the API sends it: a gzipped JSON:API document.
+
+    We encode this once when the transcript is stored so we can send it as it
+    is. Rows written by code from before this column have no body yet.
+    """
+
+    segment_count: Mapped[int | None] = mapped_column(init=False)
+    """The number of segments in `transcript`.
+
+    This lets us find a transcript worth sending without having to load the
+    transcripts themselves. Like `body` it's missing from older rows.
+    """
+
+    @validates("transcript")
+    def _encode(self, _key, transcript):
+        self.segment_count = len(transcript)
+        self.body = encode_body(self.video_id, transcript)
+        return transcript
+
+
+def encode_body(video_id: str, transcript: list[dict]) -> bytes:
+    """Return the gzipped JSON:API document for a video's transcript."""
+    document = {
+        "data": {
+            "type": "transcripts",
+            "id": video_id,
+            "attributes": {"segments": transcript},
+        }
+    }
+
+    return gzip.compress(
+        json.dumps(document, separators=(",", ":")).encode("utf-8"), mtime=0
+    )
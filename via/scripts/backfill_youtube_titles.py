@@ -0,0 +1,88 @@
+"""
+Fill in the titles of YouTube videos we don't know about yet.
+
+This is useful before a course starts, so the first students to open each
+video don't have to wait for us to look up its title.
+
+Usage:
+
+    python3 -m via.scripts.backfill_youtube_titles video_ids.txt
+
+The file should have one YouTube video ID or URL per line. Videos which are
+already in the DB aren't looked up again, and the rest are looked up with as
+few calls to the YouTube Data API as possible.
+"""
+
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from os import environ
+
+from sqlalchemy.orm import Session
+
+from via.cache import Batcher, SingleFlight, TTLCache
+from via.db import create_engine
+from via.services import HTTPService, YouTubeService, YouTubeTranscriptService
+
+log = logging.getLogger(__name__)
+
+
+def backfill_titles(youtube_service: YouTubeService, lines):
+    """Make sure we know the titles of the videos in `lines`.
+
+    :param lines: YouTube video IDs or URLs
+    :return: A 2-tuple of the titles we know, keyed by video ID, and a list
+        of the IDs of any videos which don't exist
+    """
+    video_ids = [
+        youtube_service.get_video_id(line) or line
+        for line in (line.strip() for line in lines)
+        if line
+    ]
+
+    titles = youtube_service.get_video_titles(video_ids)
+
+    return titles, [video_id for video_id in video_ids if video_id not in titles]
+
+
+def main():  # pragma: no cover
+    parser = argparse.ArgumentParser(
+        description="Fill in the titles of YouTube videos we don't know about yet."
+    )
+    parser.add_argument(
+        "file",
+        type=argparse.FileType("r"),
+        help="file with one YouTube video ID or URL per line",
+    )
+    args = parser.parse_args()
+
+    http_service = HTTPService()
+    with Session(create_engine(environ["DATABASE_URL"])) as session, session.begin():
+        youtube_service = YouTubeService(
+            db_session=session,
+            enabled=True,
+            api_key=environ["YOUTUBE_API_KEY"],
+            http_service=http_service,
+            youtube_transcript_service=YouTubeTranscriptService(
+                # We don't fetch transcripts here
+                http_service=http_service,
+                api_key="",
+                executor=ThreadPoolExecutor(max_workers=1),
+                background_http_service=http_service,
+                no_english_cache=TTLCache(maxsize=1),
+            ),
+            single_flight=SingleFlight(),
+            title_cache=TTLCache(maxsize=YouTubeService.MAX_IDS_PER_CALL),
+            title_batcher=Batcher(max_size=YouTubeService.MAX_IDS_PER_CALL, max_wait=0),
+        )
+
+        titles, missing_ids = backfill_titles(youtube_service, args.file)
+
+    log.info("Found titles for %d videos", len(titles))
+    for video_id in missing_ids:
+        log.warning("No such video: %s", video_id)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,25 +1,44 @@
-from datetime import UTC, datetime, timedelta
+from datetime import timedelta
+from time import time
 
 import jwt
+from h_vialib.secure import quantized_expiry
 from pyramid.security import Allowed, Denied
 
+from via.cache import TTLCache
+
 
 class ViaSecurityPolicy:
+    #: How long the JWTs we create are valid for (at most)
+    JWT_MAX_AGE = timedelta(hours=48)
+
+    # JWTs for the current expiry window. Everyone in the same window gets
+    # the same JWT, so we only need to sign it once.
+    _encoded_jwts = TTLCache(maxsize=10)
+
+    def __init__(self):
+        # JWTs we know to be valid, so we don't have to decode them again on
+        # every API call
+        self._verified_jwts = TTLCache(maxsize=10000)
+
     def permits(self, request, _context, permission):
         try:
             encoded_jwt = request.headers["Authorization"][len("Bearer ") :]
         except KeyError:
             return Denied("No Authorization header")
 
-        try:
-            jwt.decode(
-                encoded_jwt,
-                self._get_jwt_secret(request),
-                algorithms=["HS256"],
-                options={"require": ["exp"]},
-            )
-        except jwt.InvalidTokenError:
-            return Denied("Invalid JWT")
+        if not self._verified_jwts.get(encoded_jwt):
+            try:
+                claims = jwt.decode(
+                    encoded_jwt,
+                    self._get_jwt_secret(request),
+                    algorithms=["HS256"],
+                    options={"require": ["exp"]},
+                )
+            except jwt.InvalidTokenError:
+                return Denied("Invalid JWT")
+
+            self._verified_jwts.set(encoded_jwt, value=True, ttl=claims["exp"] - time())
 
         if permission == "api":
             return Allowed("Valid JWT provided")
@@ -28,11 +47,20 @@ class ViaSecurityPolicy:
 
     @classmethod
     def encode_jwt(cls, request):
-        return jwt.encode(
-            {"exp": datetime.now(tz=UTC) + timedelta(hours=48)},
-            cls._get_jwt_secret(request),
-            algorithm="HS256",
-        )
+        secret = cls._get_jwt_secret(request)
+        exp = int(quantized_expiry(max_age=cls.JWT_MAX_AGE).timestamp())
+
+        if not (encoded_jwt := cls._encoded_jwts.get((secret, exp))):
+            encoded_jwt = jwt.encode({"exp": exp}, secret, algorithm="HS256")
+            # `quantized_expiry()` moves on to a new window once this one's
+            # expiry is less than half the max age away
+            cls._encoded_jwts.set(
+                (secret, exp),
+                encoded_jwt,
+                ttl=exp - time() - cls.JWT_MAX_AGE.total_seconds() / 2,
+            )
+
+        return encoded_jwt
 
     @staticmethod
     def _get_jwt_secret(request):
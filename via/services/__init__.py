@@ -1,21 +1,36 @@
 """Services for Via."""
 
 import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from json import JSONDecodeError
-from pathlib import Path  # noqa: TC003
+from pathlib import Path
+from tempfile import gettempdir
 
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from via.cache import Batcher, DiskCache, SingleFlight, TTLCache
+from via.db import create_engine
+from via.decryption import DecryptionService
 from via.exceptions import ConfigurationError
-from via.services.checkmate import CheckmateService
+from via.services.checkmate import (
+    CheckmateService,
+    CheckmateVerdictCache,
+    PooledCheckmateClient,
+)
 from via.services.google_drive import GoogleDriveAPI
-from via.services.http import HTTPService
+from via.services.http import HTTPService, PooledHTTPAdapter
 from via.services.pdf_url import PDFURLBuilder
 from via.services.secure_link import SecureLinkService, has_secure_url_token
 from via.services.transcript import TranscriptService
 from via.services.url_details import URLDetailsService
 from via.services.via_client import ViaClientService
-from via.services.youtube import YouTubeService
+from via.services.youtube import YouTubeService, warm_title_cache
 from via.services.youtube_transcript import YouTubeTranscriptService
 
+LOG = logging.getLogger(__name__)
+
 
 def includeme(config):  # pragma: no cover
     """Add services to pyramid config."""
@@ -52,6 +67,72 @@ def includeme(config):  # pragma: no cover
         "via.services.url_details.factory", iface=URLDetailsService
     )
 
+    # Process wide caches and connection pools, shared between requests
+    http_adapter = create_http_adapter(config.registry.settings)
+    config.register_service(http_adapter, iface=PooledHTTPAdapter)
+    config.register_service(
+        PooledCheckmateClient(
+            host=config.registry.settings["checkmate_url"],
+            api_key=config.registry.settings["checkmate_api_key"],
+            session=http_adapter.create_session(),
+        ),
+        iface=PooledCheckmateClient,
+    )
+    config.register_service(
+        TTLCache(maxsize=10000, namespace="url_details"),
+        iface=TTLCache,
+        name="url_details",
+    )
+    config.register_service(
+        TTLCache(maxsize=10000, namespace="url_details_probes"),
+        iface=TTLCache,
+        name="url_details_probes",
+    )
+    config.register_service(
+        TTLCache(maxsize=10000), iface=TTLCache, name="nginx_signed_urls"
+    )
+    config.register_service(
+        TTLCache(maxsize=10000), iface=TTLCache, name="verified_secure_urls"
+    )
+    config.register_service(
+        DecryptionService(config.registry.settings["via_secret"].encode("utf-8")),
+        iface=DecryptionService,
+    )
+    config.register_service(
+        create_youtube_title_cache(config.registry.settings),
+        iface=TTLCache,
+        name="youtube_titles",
+    )
+    config.register_service(
+        # Compressed transcripts are still around a hundred KB each
+        TTLCache(maxsize=500),
+        iface=TTLCache,
+        name="youtube_transcripts",
+    )
+    config.register_service(
+        TTLCache(maxsize=10000), iface=TTLCache, name="youtube_no_english"
+    )
+    config.register_service(
+        ThreadPoolExecutor(max_workers=10, thread_name_prefix="supadata"),
+        iface=ThreadPoolExecutor,
+        name="supadata",
+    )
+    config.register_service(
+        Batcher(
+            max_size=YouTubeService.MAX_IDS_PER_CALL,
+            # Long enough to catch a class opening a page at once, without
+            # being noticeable
+            max_wait=0.05,
+        ),
+        iface=Batcher,
+        name="youtube_titles",
+    )
+    config.register_service(SingleFlight(), iface=SingleFlight)
+    config.register_service(CheckmateVerdictCache(), iface=CheckmateVerdictCache)
+    config.register_service(
+        create_pdf_cache(config.registry.settings), iface=DiskCache, name="pdf"
+    )
+
 
 def create_google_api(settings):
     """Create from Pyramid settings."""
@@ -59,9 +140,61 @@ def create_google_api(settings):
     return GoogleDriveAPI(
         credentials_list=load_injected_json(settings, "google_drive_credentials.json"),
         resource_keys=load_injected_json(settings, "google_drive_resource_keys.json"),
+        # Each of the web server's threads can be downloading from Google at once
+        pool_maxsize=int(settings.get("web_threads") or 0) or None,
     )
 
 
+def create_http_adapter(settings):
+    """Create the shared pool of upstream connections from Pyramid settings."""
+
+    if threads := int(settings.get("web_threads") or 0):
+        # Each of the web server's threads can be talking to the same host at
+        # once, so keep enough connections for them all
+        return PooledHTTPAdapter(pool_maxsize=threads)
+
+    return PooledHTTPAdapter()
+
+
+def create_pdf_cache(settings):
+    """Create the disk cache for proxied PDFs from Pyramid settings."""
+
+    directory = settings.get("pdf_cache_directory") or (
+        Path(gettempdir()) / "via-pdf-cache"
+    )
+    max_mb = settings.get("pdf_cache_max_mb")
+
+    return DiskCache(
+        directory,
+        # A budget of 0 turns the cache off
+        max_bytes=int(1024 if max_mb is None else max_mb) * 1024 * 1024,
+        # Match the `max-age` we tell browsers and CDNs
+        ttl=43200,
+    )
+
+
+def create_youtube_title_cache(settings):
+    """Create the in-memory cache of YouTube video titles from Pyramid settings.
+
+    If `youtube_title_cache_warm` is set, that many of the most recently
+    updated titles are loaded from the DB straight away.
+    """
+    cache = TTLCache(maxsize=10000, namespace="youtube_titles")
+
+    if warm_count := int(settings.get("youtube_title_cache_warm") or 0):
+        engine = create_engine(settings["database_url"])
+        try:
+            with Session(engine) as session:
+                warm_title_cache(session, cache, limit=warm_count)
+        except SQLAlchemyError:
+            # A cold cache still works, so this shouldn't stop us starting
+            LOG.warning("Could not warm the YouTube title cache", exc_info=True)
+        finally:
+            engine.dispose()
+
+    return cache
+
+
 def load_injected_json(settings, file_name):
     """Load a JSON file from the env specified `DATA_DIRECTORY`.
 
@@ -1,21 +1,222 @@
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from threading import Lock
+from time import monotonic
+
 from checkmatelib import BadURL as CheckmateBadURL
 from checkmatelib import CheckmateClient, CheckmateException
 from checkmatelib.client import BlockResponse
+from checkmatelib.exceptions import CheckmateServiceError, handles_request_errors
 from pyramid.httpexceptions import HTTPTemporaryRedirect
 
+from via.cache import TTLCache
+from via.circuit_breaker import CircuitBreaker, CircuitOpenError
 from via.exceptions import BadURL
 
+LOG = getLogger(__name__)
+
+
+class PooledCheckmateClient(CheckmateClient):
+    """A Checkmate client to share between requests.
+
+    Unlike `CheckmateClient` this reuses connections, and once Checkmate
+    looks to be down it fails straight away rather than making every request
+    wait for the timeout.
+    """
+
+    TIMEOUT = 1
+
+    def __init__(self, host, api_key, session, circuit_breaker=None):
+        """Initialise the client.
+
+        :param host: The host including scheme, for the Checkmate service
+        :param api_key: API key for Checkmate
+        :param session: `requests.Session` to make requests with
+        :param circuit_breaker: `CircuitBreaker` to guard requests with
+        """
+        super().__init__(host=host, api_key=api_key)
+
+        self._session = session
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(
+            # Bad URLs are our problem, not a sign that Checkmate is down
+            is_failure=lambda exc: not isinstance(exc, CheckmateBadURL)
+        )
+
+    def check_url(self, url, allow_all=False, blocked_for=None, ignore_reasons=None):  # noqa: FBT002
+        try:
+            return self.circuit_breaker.call(
+                self._check_url, url, allow_all, blocked_for, ignore_reasons
+            )
+        except CircuitOpenError as err:
+            raise CheckmateServiceError("Checkmate circuit breaker is open") from err  # noqa: EM101, TRY003
+
+    @handles_request_errors
+    def _check_url(self, url, allow_all, blocked_for, ignore_reasons):
+        # This matches `CheckmateClient.check_url()` but uses our session
+        params = {"url": self._clean_url(url)}
+
+        if allow_all:
+            params["allow_all"] = True
+
+        if blocked_for:
+            params["blocked_for"] = blocked_for
+
+        if ignore_reasons:
+            params["ignore_reasons"] = ignore_reasons
+
+        response = self._session.get(
+            self._host + "/api/check",
+            params=params,
+            timeout=self.TIMEOUT,
+            auth=(self._api_key, "") if self._api_key else None,
+        )
+        response.raise_for_status()
+
+        if response.status_code == 204:
+            # No news is good news
+            return None
+
+        try:
+            return BlockResponse(response.json())
+        except ValueError as err:
+            raise CheckmateServiceError("Unprocessable JSON response") from err  # noqa: EM101, TRY003
+
+
+class CheckmateVerdictCache:
+    """A process wide cache of Checkmate verdicts.
+
+    Allowed verdicts are served stale for a while after they expire, while we
+    ask Checkmate again in the background. This means a slow Checkmate never
+    holds up a URL we have recently allowed. Blocked verdicts are kept for
+    less time and never served stale, so unblocking takes effect quickly.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        maxsize=10000,
+        allowed_ttl=300,
+        blocked_ttl=60,
+        stale_ttl=3600,
+        executor=None,
+        clock=monotonic,
+    ):
+        """Initialise the cache.
+
+        :param maxsize: Maximum number of verdicts to keep
+        :param allowed_ttl: How long (in seconds) to trust allowed verdicts
+        :param blocked_ttl: How long (in seconds) to trust blocked verdicts
+        :param stale_ttl: How long (in seconds) after `allowed_ttl` we'll
+            still use an allowed verdict while we refresh it
+        :param executor: `concurrent.futures` executor for refreshing verdicts
+        :param clock: Function returning the current time in seconds
+        """
+        self._allowed_ttl = allowed_ttl
+        self._blocked_ttl = blocked_ttl
+        self._stale_ttl = stale_ttl
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="checkmate"
+        )
+        self._clock = clock
+
+        self._verdicts = TTLCache(maxsize, clock=clock)
+        self._refreshing = set()
+        self._lock = Lock()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_failures = 0
+
+    def get(self, key, check, *args):
+        """Get the verdict for `key`, calling `check(*args)` if we need to.
+
+        :param key: Hashable key for everything which affects the verdict
+        :param check: Function returning `None` when allowed, or a
+            `BlockResponse` when blocked
+        :raise Exception: Anything `check()` raises when we have nothing
+            cached to fall back on
+        """
+        if (entry := self._verdicts.get(key)) is not None:
+            verdict, fresh_until = entry
+
+            if self._clock() < fresh_until:
+                self._count("hits")
+            else:
+                self._count("stale_hits")
+                self._refresh_in_background(key, check, *args)
+
+            return verdict
+
+        self._count("misses")
+        verdict = check(*args)
+        self._store(key, verdict)
+
+        return verdict
+
+    @property
+    def stats(self):
+        """Return a dict of counters describing how the cache is performing."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshing": len(self._refreshing),
+                "refresh_failures": self.refresh_failures,
+                "size": self._verdicts.stats["size"],
+            }
+
+    def _store(self, key, verdict):
+        if verdict:
+            fresh_ttl, stale_ttl = self._blocked_ttl, 0
+        else:
+            fresh_ttl, stale_ttl = self._allowed_ttl, self._stale_ttl
+
+        self._verdicts.set(
+            key, (verdict, self._clock() + fresh_ttl), ttl=fresh_ttl + stale_ttl
+        )
+
+    def _refresh_in_background(self, key, check, *args):
+        with self._lock:
+            if key in self._refreshing:
+                return
+
+            self._refreshing.add(key)
+
+        self._executor.submit(self._refresh, key, check, *args)
+
+    def _refresh(self, key, check, *args):
+        try:
+            self._store(key, check(*args))
+        except Exception:  # noqa: BLE001
+            # We'll keep using the stale verdict, and try again next time
+            LOG.warning("Could not refresh a Checkmate verdict", exc_info=True)
+            self._count("refresh_failures")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
 
 class CheckmateService:
-    def __init__(self, checkmate_client, allow_all, blocked_for, ignore_reasons):
+    def __init__(
+        self, checkmate_client, allow_all, blocked_for, ignore_reasons, verdict_cache
+    ):
         self._checkmate_client = checkmate_client
         self._allow_all = allow_all
         self._blocked_for = blocked_for
         self._ignore_reasons = ignore_reasons
+        self._verdict_cache = verdict_cache
 
     def check_url(self, url) -> BlockResponse | None:
         """Check whether the given URL is blocked by Checkmate.
 
+        This always asks Checkmate, see `raise_if_blocked()` for a cached
+        version.
+
         Return a BlockResponse object if the URL is blocked,
         or None if the URL is not blocked.
         """
@@ -30,14 +231,18 @@ class CheckmateService:
         """Raise a redirect to Checkmate if the URL is blocked.
 
         This will sensibly apply all ignore reasons and other configuration for
-        Checkmate.
+        Checkmate. Verdicts are cached between requests.
 
         :param url: The URL to check
         :raises HTTPTemporaryRedirect: If the URL is blocked
         :raises BadURL: For malformed or private URLs
         """
         try:
-            blocked = self.check_url(url)
+            blocked = self._verdict_cache.get(
+                (url, self._allow_all, self._blocked_for, self._ignore_reasons),
+                self.check_url,
+                url,
+            )
         except CheckmateBadURL as exc:
             raise BadURL(exc, url=url) from exc
         except CheckmateException:
@@ -49,11 +254,9 @@ class CheckmateService:
 
 def factory(_context, request):
     return CheckmateService(
-        checkmate_client=CheckmateClient(
-            host=request.registry.settings["checkmate_url"],
-            api_key=request.registry.settings["checkmate_api_key"],
-        ),
+        checkmate_client=request.find_service(PooledCheckmateClient),
         allow_all=request.registry.settings["checkmate_allow_all"],
         blocked_for=request.params.get("via.blocked_for"),
         ignore_reasons=request.registry.settings["checkmate_ignore_reasons"],
+        verdict_cache=request.find_service(CheckmateVerdictCache),
     )
@@ -1,18 +1,24 @@
 import re
 from collections.abc import ByteString, Iterator  # noqa: PYI057
+from dataclasses import dataclass
+from datetime import UTC, datetime
 from json import JSONDecodeError
 from logging import getLogger
+from threading import Lock, Timer
+from time import monotonic
 from urllib.parse import parse_qs, urlparse
 
-from google.auth.transport.requests import AuthorizedSession
+from google.auth.transport.requests import AuthorizedSession, Request
 from google.oauth2.service_account import Credentials
 from marshmallow import INCLUDE, Schema, ValidationError, fields, validate
 from pyramid.httpexceptions import HTTPNotFound
 from requests import HTTPError
+from requests.adapters import HTTPAdapter
 
+from via.cache import TTLCache
 from via.exceptions import ConfigurationError, GoogleDriveServiceError
 from via.requests_tools import add_request_headers
-from via.services.http import HTTPService
+from via.services.http import HTTPService, StreamedResponse
 
 LOG = getLogger(__name__)
 
@@ -31,14 +37,18 @@ class GoogleDriveErrorSchema(Schema):
     error = fields.Nested(Errors(unknown=INCLUDE), required=True)
 
 
+_RATE_LIMITED = {
+    "message": "Too many concurrent requests to the Google Drive API",
+    # 429 - Too many requests
+    # Not 100% accurate as the user probably isn't making too many, but
+    # close enough as it conveys the need to back off
+    "status_int": 429,
+}
+
 _GOOGLE_ERROR_MAP = {
-    (403, "userRateLimitExceeded"): {
-        "message": "Too many concurrent requests to the Google Drive API",
-        # 429 - Too many requests
-        # Not 100% accurate as the user probably isn't making too many, but
-        # close enough as it conveys the need to back off
-        "status_int": 429,
-    },
+    (403, "userRateLimitExceeded"): _RATE_LIMITED,
+    (403, "rateLimitExceeded"): _RATE_LIMITED,
+    (429, "rateLimitExceeded"): _RATE_LIMITED,
     (403, "cannotDownloadFile"): {
         # This seems to happen if a file is locked down in various ways
         # rather than for general consumption
@@ -83,6 +93,219 @@ def translate_google_error(error):
     return None
 
 
+@dataclass(frozen=True)
+class GoogleDriveFileMetadata:
+    """The details of a file in Google Drive which we care about.
+
+    Google doesn't provide some of these for all files (e.g. there's no size
+    or checksum for Google Docs), in which case they are `None`.
+    """
+
+    size: int | None
+    mime_type: str | None
+    md5_checksum: str | None
+    modified_time: datetime | None
+
+
+class TokenRefresher:
+    """Keep the access token for a Google service account fresh.
+
+    Left to itself `AuthorizedSession` refreshes the token inside whichever
+    request finds it has expired, so that request waits for Google (as do
+    any others which find the same thing at the same time). Instead we
+    refresh the token in the background a while before it expires, so
+    requests always find a valid one.
+    """
+
+    #: How long before the token expires to refresh it
+    REFRESH_AHEAD = 600
+    #: How long to wait before trying again after failing to refresh
+    RETRY_INTERVAL = 30
+
+    def __init__(self, credentials, timer=Timer, clock=monotonic):
+        """Initialise the refresher.
+
+        :param credentials: The `google.auth` credentials to refresh
+        :param timer: Factory for `threading.Timer` like objects
+        :param clock: Function returning the current time in seconds
+        """
+        self._credentials = credentials
+        self._timer = timer
+        self._clock = clock
+        self._request = Request()
+        self._lock = Lock()
+
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.blocking_refreshes = 0
+        self.last_refresh_seconds = None
+
+    def start(self):
+        """Start refreshing the token in the background."""
+        self._schedule(0)
+
+    def ensure_valid(self):
+        """Make sure the token is valid, refreshing it now if we must.
+
+        This is only a fallback for when background refreshing has failed.
+
+        :raise google.auth.exceptions.RefreshError: If we can't get a token
+        """
+        if self._credentials.valid:
+            return
+
+        with self._lock:
+            # Another thread might have refreshed it while we waited
+            if not self._credentials.valid:
+                self.blocking_refreshes += 1
+                self._refresh()
+
+    @property
+    def stats(self):
+        """Return a dict of counters describing the refreshing."""
+        expiry = self._credentials.expiry
+
+        return {
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "blocking_refreshes": self.blocking_refreshes,
+            "last_refresh_seconds": self.last_refresh_seconds,
+            "expires_in": self._seconds_until(expiry) if expiry else None,
+        }
+
+    def _schedule(self, delay):
+        timer = self._timer(delay, self._refresh_in_background)
+        timer.daemon = True
+        timer.start()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            try:
+                self._refresh()
+            except Exception:  # noqa: BLE001
+                # Requests will carry on using the current token while it lasts
+                LOG.warning("Could not refresh a Google Drive token", exc_info=True)
+                self.refresh_failures += 1
+                delay = self.RETRY_INTERVAL
+            else:
+                delay = max(
+                    self._seconds_until(self._credentials.expiry) - self.REFRESH_AHEAD,
+                    self.RETRY_INTERVAL,
+                )
+
+        self._schedule(delay)
+
+    def _refresh(self):
+        start = self._clock()
+        self._credentials.refresh(self._request)
+        self.last_refresh_seconds = round(self._clock() - start, 3)
+        self.refreshes += 1
+
+    @staticmethod
+    def _seconds_until(expiry):
+        # `google.auth` expiry times are naive UTC datetimes
+        return (expiry.replace(tzinfo=UTC) - datetime.now(tz=UTC)).total_seconds()
+
+
+@dataclass
+class PooledCredential:
+    """A Google service account in a `CredentialPool`."""
+
+    name: str
+    http_service: HTTPService
+    token_refresher: TokenRefresher
+
+    requests: int = 0
+    rate_limited: int = 0
+    cooling_until: float = 0
+    backoff: float = 0
+
+
+class CredentialPool:
+    """Spread requests across several Google service accounts.
+
+    Google applies its rate limits to each service account, so by spreading
+    requests across accounts we can make more of them. When an account is
+    rate limited we stop using it for a while, backing off for longer each
+    time it happens in a row.
+    """
+
+    MIN_BACKOFF = 30
+    MAX_BACKOFF = 600
+
+    def __init__(self, credentials, clock=monotonic):
+        """Initialise the pool.
+
+        :param credentials: A list of `PooledCredential` objects
+        :param clock: Function returning the current time in seconds
+        """
+        self._credentials = credentials
+        self._clock = clock
+        self._lock = Lock()
+
+    def candidates(self) -> Iterator[PooledCredential]:
+        """Get the credentials to try a request with, in order.
+
+        These are the credentials which aren't cooling down, least used
+        first. If they all are, it's whichever will stop cooling down first.
+        Each one is counted as used when it's returned.
+        """
+        with self._lock:
+            now = self._clock()
+            available = sorted(
+                (
+                    credential
+                    for credential in self._credentials
+                    if credential.cooling_until <= now
+                ),
+                key=lambda credential: credential.requests,
+            ) or [
+                min(self._credentials, key=lambda credential: credential.cooling_until)
+            ]
+
+        for credential in available:
+            with self._lock:
+                credential.requests += 1
+
+            yield credential
+
+    def succeeded(self, credential: PooledCredential):
+        """Record that a request made with `credential` worked."""
+        with self._lock:
+            credential.backoff = 0
+
+    def rate_limited(self, credential: PooledCredential):
+        """Record that Google rate limited `credential` and rest it."""
+        with self._lock:
+            credential.rate_limited += 1
+            credential.backoff = min(
+                max(credential.backoff * 2, self.MIN_BACKOFF), self.MAX_BACKOFF
+            )
+            credential.cooling_until = self._clock() + credential.backoff
+
+        LOG.warning(
+            "Google Drive rate limited '%s', resting it for %ss",
+            credential.name,
+            credential.backoff,
+        )
+
+    @property
+    def stats(self):
+        """Return a dict of usage counters for each credential."""
+        with self._lock:
+            now = self._clock()
+
+            return {
+                credential.name: {
+                    "requests": credential.requests,
+                    "rate_limited": credential.rate_limited,
+                    "cooling_down": credential.cooling_until > now,
+                    "token": credential.token_refresher.stats,
+                }
+                for credential in self._credentials
+            }
+
+
 class GoogleDriveAPI:
     """Simplified interface for interacting with Google Drive."""
 
@@ -97,34 +320,70 @@ class GoogleDriveAPI:
     # that the shortest one will kick in first
     TIMEOUT = 60
 
-    def __init__(self, credentials_list, resource_keys):
+    #: How long to remember the metadata of a file
+    METADATA_TTL = 300
+
+    def __init__(self, credentials_list, resource_keys, pool_maxsize=None):
         """Initialise the service.
 
         :param credentials_list: A list of dicts of credentials info as
-            provided by Google console's JSON format.
+            provided by Google console's JSON format. Requests are spread
+            across all of them.
         :param resource_keys: A dict of file ids to resource keys, to fill out
             any missing resource keys.
+        :param pool_maxsize: How many connections to Google to keep open for
+            each credential, if not `requests`' default
 
         :raises ConfigurationError: If the credentials are not accepted by Google
         """
         if credentials_list[0].get("disable"):
             LOG.error("Google Drive credentials have been disabled")
+            # Nothing else works, but there's still nothing to report in stats
+            self._credentials = None
             return
 
         self._resource_keys = resource_keys
+        self._metadata_cache = TTLCache(maxsize=10000)
+        self._credentials = CredentialPool(
+            [
+                self._pooled_credential(index, credentials_info, pool_maxsize)
+                for index, credentials_info in enumerate(credentials_list)
+            ]
+        )
+
+    @property
+    def stats(self):
+        """Return a dict of usage counters for each service account."""
+        if self._credentials is None:
+            return {}
 
+        return self._credentials.stats
+
+    @classmethod
+    def _pooled_credential(cls, index, credentials_info, pool_maxsize):
         try:
             credentials = Credentials.from_service_account_info(
-                credentials_list[0], scopes=self.SCOPES
+                credentials_info, scopes=cls.SCOPES
             )
         except ValueError as exc:
             raise ConfigurationError(  # noqa: TRY003
                 "The Google Drive service account information is invalid"  # noqa: EM101
             ) from exc
 
-        self._http_service = HTTPService(
-            session=AuthorizedSession(credentials, refresh_timeout=self.TIMEOUT),
-            error_translator=translate_google_error,
+        token_refresher = TokenRefresher(credentials)
+        token_refresher.start()
+
+        session = AuthorizedSession(credentials, refresh_timeout=cls.TIMEOUT)
+        if pool_maxsize:
+            session.mount("https://", HTTPAdapter(pool_maxsize=pool_maxsize))
+
+        return PooledCredential(
+            name=credentials_info.get("client_email", f"credentials_{index}"),
+            http_service=HTTPService(
+                session=session,
+                error_translator=translate_google_error,
+            ),
+            token_refresher=token_refresher,
         )
 
     _FILE_PATH_REGEX = re.compile("/file/d/(?P<file_id>[^/]+)")
@@ -165,6 +424,20 @@ class GoogleDriveAPI:
         :returns: A generator of byte strings which taken together form the
             document
 
+        :raises HTTPNotFound: If the file id is not valid
+        :raises GoogleDriveServiceError: For specifically handled scenarios
+            like timeouts and rate limiting
+        :raises UpstreamServiceError: For other errors
+        """
+        yield from self.stream_file(file_id, resource_key).content
+
+    def stream_file(self, file_id, resource_key=None, headers=None) -> StreamedResponse:
+        """Request the specified file and return the streamed response.
+
+        :param file_id: Google Drive file id to retrieve
+        :param resource_key: Google Drive resources key (if any)
+        :param headers: Extra headers to send to Google (e.g. `Range`)
+
         :raises HTTPNotFound: If the file id is not valid
         :raises GoogleDriveServiceError: For specifically handled scenarios
             like timeouts and rate limiting
@@ -178,9 +451,70 @@ class GoogleDriveAPI:
                 "Accept": "*/*",
                 "Accept-Encoding": "gzip, deflate",
                 "User-Agent": "(gzip)",
+                **(headers or {}),
+                **self._resource_key_headers(file_id, resource_key),
             }
         )
 
+        return self._with_credentials(
+            lambda http_service: http_service.stream_response(
+                url=url,
+                headers=headers,
+                timeout=self.TIMEOUT,
+                max_allowed_time=self.TIMEOUT,
+            )
+        )
+
+    def get_file_metadata(self, file_id, resource_key=None) -> GoogleDriveFileMetadata:
+        """Get the size, type, checksum and modification time of a file.
+
+        These are cached for a while, so they can be checked on every request
+        for a file without going to Google each time.
+
+        :param file_id: Google Drive file id to get the metadata for
+        :param resource_key: Google Drive resources key (if any)
+
+        :raises HTTPNotFound: If the file id is not valid
+        :raises GoogleDriveServiceError: For specifically handled scenarios
+            like timeouts and rate limiting
+        :raises UpstreamServiceError: For other errors
+        """
+        cache_key = (file_id, resource_key)
+        if metadata := self._metadata_cache.get(cache_key):
+            return metadata
+
+        # https://developers.google.com/drive/api/v3/reference/files/get
+        response = self._with_credentials(
+            lambda http_service: http_service.request(
+                "GET",
+                f"https://www.googleapis.com/drive/v3/files/{file_id}",
+                params={
+                    "fields": "size,mimeType,md5Checksum,modifiedTime",
+                    # Without this files in shared drives aren't found
+                    "supportsAllDrives": "true",
+                },
+                headers=add_request_headers(
+                    self._resource_key_headers(file_id, resource_key)
+                ),
+            )
+        )
+        data = response.json()
+
+        metadata = GoogleDriveFileMetadata(
+            size=int(data["size"]) if "size" in data else None,
+            mime_type=data.get("mimeType"),
+            md5_checksum=data.get("md5Checksum"),
+            modified_time=(
+                datetime.fromisoformat(data["modifiedTime"])
+                if "modifiedTime" in data
+                else None
+            ),
+        )
+        self._metadata_cache.set(cache_key, metadata, ttl=self.METADATA_TTL)
+
+        return metadata
+
+    def _resource_key_headers(self, file_id, resource_key):
         if not resource_key:
             # If we are being called, we should have been initialised with a
             # set of resource keys. See the factory below
@@ -193,11 +527,31 @@ class GoogleDriveAPI:
                 )
 
         if resource_key:
-            headers["X-Goog-Drive-Resource-Keys"] = f"{file_id}/{resource_key}"
+            return {"X-Goog-Drive-Resource-Keys": f"{file_id}/{resource_key}"}
 
-        yield from self._http_service.stream(
-            url=url,
-            headers=headers,
-            timeout=self.TIMEOUT,
-            max_allowed_time=self.TIMEOUT,
-        )
+        return {}
+
+    def _with_credentials(self, make_request):
+        """Make a request, retrying with other credentials if rate limited.
+
+        :param make_request: Callable which accepts an `HTTPService` and makes
+            the request with it
+        """
+        for credential in self._credentials.candidates():
+            credential.token_refresher.ensure_valid()
+
+            try:
+                response = make_request(credential.http_service)
+            except GoogleDriveServiceError as err:
+                if err.status_int != _RATE_LIMITED["status_int"]:
+                    raise
+
+                # Another service account might still be allowed through
+                self._credentials.rate_limited(credential)
+                rate_limited_error = err
+                continue
+
+            self._credentials.succeeded(credential)
+            return response
+
+        raise rate_limited_error
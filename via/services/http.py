@@ -1,5 +1,12 @@
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass
+from threading import Lock
+from time import monotonic
+
 import requests
 from requests import RequestException, exceptions
+from requests.adapters import HTTPAdapter
+from urllib3 import PoolManager
 
 from via.exceptions import (
     BadURL,
@@ -21,6 +28,165 @@ DEFAULT_ERROR_MAP = {
 }
 
 
+@dataclass
+class StreamedResponse:
+    """The status, headers and streamed content of an upstream response."""
+
+    status_code: int
+    headers: Mapping[str, str]
+    content: Iterator[bytes]
+
+
+class _IdleEvictingPoolManager(PoolManager):
+    """A urllib3 pool manager which closes pools which haven't been used.
+
+    It also keeps count of how many connections have been opened and how many
+    requests have been sent by the pools it has managed.
+    """
+
+    def __init__(self, *args, idle_timeout, clock=monotonic, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self._idle_timeout = idle_timeout
+        self._clock = clock
+
+        # Pool key -> (pool, last used time)
+        self._last_used: dict = {}
+        self._lock = Lock()
+        self._closed_connections = 0
+        self._closed_requests = 0
+
+        # Called whenever a pool is removed for any reason (idle, too many
+        # hosts, or `clear()`) so we can keep the counts right
+        self.pools.dispose_func = self._dispose_pool
+
+    def connection_from_pool_key(self, pool_key, request_context):
+        now = self._clock()
+
+        with self._lock:
+            idle_keys = [
+                key
+                for key, (_pool, last_used) in self._last_used.items()
+                if key != pool_key and now - last_used > self._idle_timeout
+            ]
+
+        for key in idle_keys:
+            self.pools.pop(key, None)
+
+        pool = super().connection_from_pool_key(pool_key, request_context)
+
+        with self._lock:
+            self._last_used[pool_key] = (pool, now)
+
+        return pool
+
+    @property
+    def stats(self):
+        with self._lock:
+            pools = [pool for pool, _ in self._last_used.values()]
+            opened = self._closed_connections
+            requests_sent = self._closed_requests
+
+        for pool in pools:
+            opened += pool.num_connections
+            requests_sent += pool.num_requests
+
+        return {
+            "pools": len(pools),
+            "connections_opened": opened,
+            "connections_reused": max(requests_sent - opened, 0),
+        }
+
+    def _dispose_pool(self, pool):
+        with self._lock:
+            self._last_used = {
+                key: value
+                for key, value in self._last_used.items()
+                if value[0] is not pool
+            }
+
+            self._closed_connections += pool.num_connections
+            self._closed_requests += pool.num_requests
+
+        pool.close()
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """A `requests` transport adapter which can be shared between sessions.
+
+    urllib3's pool manager is thread-safe, so one instance of this can be
+    mounted on many `requests.Session` objects. This lets us have a separate
+    session (and so separate cookies) for each request we handle, while
+    re-using the underlying TCP and TLS connections across requests.
+    """
+
+    def __init__(
+        self,
+        pool_connections=20,
+        pool_maxsize=10,
+        host_pool_maxsize=None,
+        idle_timeout=60,
+        **kwargs,
+    ):
+        """Initialise the adapter.
+
+        :param pool_connections: How many hosts to keep pools for
+        :param pool_maxsize: How many connections to keep open to each host
+        :param host_pool_maxsize: Dict of hostname to `pool_maxsize` for hosts
+            which need a different number of connections
+        :param idle_timeout: How long (in seconds) to keep connections to a
+            host open when we aren't making any requests to it
+        """
+        self._host_pool_maxsize = host_pool_maxsize or {}
+        self._idle_timeout = idle_timeout
+
+        super().__init__(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize, **kwargs
+        )
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):  # noqa: FBT002
+        # This is mostly a copy of the parent, but with our pool manager
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+
+        self.poolmanager = _IdleEvictingPoolManager(
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            idle_timeout=self._idle_timeout,
+            **pool_kwargs,
+        )
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(
+            request, verify, cert
+        )
+
+        if maxsize := self._host_pool_maxsize.get(host_params["host"]):
+            pool_kwargs["maxsize"] = maxsize
+
+        return host_params, pool_kwargs
+
+    def close(self):
+        # Closing one of the sessions we are mounted on shouldn't close the
+        # connections for everyone else
+        pass
+
+    @property
+    def stats(self):
+        """Return counts of pools and connections opened and re-used."""
+        return self.poolmanager.stats
+
+    def create_session(self):
+        """Return a new `requests.Session` which uses this adapter."""
+        session = requests.Session()
+        session.mount("https://", self)
+        session.mount("http://", self)
+
+        return session
+
+
 class HTTPService:
     """Send HTTP requests with `requests` and receive the responses."""
 
@@ -98,9 +264,32 @@ class HTTPService:
         return response
 
     def stream(self, url, method="GET", **kwargs):
+        yield from self.stream_response(url, method=method, **kwargs).content
+
+    def stream_response(self, url, method="GET", min_chunk_size=64000, **kwargs):
+        r"""Send a request and return the response with streamed content.
+
+        Unlike `stream()` the request is sent immediately, so the status and
+        headers of the response are available before reading the content.
+
+        :param url: The URL to request
+        :param method: The HTTP method to use
+        :param min_chunk_size: The smallest chunk of content to yield (apart
+            from the last one)
+        :param \**kwargs: Any other arguments are passed to `request()`
+        :rtype: StreamedResponse
+        """
         response = self.request(method=method, url=url, stream=True, **kwargs)
+
+        return StreamedResponse(
+            status_code=response.status_code,
+            headers=response.headers,
+            content=self._iter_content(response, min_chunk_size),
+        )
+
+    def _iter_content(self, response, min_chunk_size):
         try:
-            yield from self._stream_bytes(response)
+            yield from self._stream_bytes(response, min_chunk_size=min_chunk_size)
         except Exception as err:
             if mapped_err := self._translate_exception(err):
                 raise mapped_err from err
@@ -127,21 +316,33 @@ class HTTPService:
         The response must have been called with `stream=True` for this to be
         effective. This will attempt to smooth over some of the variation of
         block size to give a smoother output for upstream services calling us.
+
+        Every chunk yielded will be at least `min_chunk_size` bytes, apart
+        from the last one.
         """
-        buffer = b""
+        # We collect small reads in a `bytearray` which is extended in place,
+        # so each byte is copied once on the way in and once on the way out.
+        # Adding `bytes` together instead copies the whole buffer on every
+        # read, which gets very expensive when the reads are small.
+        buffer = bytearray()
 
         # The chunk_size appears to be a guide value at best. We often get more
         # or just about 9 bytes, so we'll do some smoothing for our callers so
         # we don't incur overhead with very short iterations of content
         for chunk in response.iter_content(chunk_size=min_chunk_size):
+            if not buffer and len(chunk) >= min_chunk_size:
+                # There's nothing to smooth, so pass it on without copying
+                yield chunk
+                continue
+
             buffer += chunk
             if len(buffer) >= min_chunk_size:
-                yield buffer
-                buffer = b""
+                yield bytes(buffer)
+                buffer.clear()
 
         if buffer:
-            yield buffer
+            yield bytes(buffer)
 
 
-def factory(_context, _request):
-    return HTTPService()
+def factory(_context, request):
+    return HTTPService(session=request.find_service(PooledHTTPAdapter).create_session())
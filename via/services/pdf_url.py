@@ -4,10 +4,12 @@ from base64 import b64encode
 from collections.abc import Callable
 from dataclasses import dataclass
 from datetime import timedelta
+from time import time
 
 from h_vialib.secure import quantized_expiry
 from requests import Request
 
+from via.cache import TTLCache
 from via.services.google_drive import GoogleDriveAPI
 from via.services.secure_link import SecureLinkService
 
@@ -16,13 +18,40 @@ from via.services.secure_link import SecureLinkService
 class _NGINXSigner:
     nginx_server: str
     secret: str
+    #: Signed URLs from the current expiry window, shared between requests
+    cache: TTLCache | None = None
+
+    MAX_AGE = timedelta(hours=25)
 
     def sign_url(self, url, nginx_path):
         """Return the URL from which the PDF viewer should load the PDF."""
+        return self.sign_urls([url], nginx_path)[0]
+
+    def sign_urls(self, urls, nginx_path):
+        """Return the URLs from which the PDF viewer should load the PDFs."""
+
+        # Compute the expiry time to put into the URLs. This is the same for
+        # everything signed in the same window, so signed URLs are too.
+        exp = int(quantized_expiry(max_age=self.MAX_AGE).timestamp())
+        # `quantized_expiry()` returns the same time until it would be less
+        # than half the max age away
+        window_ttl = exp - time() - self.MAX_AGE.total_seconds() / 2
+
+        if self.cache is None:
+            return [self._sign_url(url, nginx_path, exp) for url in urls]
+
+        signed_urls = []
+        for url in urls:
+            cache_key = (url, nginx_path, exp)
+            if not (signed_url := self.cache.get(cache_key)):
+                signed_url = self._sign_url(url, nginx_path, exp)
+                self.cache.set(cache_key, signed_url, ttl=window_ttl)
+
+            signed_urls.append(signed_url)
 
-        # Compute the expiry time to put into the URL.
-        exp = int(quantized_expiry(max_age=timedelta(hours=25)).timestamp())
+        return signed_urls
 
+    def _sign_url(self, url, nginx_path, exp):
         # The expression to be hashed.
         #
         # This matches the hash expression that we tell the NGINX secure link
@@ -50,6 +79,37 @@ class _NGINXSigner:
         return f"{self.nginx_server}{nginx_path}{sec}/{exp}/{url}"
 
 
+class _RouteMatcher:
+    """Find which of a number of routes a URL should go to.
+
+    The patterns for all of the routes are combined into a single regex, so
+    we find the route in one match however many there are.
+    """
+
+    def __init__(self, routes):
+        """Initialise the matcher.
+
+        :param routes: Iterable of (route name, patterns) pairs. Patterns are
+            matched against the start of the URL, and the first route with a
+            matching pattern wins.
+        """
+        self._routes = {}
+        alternatives = []
+        for i, (route, patterns) in enumerate(routes):
+            group = f"route_{i}"
+            self._routes[group] = route
+            alternatives.append(f"(?P<{group}>{'|'.join(patterns)})")
+
+        self._regex = re.compile("|".join(alternatives))
+
+    def match(self, url):
+        """Return the name of the route for `url`, or None if there isn't one."""
+        if match := self._regex.match(url):
+            return self._routes[match.lastgroup]
+
+        return None
+
+
 @dataclass
 class PDFURLBuilder:
     request: Request
@@ -58,14 +118,22 @@ class PDFURLBuilder:
     route_url: Callable
     nginx_signer: _NGINXSigner
 
-    _MS_ONEDRIVE_URL = (
-        re.compile(r"^https://.*\.sharepoint.com/.*download=1"),
-        re.compile(r"^https://api.onedrive.com/v1.0/.*/root/content"),
+    #: Routes for PDFs which we proxy with Python rather than NGINX, and
+    #: patterns for the URLs which should use them. The first match wins.
+    PYTHON_PDF_ROUTES = (
+        (
+            "proxy_onedrive_pdf",
+            (
+                r"https://.*\.sharepoint.com/.*download=1",
+                r"https://api.onedrive.com/v1.0/.*/root/content",
+            ),
+        ),
+        # D2L
+        ("proxy_d2l_pdf", (r".*\/content\/topics\/\w+\/file\?stream=1$",)),
+        # Moodle
+        ("proxy_python_pdf", (r".*\/webservice/.*?forcedownload=1$",)),
     )
-
-    _D2L_URL = (re.compile(r".*\/content\/topics\/\w+\/file\?stream=1$"),)
-
-    _MOODLE_URL = (re.compile(r".*\/webservice/.*?forcedownload=1$"),)
+    _python_pdf_routes = _RouteMatcher(PYTHON_PDF_ROUTES)
 
     def get_pdf_url(self, url):
         """Build a signed URL to the corresponding Via route for proxing the PDF at `url`.
@@ -76,29 +144,11 @@ class PDFURLBuilder:
         if file_details := self.google_drive_api.parse_file_url(url):
             return self._google_file_url(file_details, url)
 
-        if self._is_onedrive_url(url):
-            return self._proxy_python_pdf(url, route="proxy_onedrive_pdf")
-
-        if self._is_d2l_url(url):
-            return self._proxy_python_pdf(url, route="proxy_d2l_pdf")
-
-        if self._is_moodle_url(url):
-            return self._proxy_python_pdf(url, route="proxy_python_pdf")
+        if route := self._python_pdf_routes.match(url):
+            return self._proxy_python_pdf(url, route=route)
 
         return self.nginx_signer.sign_url(url, nginx_path="/proxy/static/")
 
-    @classmethod
-    def _is_onedrive_url(cls, url):
-        return any(regexp.match(url) for regexp in cls._MS_ONEDRIVE_URL)
-
-    @classmethod
-    def _is_d2l_url(cls, url):
-        return any(regexp.match(url) for regexp in cls._D2L_URL)
-
-    @classmethod
-    def _is_moodle_url(cls, url):
-        return any(regexp.match(url) for regexp in cls._MOODLE_URL)
-
     def _proxy_python_pdf(self, url, route="proxy_python_pdf"):
         """Return the URL to proxy the pdf in `url` with python instead of nginx.
 
@@ -146,5 +196,6 @@ def factory(_context, request):
         nginx_signer=_NGINXSigner(
             nginx_server=request.registry.settings["nginx_server"],
             secret=request.registry.settings["nginx_secure_link_secret"],
+            cache=request.find_service(TTLCache, name="nginx_signed_urls"),
         ),
     )
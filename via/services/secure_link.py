@@ -1,9 +1,12 @@
 from datetime import timedelta
+from time import time
 
 from h_vialib.exceptions import TokenException
 from h_vialib.secure import ViaSecureURL
 from pyramid.httpexceptions import HTTPUnauthorized
 
+from via.cache import TTLCache
+
 
 def has_secure_url_token(view):
     """Require the request to have a valid signature."""
@@ -20,14 +23,20 @@ def has_secure_url_token(view):
 class SecureLinkService:
     """A service for signing and checking URLs have been signed."""
 
-    def __init__(self, secret, signed_urls_required):
+    def __init__(self, secret, signed_urls_required, verified_urls: TTLCache):
         """Initialise the service.
 
         :param secret: Shared secret to sign and verify URLs with
         :param signed_urls_required: Enable or disable URL signing
+        :param verified_urls: Cache of URLs we've already verified, shared
+            between requests
         """
         self._via_secure_url = ViaSecureURL(secret)
         self._signed_urls_required = signed_urls_required
+        self._verified_urls = verified_urls
+        # We're created for each request, and different views ask about the
+        # same URL more than once
+        self._results: dict[str, bool] = {}
 
     def request_is_valid(self, request) -> bool:
         """Check whether a request has been signed.
@@ -37,12 +46,7 @@ class SecureLinkService:
         if not self._signed_urls_required:
             return True
 
-        try:
-            self._via_secure_url.verify(request.url)
-        except TokenException:
-            return False
-
-        return True
+        return self.url_has_valid_token(request.url)
 
     def request_has_valid_token(self, request) -> bool:
         """Check whether a request has a valid signed URL token.
@@ -51,11 +55,31 @@ class SecureLinkService:
         regardless of whether signed URLs are required. Use this to
         distinguish LMS requests from public requests.
         """
+        return self.url_has_valid_token(request.url)
+
+    def url_has_valid_token(self, url) -> bool:
+        """Check whether `url` has a valid signed URL token.
+
+        Like request_has_valid_token, this ALWAYS checks for a valid token.
+        """
+        if url not in self._results:
+            self._results[url] = self._verify(url)
+
+        return self._results[url]
+
+    def _verify(self, url):
+        if self._verified_urls.get(url):
+            return True
+
         try:
-            self._via_secure_url.verify(request.url)
+            claims = self._via_secure_url.verify(url)
         except TokenException:
             return False
 
+        # The same signed URL is used by everyone following the same link, so
+        # remember it's valid until the token expires
+        self._verified_urls.set(url, value=True, ttl=claims.get("exp", 0) - time())
+
         return True
 
     def sign_url(self, url):
@@ -71,4 +95,5 @@ def factory(_context, request):
     return SecureLinkService(
         secret=request.registry.settings["via_secret"],
         signed_urls_required=request.registry.settings["signed_urls_required"],
+        verified_urls=request.find_service(TTLCache, name="verified_secure_urls"),
     )
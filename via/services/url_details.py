@@ -1,8 +1,12 @@
 """Retrieve details about a resource at a URL."""
 
 from collections import OrderedDict
+from datetime import UTC, datetime
 from email.message import Message
+from email.utils import parsedate_to_datetime
+from urllib.parse import urldefrag, urlparse
 
+from via.cache import SingleFlight, TTLCache
 from via.requests_tools.headers import add_request_headers, clean_headers
 from via.services.checkmate import CheckmateService
 from via.services.google_drive import GoogleDriveAPI
@@ -11,15 +15,48 @@ from via.services.youtube import YouTubeService
 
 
 class URLDetailsService:
-    def __init__(
+    #: Headers from the original request which can change what we get back
+    #: from the upstream server, and so form part of the cache key. Others
+    #: like `Accept` vary by browser, so keying on them would split the cache
+    #: without changing the answer.
+    CACHE_KEY_HEADERS = ("Authorization",)
+
+    #: How long to remember details when the upstream doesn't tell us
+    DEFAULT_TTL = 300
+    #: The longest we'll remember details, whatever the upstream says
+    MAX_TTL = 3600
+    #: How long to remember error responses, by status class. These match
+    #: the caching headers `via.views.route_by_content` sends for errors.
+    NEGATIVE_TTLS = {4: 60, 5: 0}  # noqa: RUF012
+
+    #: Ways of finding out about a URL, from cheapest to most expensive:
+    #: a HEAD request, a GET for only the first few bytes and a full GET
+    PROBES = ("HEAD", "RANGE", "GET")
+    #: How long to remember which probe works for a host
+    PROBE_TTL = 86400
+    #: Statuses which mean the server doesn't support a probe at all, rather
+    #: than telling us about the URL
+    UNSUPPORTED_PROBE_STATUSES = (405, 501)
+    #: How many bytes to read when we have to guess the content type
+    SNIFF_BYTES = 1024
+    #: Content types which mean we should look at the content to find out
+    UNINFORMATIVE_MIME_TYPES = (None, "application/octet-stream")
+
+    def __init__(  # noqa: PLR0913
         self,
         checkmate_service: CheckmateService,
         http_service: HTTPService,
         youtube_service: YouTubeService,
+        cache: TTLCache,
+        probe_cache: TTLCache,
+        single_flight: SingleFlight,
     ):
         self._checkmate = checkmate_service
         self._http = http_service
         self._youtube = youtube_service
+        self._cache = cache
+        self._probe_cache = probe_cache
+        self._single_flight = single_flight
 
     def get_url_details(self, url, headers=None):
         """Get the content type and status code for a given URL.
@@ -41,23 +78,182 @@ class URLDetailsService:
         if GoogleDriveAPI.parse_file_url(url):
             return "application/pdf", 200
 
-        with self._http.get(
+        headers = headers or OrderedDict()
+
+        cache_key = self._cache_key(url, headers)
+        if cached := self._cache.get(cache_key):
+            mime_type, status_code = cached
+            return mime_type, status_code
+
+        # Many people tend to open the same URL at once (e.g. a class opening
+        # an assignment) so only one request per key goes upstream
+        details, ttl = self._single_flight.do(
+            ("url_details", cache_key), self._fetch_url_details, url, headers
+        )
+        self._cache.set(cache_key, details, ttl=ttl)
+
+        return details
+
+    def _fetch_url_details(self, url, headers):
+        """Get the details of `url` from upstream and how long to keep them.
+
+        We try the cheapest way of finding out first and fall back to more
+        expensive ones if the server doesn't support it, or won't answer it
+        for this URL. We remember what
+        worked for each host, so we don't have to repeat failed attempts.
+        """
+        host = urlparse(url).netloc
+
+        probes = self.PROBES
+        if (known_probe := self._probe_cache.get(host)) in probes:
+            probes = probes[probes.index(known_probe) :]
+
+        # The cheapest probe the host answered properly, which might not be
+        # one which works for this URL (e.g. if it has an uninformative content
+        # type). Error pages don't tell us what the host supports.
+        host_probe = None
+
+        def probe(name):
+            nonlocal host_probe
+
+            works_for_host, result = self._probe(name, url, headers)
+            if works_for_host and not host_probe:
+                host_probe = name
+
+            return result
+
+        *cheap_probes, final_probe = probes
+        for name in cheap_probes:
+            if result := probe(name):
+                break
+        else:
+            result = probe(final_probe)
+
+        if host_probe:
+            self._probe_cache.set(host, host_probe, ttl=self.PROBE_TTL)
+
+        return result
+
+    def _probe(self, probe, url, headers):
+        """Get the details of `url` using the given probe.
+
+        :return: A 2-tuple of whether the host answered the probe properly
+            and either ((mime type, status code), ttl) or None if this probe
+            doesn't work for the URL. The final probe always works.
+        """
+        headers = add_request_headers(clean_headers(headers))
+        if probe == "RANGE":
+            headers["Range"] = f"bytes=0-{self.SNIFF_BYTES - 1}"
+
+        with self._http.request(
+            "HEAD" if probe == "HEAD" else "GET",
             url,
             stream=True,
             allow_redirects=True,
-            headers=add_request_headers(clean_headers(headers or OrderedDict())),
+            headers=headers,
             timeout=10,
             raise_for_status=False,
         ) as rsp:
-            content_type = rsp.headers.get("Content-Type")
-            if content_type:
-                message = Message()
-                message["content-type"] = content_type
-                mime_type = message.get_content_type()
-            else:
-                mime_type = None
+            # An empty file can't have a range, but the host still supports them
+            works_for_host = rsp.status_code < 400 or (
+                probe == "RANGE" and rsp.status_code == 416
+            )
+
+            if probe != self.PROBES[-1] and (
+                rsp.status_code in self.UNSUPPORTED_PROBE_STATUSES
+                # Some servers refuse HEAD for URLs they'll GET (e.g. S3 and
+                # CloudFront presigned URLs answer 403), so try again with GET
+                or (probe == "HEAD" and 400 <= rsp.status_code < 500)
+                or (probe == "RANGE" and rsp.status_code == 416)
+            ):
+                return works_for_host, None
+
+            mime_type = self._parse_content_type(rsp.headers.get("Content-Type"))
+
+            # Error pages won't tell us any more about the URL
+            if mime_type in self.UNINFORMATIVE_MIME_TYPES and rsp.status_code < 400:
+                if probe == "HEAD":
+                    # We need to look at the content, and HEAD doesn't have any
+                    return works_for_host, None
+
+                first_bytes = next(rsp.iter_content(self.SNIFF_BYTES), b"")
+                mime_type = self._sniff_mime_type(first_bytes) or mime_type
+
+            # We asked for part of the content, but the whole thing is there
+            status_code = 200 if rsp.status_code == 206 else rsp.status_code
+
+            return works_for_host, ((mime_type, status_code), self._ttl_for(rsp))
+
+    @staticmethod
+    def _parse_content_type(content_type):
+        if not content_type:
+            return None
+
+        message = Message()
+        message["content-type"] = content_type
+        return message.get_content_type()
+
+    @staticmethod
+    def _sniff_mime_type(first_bytes):
+        """Guess the mime type of a document from its first bytes."""
+
+        # PDF readers accept the header anywhere in the first 1024 bytes
+        if b"%PDF-" in first_bytes:
+            return "application/pdf"
+
+        start = first_bytes.lstrip().lower()
+        if start.startswith((b"<!doctype html", b"<html")):
+            return "text/html"
+
+        return None
+
+    @classmethod
+    def _cache_key(cls, url, headers):
+        # Fragments are never sent to the server, so can't change the answer
+        url, _ = urldefrag(url)
+
+        return (url, *(headers.get(name) for name in cls.CACHE_KEY_HEADERS))
+
+    @classmethod
+    def _ttl_for(cls, response):
+        """Get how long we should cache the details of `response` for."""
+
+        status_class = response.status_code // 100
+        if (negative_ttl := cls.NEGATIVE_TTLS.get(status_class)) is not None:
+            return negative_ttl
+
+        directives = {}
+        for directive in response.headers.get("Cache-Control", "").split(","):
+            name, _, value = directive.strip().lower().partition("=")
+            directives[name] = value.strip('"')
+
+        if directives.keys() & {"no-store", "no-cache", "private"}:
+            return 0
+
+        for name in ("s-maxage", "max-age"):
+            if name in directives:
+                try:
+                    return min(int(directives[name]), cls.MAX_TTL)
+                except ValueError:
+                    return 0
+
+        if expires := response.headers.get("Expires"):
+            return min(cls._seconds_until(expires), cls.MAX_TTL)
+
+        return cls.DEFAULT_TTL
+
+    @staticmethod
+    def _seconds_until(http_date):
+        try:
+            expires_at = parsedate_to_datetime(http_date)
+        except (TypeError, ValueError):
+            # Invalid dates (like "0") mean "already expired"
+            return 0
+
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=UTC)
 
-            return mime_type, rsp.status_code
+        return max(int((expires_at - datetime.now(tz=UTC)).total_seconds()), 0)
 
 
 def factory(_context, request):
@@ -65,4 +261,7 @@ def factory(_context, request):
         checkmate_service=request.find_service(CheckmateService),
         http_service=request.find_service(HTTPService),
         youtube_service=request.find_service(YouTubeService),
+        cache=request.find_service(TTLCache, name="url_details"),
+        probe_cache=request.find_service(TTLCache, name="url_details_probes"),
+        single_flight=request.find_service(SingleFlight),
     )
@@ -1,7 +1,9 @@
 from urllib.parse import parse_qs, quote_plus, urlparse
 
-from sqlalchemy import select
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
 
+from via.cache import Batcher, SingleFlight, TTLCache
 from via.models import Transcript, Video
 from via.services.http import HTTPService
 from via.services.youtube_transcript import YouTubeTranscriptService
@@ -12,19 +14,34 @@ class YouTubeDataAPIError(Exception):
 
 
 class YouTubeService:
-    def __init__(
+    #: How long to remember video titles in memory
+    TITLE_TTL = 86400
+    #: How long to remember that there's no such video
+    NO_SUCH_VIDEO_TTL = 60
+    #: What we remember as the title when there's no such video
+    _NO_SUCH_VIDEO = ""
+    #: The most video IDs the YouTube Data API will accept in one call
+    MAX_IDS_PER_CALL = 50
+
+    def __init__(  # noqa: PLR0913
         self,
         db_session,
         enabled: bool,  # noqa: FBT001
         api_key: str,
         http_service: HTTPService,
         youtube_transcript_service: YouTubeTranscriptService,
+        single_flight: SingleFlight,
+        title_cache: TTLCache,
+        title_batcher: Batcher,
     ):
         self._db = db_session
         self._enabled = enabled
         self._api_key = api_key
         self._http_service = http_service
         self._transcript_svc = youtube_transcript_service
+        self._single_flight = single_flight
+        self._title_cache = title_cache
+        self._title_batcher = title_batcher
 
     @property
     def enabled(self):
@@ -71,31 +88,112 @@ class YouTubeService:
         return None
 
     def get_video_title(self, video_id):
-        """Call the YouTube API and return the title for the given video_id."""
+        """Call the YouTube API and return the title for the given video_id.
+
+        Titles are remembered in memory, then in the DB, so we only call the
+        API the first time we see a video.
+
+        :raise YouTubeDataAPIError: if there's no such video or we can't get
+            the title
+        """
+        if (title := self._title_cache.get(video_id)) is not None:
+            if title == self._NO_SUCH_VIDEO:
+                raise YouTubeDataAPIError("no such video")  # noqa: EM101, TRY003
+
+            return title
+
         if video := self._db.scalar(select(Video).where(Video.video_id == video_id)):
+            self._title_cache.set(video_id, video.title, ttl=self.TITLE_TTL)
             return video.title
 
-        try:
-            # https://developers.google.com/youtube/v3/docs/videos/list
-            title = self._http_service.get(
-                "https://www.googleapis.com/youtube/v3/videos",
-                params={
-                    "id": video_id,
-                    "key": self._api_key,
-                    "part": "snippet",
-                    "maxResults": "1",
-                },
-            ).json()["items"][0]["snippet"]["title"]
-        except Exception as exc:
-            raise YouTubeDataAPIError("getting the video title failed") from exc  # noqa: EM101, TRY003
-
-        self._db.add(Video(video_id=video_id, title=title))
+        # Other people are probably looking at other videos at the same time,
+        # and we can ask the API about lots of them for the same cost
+        title = self._title_batcher.do(video_id, self._fetch_video_titles)
+
+        if title is None:
+            # Don't let people keep asking the API about a bad video ID
+            self._title_cache.set(
+                video_id, self._NO_SUCH_VIDEO, ttl=self.NO_SUCH_VIDEO_TTL
+            )
+            raise YouTubeDataAPIError("no such video")  # noqa: EM101, TRY003
+
+        self._save_titles({video_id: title})
 
         return title
 
-    def get_transcript(self, video_id):
+    def get_video_titles(self, video_ids) -> dict[str, str]:
+        """Return the titles of many videos, keyed by video ID.
+
+        Videos we don't already know about are looked up with as few calls
+        to the API as possible. Videos which don't exist are left out.
+
+        :raise YouTubeDataAPIError: if we can't get the titles
         """
-        Call the YouTube API and return the transcript for the given video_id.
+        titles = {
+            video.video_id: video.title
+            for video in self._db.scalars(
+                select(Video).where(Video.video_id.in_(video_ids))
+            )
+        }
+
+        if missing_ids := [
+            video_id for video_id in dict.fromkeys(video_ids) if video_id not in titles
+        ]:
+            fetched_titles = self._fetch_video_titles(missing_ids)
+            self._save_titles(fetched_titles)
+            titles.update(fetched_titles)
+
+        return titles
+
+    def _fetch_video_titles(self, video_ids):
+        """Get videos' titles from the API, leaving out any which don't exist."""
+        titles = {}
+
+        for start in range(0, len(video_ids), self.MAX_IDS_PER_CALL):
+            batch = video_ids[start : start + self.MAX_IDS_PER_CALL]
+            try:
+                # https://developers.google.com/youtube/v3/docs/videos/list
+                items = self._http_service.get(
+                    "https://www.googleapis.com/youtube/v3/videos",
+                    params={
+                        "id": ",".join(batch),
+                        "key": self._api_key,
+                        "part": "snippet",
+                        "maxResults": str(len(batch)),
+                    },
+                ).json()["items"]
+
+                titles.update((item["id"], item["snippet"]["title"]) for item in items)
+            except Exception as exc:
+                raise YouTubeDataAPIError("getting the video title failed") from exc  # noqa: EM101, TRY003
+
+        return titles
+
+    def _save_titles(self, titles):
+        if not titles:
+            return
+
+        stmt = insert(Video).values(
+            [
+                {"video_id": video_id, "title": title}
+                for video_id, title in titles.items()
+            ]
+        )
+        self._db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[Video.video_id],
+                set_={"title": stmt.excluded.title, "updated": func.now()},
+            )
+        )
+
+        for video_id, title in titles.items():
+            self._title_cache.set(video_id, title, ttl=self.TITLE_TTL)
+
+    def get_transcript(self, video_id) -> Transcript:
+        """
+        Return the transcript for `video_id`, getting it from YouTube if needed.
+
+        Empty transcripts aren't stored, so what's returned may not be in the DB.
 
         :raise Exception: this method might raise any type of exception that
             YouTubeTranscriptApi raises
@@ -104,30 +202,53 @@ class YouTubeService:
             select(Transcript)
             .where(Transcript.video_id == video_id)
             .order_by(Transcript.created.asc())
+            .limit(1)
         ).first()
 
-        if existing_transcript and existing_transcript.transcript:
-            return existing_transcript.transcript
+        if existing_transcript and existing_transcript.body is None:
+            # Written by code from before we encoded transcripts when storing
+            # them, so encode it now.
+            existing_transcript.transcript = existing_transcript.transcript
 
+        if existing_transcript and existing_transcript.segment_count:
+            return existing_transcript
+
+        transcript_info, transcript = self._single_flight.do(
+            ("youtube_transcript", video_id), self._fetch_transcript, video_id
+        )
+
+        if not transcript:
+            return existing_transcript or Transcript(
+                video_id=video_id,
+                transcript_id=transcript_info.id,
+                transcript=transcript,
+            )
+
+        if existing_transcript:
+            # Update the existing empty transcript record.
+            existing_transcript.transcript_id = transcript_info.id
+            existing_transcript.transcript = transcript
+            return existing_transcript
+
+        new_transcript = Transcript(
+            video_id=video_id, transcript_id=transcript_info.id, transcript=transcript
+        )
+        self._db.add(new_transcript)
+        return new_transcript
+
+    def _fetch_transcript(self, video_id):
         transcript_infos = self._transcript_svc.get_transcript_infos(video_id)
         transcript_info = self._transcript_svc.pick_default_transcript(transcript_infos)
-        transcript = self._transcript_svc.get_transcript(transcript_info)
 
-        if transcript:
-            if existing_transcript:
-                # Update the existing empty transcript record.
-                existing_transcript.transcript_id = transcript_info.id
-                existing_transcript.transcript = transcript
-            else:
-                self._db.add(
-                    Transcript(
-                        video_id=video_id,
-                        transcript_id=transcript_info.id,
-                        transcript=transcript,
-                    )
-                )
+        return transcript_info, self._transcript_svc.get_transcript(transcript_info)
+
 
-        return transcript
+def warm_title_cache(db_session, title_cache: TTLCache, limit):
+    """Fill `title_cache` with the titles of the most recently updated videos."""
+    for video_id, title in db_session.execute(
+        select(Video.video_id, Video.title).order_by(Video.updated.desc()).limit(limit)
+    ):
+        title_cache.set(video_id, title, ttl=YouTubeService.TITLE_TTL)
 
 
 def factory(_context, request):
@@ -137,4 +258,7 @@ def factory(_context, request):
         api_key=request.registry.settings["youtube_api_key"],
         http_service=request.find_service(HTTPService),
         youtube_transcript_service=request.find_service(YouTubeTranscriptService),
+        single_flight=request.find_service(SingleFlight),
+        title_cache=request.find_service(TTLCache, name="youtube_titles"),
+        title_batcher=request.find_service(Batcher, name="youtube_titles"),
     )
@@ -1,9 +1,11 @@
 import re
 from base64 import b64encode
+from concurrent.futures import Executor, ThreadPoolExecutor
 from dataclasses import dataclass
 from logging import getLogger
 
-from via.services.http import HTTPService
+from via.cache import TTLCache
+from via.services.http import HTTPService, PooledHTTPAdapter
 
 LOG = getLogger(__name__)
 
@@ -131,9 +133,30 @@ class YouTubeTranscriptService:
 
     SUPADATA_API_URL = "https://api.supadata.ai/v1/transcript"
 
-    def __init__(self, http_service: HTTPService, api_key: str):
+    #: How long to remember that a video has no English transcript
+    NO_ENGLISH_TTL = 86400
+
+    def __init__(
+        self,
+        http_service: HTTPService,
+        api_key: str,
+        executor: Executor,
+        background_http_service: HTTPService,
+        no_english_cache: TTLCache,
+    ):
+        """Initialise the service.
+
+        :param executor: Executor for fetching transcripts in the original
+            language while we see if there's an English one
+        :param background_http_service: HTTPService for calls made on the
+            executor's threads, as `requests` sessions aren't thread safe
+        :param no_english_cache: Cache of video IDs with no English transcript
+        """
         self._http_service = http_service
+        self._background_http_service = background_http_service
         self._api_key = api_key
+        self._executor = executor
+        self._no_english_cache = no_english_cache
 
     def get_transcript_infos(self, video_id: str) -> list[TranscriptInfo]:
         """Return the list of available transcripts for `video_id`."""
@@ -238,60 +261,102 @@ class YouTubeTranscriptService:
         # Use original lang code from URL (preserves case for API call)
         original_lang = parts[3] if len(parts) > 3 else transcript_info.language_code
 
-        # Always try English first if the selected language isn't English.
-        # Some videos have English transcripts available even when not listed
-        # in availableLangs (e.g. auto-generated English subtitles).
-        if original_lang and not original_lang.lower().startswith("en"):
-            try:
-                english_transcript = self._fetch_transcript_from_api(
-                    transcript_info.video_id, "en"
-                )
-                if english_transcript:
-                    return english_transcript
-            except Exception:  # noqa: BLE001
-                LOG.info(
-                    "English transcript not available for video_id=%s, falling back to %s",
-                    transcript_info.video_id,
-                    original_lang,
-                )
+        video_id = transcript_info.video_id
+
+        # Prefer English if the selected language isn't English. Some videos
+        # have English transcripts available even when not listed in
+        # availableLangs (e.g. auto-generated English subtitles).
+        if (
+            not original_lang
+            or original_lang.lower().startswith("en")
+            or self._no_english_cache.get(video_id)
+        ):
+            return self._fetch_transcript_from_api(video_id, original_lang)
+
+        # Fetch the original language at the same time, so we don't have to
+        # wait for one call after the other if there's no English transcript.
+        # We only log this call's errors if we end up using it.
+        original_transcript = self._executor.submit(
+            self._request_transcript,
+            self._background_http_service,
+            video_id,
+            original_lang,
+        )
+
+        try:
+            english_transcript = self._fetch_transcript_from_api(video_id, "en")
+        except Exception:  # noqa: BLE001
+            LOG.info(
+                "English transcript not available for video_id=%s, falling back to %s",
+                video_id,
+                original_lang,
+            )
+        else:
+            if english_transcript:
+                # This only helps if the call hasn't started yet, otherwise
+                # we just ignore its result
+                original_transcript.cancel()
+                return english_transcript
+
+            # Errors might be temporary, but an empty transcript means there
+            # really isn't an English one
+            self._no_english_cache.set(video_id, value=True, ttl=self.NO_ENGLISH_TTL)
 
-        return self._fetch_transcript_from_api(transcript_info.video_id, original_lang)
+        try:
+            return original_transcript.result()
+        except Exception:
+            self._log_failure(video_id, original_lang)
+            raise
 
     def _fetch_transcript_from_api(self, video_id: str, lang: str | None) -> list[dict]:
         """Fetch transcript from the Supadata API for a specific language."""
+        try:
+            return self._request_transcript(self._http_service, video_id, lang)
+        except Exception:
+            self._log_failure(video_id, lang)
+            raise
+
+    def _request_transcript(
+        self, http_service: HTTPService, video_id: str, lang: str | None
+    ) -> list[dict]:
         params: dict[str, str] = {"url": f"https://youtu.be/{video_id}"}
         if lang and lang.lower() != "none":
             params["lang"] = lang
 
-        try:
-            response = self._http_service.get(
-                self.SUPADATA_API_URL,
-                params=params,
-                headers={"x-api-key": self._api_key},
-            )
-            response.raise_for_status()
-            data = response.json()
+        response = http_service.get(
+            self.SUPADATA_API_URL,
+            params=params,
+            headers={"x-api-key": self._api_key},
+        )
+        response.raise_for_status()
+        data = response.json()
 
-            # Convert Supadata format (milliseconds) to our format (seconds)
-            return [
-                {
-                    "text": segment["text"],
-                    "start": segment["offset"] / 1000.0,
-                    "duration": segment["duration"] / 1000.0,
-                }
-                for segment in data.get("content", [])
-            ]
-        except Exception:
-            LOG.exception(
-                "YouTubeTranscriptService.get_transcript failed for video_id=%s lang=%s",
-                video_id,
-                lang,
-            )
-            raise
+        # Convert Supadata format (milliseconds) to our format (seconds)
+        return [
+            {
+                "text": segment["text"],
+                "start": segment["offset"] / 1000.0,
+                "duration": segment["duration"] / 1000.0,
+            }
+            for segment in data.get("content", [])
+        ]
+
+    @staticmethod
+    def _log_failure(video_id: str, lang: str | None) -> None:
+        LOG.exception(
+            "YouTubeTranscriptService.get_transcript failed for video_id=%s lang=%s",
+            video_id,
+            lang,
+        )
 
 
 def factory(_context, request):
     return YouTubeTranscriptService(
-        http_service=HTTPService(),
+        http_service=request.find_service(HTTPService),
         api_key=request.registry.settings.get("supadata_api_key", ""),
+        executor=request.find_service(ThreadPoolExecutor, name="supadata"),
+        background_http_service=HTTPService(
+            session=request.find_service(PooledHTTPAdapter).create_session()
+        ),
+        no_english_cache=request.find_service(TTLCache, name="youtube_no_english"),
     )
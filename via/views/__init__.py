@@ -32,6 +32,7 @@ def add_routes(config):  # pragma: no cover
 
     config.add_route("api.video.transcript", "/api/video/transcript")
     config.add_route("api.youtube.transcript", "/api/youtube/transcript/{video_id}")
+    config.add_route("api.url_details", "/api/url_details")
 
     config.add_route("static_fallback", "/static/{url:.*}")
     config.add_route("proxy", "/{url:.*}", factory=PathURLResource)
@@ -0,0 +1,99 @@
+"""Look up the details of many URLs at once."""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import marshmallow
+from marshmallow.validate import Length
+from pyramid.httpexceptions import HTTPTemporaryRedirect
+from pyramid.view import view_config
+from webargs import fields
+from webargs.pyramidparser import use_kwargs
+
+from via.services import SecureLinkService, URLDetailsService
+from via.views.exceptions import _get_meta
+
+logger = logging.getLogger(__name__)
+
+#: The most URLs we'll look up in one request
+MAX_URLS = 100
+#: How many URLs we'll look up at once for a single request
+MAX_WORKERS = 10
+
+
+@view_config(
+    route_name="api.url_details",
+    request_method="POST",
+    permission="api",
+    renderer="json",
+)
+@use_kwargs(
+    {
+        "links": fields.List(
+            fields.Url(), required=True, validate=Length(min=1, max=MAX_URLS)
+        ),
+    },
+    location="json",
+    unknown=marshmallow.EXCLUDE,
+)
+def get_url_details(request, links: list):
+    """Look up the details of a batch of Via links ahead of time.
+
+    This is intended to be called when a page with many Via links on it is
+    shown (e.g. a list of assignments in an LMS). Looking the links up fills
+    our URL details and Checkmate caches, so when someone follows a link we
+    can route it without going upstream again.
+
+    `links` are signed `/route` links we've already given out, so callers
+    can only warm the caches for URLs they could look up anyway by following
+    the links. We don't return Via URLs, as we'd be signing URLs for anyone
+    with an API JWT.
+
+    Checkmate is configured in the same way as for `/route`, so
+    `via.blocked_for` should be passed in the query string.
+    """
+    secure_link_service = request.find_service(SecureLinkService)
+    url_details_service = request.find_service(URLDetailsService)
+
+    def get_decision(link):
+        if not secure_link_service.url_has_valid_token(link):
+            return _error("InvalidToken", "The link isn't signed")
+
+        try:
+            (url,) = parse_qs(urlsplit(link).query)["url"]
+        except (KeyError, ValueError):
+            return _error("MissingURL", "The link doesn't have one URL")
+
+        try:
+            # The caller's headers aren't the ones a student following the
+            # link would send, so we look it up as if there were none
+            mime_type, status_code = url_details_service.get_url_details(url)
+        except HTTPTemporaryRedirect as redirect:
+            # Checkmate has blocked this URL
+            return {"blocked": True, "blocked_url": redirect.location}
+        except Exception as err:  # noqa: BLE001
+            # One bad URL shouldn't stop us from telling the caller about
+            # the rest of them
+            logger.info("Could not get details for %s", url, exc_info=True)
+            # The error's message can include the upstream's response, which
+            # isn't ours to pass on
+            return _error(err.__class__.__name__, _get_meta(err)["title"])
+
+        return {"blocked": False, "mime_type": mime_type, "status_code": status_code}
+
+    with ThreadPoolExecutor(
+        max_workers=min(len(links), MAX_WORKERS), thread_name_prefix="url_details"
+    ) as executor:
+        decisions = list(executor.map(get_decision, links))
+
+    return {
+        "data": [
+            {"type": "url_details", "id": link, "attributes": decision}
+            for link, decision in zip(links, decisions, strict=True)
+        ]
+    }
+
+
+def _error(code, detail):
+    return {"blocked": False, "error": {"code": code, "detail": detail}}
@@ -1,29 +1,68 @@
+import gzip
+import hashlib
 import logging
 
+from pyramid.response import Response
 from pyramid.view import view_config
+from webob.acceptparse import create_accept_encoding_header
 
+from via.cache import TTLCache
 from via.services import YouTubeService
 
 logger = logging.getLogger(__name__)
 
+#: How long to keep encoded transcripts in memory. Transcripts don't change
+#: once we've stored them, so this only limits how long unpopular ones last.
+TRANSCRIPT_TTL = 86400
+
 
 @view_config(
     route_name="api.youtube.transcript",
     request_method="GET",
     permission="api",
-    renderer="json",
 )
 def get_transcript(request):
-    """Return the transcript of a given YouTube video."""
+    """Return the transcript of a given YouTube video.
+
+    Transcripts can be several megabytes of JSON, so they're stored encoded
+    and compressed, and we send them as they are to clients which accept gzip.
+    """
 
     video_id = request.matchdict["video_id"]
+    cache = request.find_service(TTLCache, name="youtube_transcripts")
+
+    if (encoded := cache.get(video_id)) is None:
+        transcript = request.find_service(YouTubeService).get_transcript(video_id)
+        encoded = (
+            transcript.body,
+            # Hashing the compressed body is quicker, and it's the same for
+            # the same transcript every time
+            hashlib.sha256(transcript.body).hexdigest()[:32],
+        )
+
+        if transcript.segment_count:
+            # Don't hold on to empty transcripts, as we'll try to get them
+            # again next time
+            cache.set(video_id, encoded, ttl=TRANSCRIPT_TTL)
+
+    compressed_body, etag = encoded
+
+    response = Response(
+        content_type="application/json",
+        charset="utf-8",
+        conditional_response=True,
+    )
+    # Weak, as it's the same for the compressed and uncompressed bodies
+    response.etag = (etag, False)
+    response.vary = ("Accept-Encoding",)
 
-    transcript = request.find_service(YouTubeService).get_transcript(video_id)
+    accept_encoding = create_accept_encoding_header(
+        request.headers.get("Accept-Encoding")
+    )
+    if accept_encoding.acceptable_offers(["gzip"]):
+        response.body = compressed_body
+        response.content_encoding = "gzip"
+    else:
+        response.body = gzip.decompress(compressed_body)
 
-    return {
-        "data": {
-            "type": "transcripts",
-            "id": video_id,
-            "attributes": {"segments": transcript},
-        }
-    }
+    return response
@@ -2,7 +2,15 @@ from checkmatelib import CheckmateException
 from pyramid import view
 from sentry_sdk import capture_message
 
-from via.services import CheckmateService
+from via.cache import DiskCache, SingleFlight, TTLCache
+from via.decryption import DecryptionService
+from via.services import (
+    CheckmateService,
+    CheckmateVerdictCache,
+    GoogleDriveAPI,
+    PooledCheckmateClient,
+    PooledHTTPAdapter,
+)
 
 
 @view.view_config(route_name="status", renderer="json", http_cache=0)
@@ -19,12 +27,37 @@ def status(request):
         else:
             body["okay"] = ["checkmate"]
 
+        body["checkmate"] = {
+            "circuit_breaker": request.find_service(
+                PooledCheckmateClient
+            ).circuit_breaker.stats
+        }
+
     # If any of the components checked above were down then report the
     # status check as a whole as being down.
     if body.get("down"):
         request.response.status_int = 500
         body["status"] = "down"
 
+    if "include-stats" in request.params:
+        body["stats"] = {
+            "http_pool": request.find_service(PooledHTTPAdapter).stats,
+            "url_details_cache": request.find_service(
+                TTLCache, name="url_details"
+            ).stats,
+            "pdf_cache": request.find_service(DiskCache, name="pdf").stats,
+            "nginx_signed_urls": request.find_service(
+                TTLCache, name="nginx_signed_urls"
+            ).stats,
+            "youtube_titles": request.find_service(
+                TTLCache, name="youtube_titles"
+            ).stats,
+            "single_flight": request.find_service(SingleFlight).stats,
+            "checkmate_cache": request.find_service(CheckmateVerdictCache).stats,
+            "google_drive": request.find_service(GoogleDriveAPI).stats,
+            "decryption_cache": request.find_service(DecryptionService).stats,
+        }
+
     if "sentry" in request.params:
         capture_message("Test message from Via's status view")
 
@@ -1,12 +1,22 @@
 """View presenting the PDF viewer."""
 
-from itertools import chain
+import re
+from logging import getLogger
 
 from h_vialib import Configuration
-from h_vialib.secure import Encryption
-from pyramid.httpexceptions import HTTPNoContent
+from pyramid.httpexceptions import (
+    HTTPNoContent,
+    HTTPNotModified,
+    HTTPRequestRangeNotSatisfiable,
+)
+from pyramid.response import FileResponse
 from pyramid.view import view_config
+from webob.datetime_utils import parse_date, serialize_date
+from webob.etag import ETagMatcher
 
+from via.cache import DiskCache
+from via.decryption import DecryptionService
+from via.exceptions import GoogleDriveServiceError, UpstreamServiceError
 from via.requests_tools.headers import add_request_headers
 from via.services import (
     CheckmateService,
@@ -16,6 +26,8 @@ from via.services import (
 )
 from via.services.pdf_url import PDFURLBuilder
 
+LOG = getLogger(__name__)
+
 
 def _is_lms_request(request):
     """Check if request comes from LMS (has a valid signed URL)."""
@@ -77,16 +89,22 @@ def proxy_python_pdf(context, request):
     url = context.url_from_query()
     params = {}
     if "via.secret.query" in request.params:
-        secure_secrets = Encryption(
-            request.registry.settings["via_secret"].encode("utf-8")
+        params = request.find_service(DecryptionService).decrypt_dict(
+            request.params["via.secret.query"]
         )
-        params = secure_secrets.decrypt_dict(request.params["via.secret.query"])
 
-    content_iterable = request.find_service(HTTPService).stream(
-        url, headers=add_request_headers({}, request=request), params=params
-    )
+    headers = add_request_headers({}, request=request)
+    http_service = request.find_service(HTTPService)
 
-    return _iter_pdf_response(request.response, content_iterable)
+    return _proxy_pdf(
+        request,
+        # The secret query and headers can change what we get back, so they
+        # are part of the key (which is hashed, so they aren't stored)
+        ("url", url, sorted(params.items()), sorted(headers.items())),
+        lambda range_headers: http_service.stream_response(
+            url, headers={**headers, **range_headers}, params=params
+        ),
+    )
 
 
 @view_config(route_name="proxy_google_drive_file")
@@ -101,27 +119,361 @@ def proxy_google_drive_file(request):
         request.override_renderer = "via:templates/restricted.html.jinja2"
         return {"target_url": None}
 
-    content_iterable = request.find_service(GoogleDriveAPI).iter_file(
-        file_id=request.matchdict["file_id"],
-        resource_key=request.matchdict.get("resource_key"),
+    google_drive_api = request.find_service(GoogleDriveAPI)
+    file_id = request.matchdict["file_id"]
+    resource_key = request.matchdict.get("resource_key")
+
+    # Knowing about the file before we download it lets us turn away files
+    # we can't show and answer conditional requests without downloading. It
+    # costs another call against our Drive API quota though, so it's optional.
+    metadata = None
+    if request.registry.settings["google_drive_metadata"]:
+        try:
+            metadata = google_drive_api.get_file_metadata(file_id, resource_key)
+        except UpstreamServiceError:
+            # We can still proxy the file without it
+            LOG.warning("Could not get Google Drive metadata", exc_info=True)
+
+    cache_key = ("google_drive", file_id, resource_key)
+    validators = {}
+    if metadata:
+        _check_google_drive_file(metadata)
+        validators = _validator_headers(metadata)
+
+        if _is_not_modified(request, metadata):
+            return _not_modified_response(validators)
+
+        # We send the current version's validators with cached copies, so
+        # they had better be copies of the current version
+        cache_key = (*cache_key, metadata.md5_checksum, metadata.modified_time)
+
+    return _proxy_pdf(
+        request,
+        cache_key,
+        lambda range_headers: google_drive_api.stream_file(
+            file_id=file_id, resource_key=resource_key, headers=range_headers
+        ),
+        # Google Drive supports range requests for all files, see:
+        # https://developers.google.com/drive/api/guides/manage-downloads#partial_download
+        accept_ranges=True,
+        headers=validators,
+        size=metadata.size if metadata else None,
     )
 
-    return _iter_pdf_response(request.response, content_iterable)
 
+_PDF_HEADERS = {
+    "Content-Disposition": "inline",
+    "Content-Type": "application/pdf",
+    "Cache-Control": "public, max-age=43200, stale-while-revalidate=86400",
+}
+
+# How long (in seconds) to wait for another request fetching the same PDF to
+# start getting it. This needs to be comfortably less than the worker timeout.
+_PDF_CACHE_WAIT = 10
+
+# We only forward simple single byte ranges, which is what PDF.js sends
+_SINGLE_BYTE_RANGE = re.compile(r"^bytes=(\d+-\d*|-\d+)$")
+
+# The largest file we'll proxy from Google Drive
+_MAX_GOOGLE_DRIVE_FILE_SIZE = 500 * 1024 * 1024
+
+# The types of Google Drive file we'll try to show. Files uploaded without a
+# type come back as `application/octet-stream`, and may well be PDFs.
+_GOOGLE_DRIVE_MIME_TYPES = (
+    "application/pdf",
+    "application/x-pdf",
+    "application/octet-stream",
+)
+
+
+def _check_google_drive_file(metadata):
+    """Raise if the file isn't one we can show.
+
+    :raises GoogleDriveServiceError: If the file is too big or not a PDF
+    """
+    if metadata.mime_type and metadata.mime_type not in _GOOGLE_DRIVE_MIME_TYPES:
+        raise GoogleDriveServiceError(  # noqa: TRY003
+            f"Google Drive file is not a PDF: {metadata.mime_type}",  # noqa: EM102
+            # 415 - Unsupported Media Type
+            status_int=415,
+        )
+
+    if metadata.size and metadata.size > _MAX_GOOGLE_DRIVE_FILE_SIZE:
+        raise GoogleDriveServiceError(  # noqa: TRY003
+            f"Google Drive file is too large: {metadata.size} bytes",  # noqa: EM102
+            # 413 - Content Too Large
+            status_int=413,
+        )
+
+
+def _validator_headers(metadata):
+    """Get the `ETag` and `Last-Modified` headers for a Google Drive file."""
+    headers = {}
+
+    if metadata.md5_checksum:
+        headers["ETag"] = f'"{metadata.md5_checksum}"'
+
+    if metadata.modified_time:
+        headers["Last-Modified"] = serialize_date(metadata.modified_time)
+
+    return headers
+
+
+def _is_not_modified(request, metadata):
+    """Check whether the requester already has the current version."""
+
+    if if_none_match := request.headers.get("If-None-Match"):
+        return (
+            metadata.md5_checksum is not None
+            and metadata.md5_checksum in ETagMatcher.parse(if_none_match)
+        )
+
+    if_modified_since = parse_date(request.headers.get("If-Modified-Since"))
+    if if_modified_since and metadata.modified_time:
+        # HTTP dates only go down to the second
+        return metadata.modified_time.replace(microsecond=0) <= if_modified_since
+
+    return False
+
+
+def _conditional_headers(request):
+    """Get the headers to forward a conditional request upstream (if any)."""
+    return _pick_headers(request.headers, "If-None-Match", "If-Modified-Since")
+
+
+def _range_headers(request):
+    """Get the headers to forward a `Range` request upstream (if any)."""
+
+    range_ = request.headers.get("Range", "").replace(" ", "")
+    if not _SINGLE_BYTE_RANGE.match(range_):
+        return {}
+
+    # Byte ranges of compressed content aren't useful to us, as we decompress
+    # everything before passing it on
+    headers = {"Range": range_, "Accept-Encoding": "identity"}
+    if if_range := request.headers.get("If-Range"):
+        headers["If-Range"] = if_range
+
+    return headers
+
+
+def _proxy_pdf(  # noqa: PLR0913
+    request,
+    cache_key,
+    get_upstream,
+    accept_ranges=False,  # noqa: FBT002
+    headers=None,
+    size=None,
+):
+    """Proxy a PDF, passing through any `Range` request.
+
+    Complete files are stored in the PDF disk cache as we stream them, and
+    served from there (including ranges) for later requests.
+
+    :param request: The request we are responding to
+    :param cache_key: Key identifying this file in the PDF disk cache
+    :param get_upstream: Callable which accepts a dict of range and
+        conditional request headers and returns a `StreamedResponse` from
+        upstream
+    :param accept_ranges: Advertise range support even if the upstream
+        doesn't say it supports them
+    :param headers: Extra headers to add to the response (e.g. `ETag`)
+    :param size: The size of the whole file, if we know it
+    """
+    headers = headers or {}
+    pdf_cache = request.find_service(DiskCache, name="pdf")
+    range_headers = _range_headers(request)
+
+    if response := _cached_pdf_response(request, pdf_cache, cache_key, headers):
+        return response
+
+    lock = None
+    if not range_headers and pdf_cache.enabled:
+        lock, response = _lock_or_follow(request, pdf_cache, cache_key, headers)
+        if response:
+            return response
 
-def _iter_pdf_response(response, content_iterable):
     try:
-        content_iterable = chain((next(content_iterable),), content_iterable)
+        # If the requester already has a copy, the upstream might be able to
+        # tell us it hasn't changed, rather than sending the whole thing
+        upstream = get_upstream({**range_headers, **_conditional_headers(request)})
+    except UpstreamServiceError as err:
+        _release(lock)
+        if err.response is not None and err.response.status_code == 416:
+            return HTTPRequestRangeNotSatisfiable(
+                headers=_pick_headers(err.response.headers, "Content-Range")
+            )
+        raise
+    except BaseException:
+        _release(lock)
+        raise
+
+    if upstream.status_code == 200 and lock:
+        upstream.content = pdf_cache.fill(cache_key, upstream.content, lock)
+    elif upstream.status_code == 200:
+        upstream.content = pdf_cache.tee(cache_key, upstream.content)
+    else:
+        _release(lock)
+
+    if upstream.status_code == 304:
+        # There's no body, but reading it lets the connection be reused
+        list(upstream.content)
+
+        return _not_modified_response({**_validator_headers_from(upstream), **headers})
+
+    response = _iter_pdf_response(request.response, upstream, accept_ranges, size)
+    response.headers.update(headers)
+
+    return response
+
+
+def _lock_or_follow(request, pdf_cache, cache_key, headers):
+    """Get the lock to fetch a whole file, or a response for it without one.
+
+    When a whole class opens a file at once, only one request fetches it from
+    upstream while the others follow along as it's stored.
+
+    :return: A tuple of the lock (if we should fetch the file) and a response
+        (if we shouldn't)
+    """
+    if lock := pdf_cache.lock(cache_key):
+        # Somebody might have stored it since we looked
+        if response := _cached_pdf_response(request, pdf_cache, cache_key, headers):
+            lock.close()
+            return None, response
+
+        return lock, None
+
+    if chunks := pdf_cache.follow(cache_key, timeout=_PDF_CACHE_WAIT):
+        return None, _following_pdf_response(request.response, chunks, headers)
+
+    if response := _cached_pdf_response(request, pdf_cache, cache_key, headers):
+        return None, response
+
+    return pdf_cache.lock(cache_key), None
+
+
+def _cached_pdf_response(request, pdf_cache, cache_key, headers):
+    if path := pdf_cache.get(cache_key):
+        try:
+            response = _file_pdf_response(request, path)
+        except FileNotFoundError:
+            # Removed by another process since we checked, so carry on
+            return None
+
+        response.headers.update(headers)
+        return response
+
+    return None
+
+
+def _following_pdf_response(response, chunks, headers):
+    """Get a response for a PDF another request is fetching and storing."""
+    try:
+        content_iterable = _StartedContent(chunks)
     except StopIteration:
         return HTTPNoContent()
 
-    response.headers.update(
-        {
-            "Content-Disposition": "inline",
-            "Content-Type": "application/pdf",
-            "Cache-Control": "public, max-age=43200, stale-while-revalidate=86400",
-        }
-    )
+    response.app_iter = content_iterable
+    response.headers.update(_PDF_HEADERS)
+    response.headers.update(headers)
+
+    return response
+
+
+def _release(lock):
+    if lock is not None:
+        lock.close()
+
+
+def _file_pdf_response(request, path):
+    # `FileResponse` uses `wsgi.file_wrapper` (`sendfile`) where it can, and
+    # answers range and conditional requests itself
+    response = FileResponse(path, request=request, content_type="application/pdf")
+    response.headers.update(_PDF_HEADERS)
+    response.headers["Accept-Ranges"] = "bytes"
+    # The cached copy only changes when it's replaced, and the replacement
+    # will have a different modification time
+    stat = path.stat()
+    response.etag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+    return response
 
+
+def _not_modified_response(validators):
+    return HTTPNotModified(headers={**_PDF_HEADERS, **validators})
+
+
+def _validator_headers_from(upstream):
+    """Get the `ETag` and `Last-Modified` headers from an upstream response."""
+    validators = _pick_headers(upstream.headers, "ETag", "Last-Modified")
+
+    etag = validators.get("ETag")
+    if (
+        etag
+        and not etag.startswith("W/")
+        and upstream.headers.get("Content-Encoding", "identity") != "identity"
+    ):
+        # The upstream's tag is for the compressed bytes, but we send the
+        # decompressed ones, so they are only equivalent (a "weak" match)
+        validators["ETag"] = f"W/{etag}"
+
+    return validators
+
+
+def _iter_pdf_response(response, upstream, accept_ranges=False, size=None):  # noqa: FBT002
+    try:
+        content_iterable = _StartedContent(upstream.content)
+    except StopIteration:
+        return HTTPNoContent()
+
+    # Setting the app iter clears `Content-Length`, so this has to go first
     response.app_iter = content_iterable
+    response.headers.update(_PDF_HEADERS)
+    response.headers.update(_validator_headers_from(upstream))
+
+    if upstream.status_code == 206:
+        response.status_int = 206
+        response.headers.update(_pick_headers(upstream.headers, "Content-Range"))
+
+    if upstream.status_code == 200 and size is not None:
+        response.content_length = size
+    elif upstream.headers.get("Content-Encoding", "identity") == "identity":
+        # If the content was compressed we don't know how big it'll be after
+        # we've decompressed it
+        response.headers.update(_pick_headers(upstream.headers, "Content-Length"))
+
+    if (
+        accept_ranges
+        or upstream.status_code == 206
+        or upstream.headers.get("Accept-Ranges") == "bytes"
+    ):
+        response.headers["Accept-Ranges"] = "bytes"
+
     return response
+
+
+class _StartedContent:
+    """Streamed content which we've already read the first chunk of.
+
+    Unlike `itertools.chain()` this passes `close()` on to the content, which
+    the WSGI server calls once it's done (even if the client went away).
+
+    :raises StopIteration: If the content is empty
+    """
+
+    def __init__(self, content):
+        self._first = next(content)
+        self._content = content
+
+    def __iter__(self):
+        yield self._first
+        yield from self._content
+
+    def close(self):
+        if close := getattr(self._content, "close", None):
+            close()
+
+
+def _pick_headers(headers, *names):
+    return {name: headers[name] for name in names if name in headers}